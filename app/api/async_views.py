@@ -0,0 +1,124 @@
+"""Native async versions of the quote and payment endpoints.
+
+DRF views are sync, so under ASGI Django runs each of them in a worker
+thread. These plain Django async views answer on the event loop instead:
+the quote is pure CPU and never leaves it, and the payment flow reads and
+claims idempotency keys with the async ORM. Only the payment write hops to
+a thread, because Django has no async transactions and the payment, its
+ledger entries, outbox event and idempotency record must commit together.
+
+Request bodies, status codes and responses match `views.QuoteView` and
+`views.PaymentView`.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+
+from app.services.metrics import stage
+from app.services.idempotency import IdempotencyClaimLost, StoredResponse, get_idempotency_store, request_hash
+from app.services.payment_recorder import PendingPayment, record_payment
+from app.services.sharding import shard_for_key, use_shard
+from app.services.split_templates import aget_split_template
+
+from .payment_request import PaymentRequestError, get_payment_request_parser
+from .views import IDEMPOTENCY_POLL_SECONDS, calculate_payment, idempotency_key_error, idempotent_reply, quote
+
+
+async def _parse(request):
+    """Request body and parsed `PaymentRequest`, or an error response."""
+    with stage("parse"):
+        try:
+            body = json.loads(request.body or b"null")
+        except ValueError as e:
+            return None, _reply({"detail": f"JSON parse error - {e}"}, status.HTTP_400_BAD_REQUEST)
+        parser = get_payment_request_parser()
+        template_id = body.get("split_template") if isinstance(body, dict) else None
+        try:
+            # the parser finds a known template in the cache loaded here; an
+            # unknown one is looked up again, so it is parsed off the loop
+            if isinstance(template_id, str) and await aget_split_template(template_id) is None:
+                return (body, await sync_to_async(parser)(body)), None
+            return (body, parser(body)), None
+        except PaymentRequestError as e:
+            return None, _reply(e.detail, e.status_code)
+
+
+def _reply(body, status_code: int) -> JsonResponse:
+    with stage("render"):
+        return JsonResponse(body, status=status_code, safe=False)
+
+
+@csrf_exempt
+@require_POST
+async def quote_view(request):
+    parsed, error = await _parse(request)
+    if error is not None:
+        return error
+    status_code, body = quote(parsed[1])
+    return _reply(body, status_code)
+
+
+@csrf_exempt
+@require_POST
+async def payment_view(request):
+    parsed, error = await _parse(request)
+    if error is not None:
+        return error
+    body, req = parsed
+
+    idemp_key = request.headers.get("Idempotency-Key")
+    key_error = idempotency_key_error(idemp_key, "Idempotency-Key header")
+    if key_error:
+        return _reply({"detail": key_error}, status.HTTP_400_BAD_REQUEST)
+
+    # everything about this key lives on its shard
+    with use_shard(shard_for_key(idemp_key)):
+        store = get_idempotency_store()
+        body_hash = request_hash(body)
+        with stage("idempotency"):
+            stored = await store.aget(idemp_key)
+        if stored:
+            status_code, reply = idempotent_reply(stored, body_hash)
+            return _reply(reply, status_code)
+
+        result = calculate_payment(req)
+        if isinstance(result, tuple):
+            status_code, reply = result
+            return _reply(reply, status_code)
+
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            with stage("idempotency"):
+                claim = await store.aclaim({idemp_key: body_hash}, lock_seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+            if idemp_key in claim.owned:
+                break
+            taken = claim.taken[idemp_key]
+            if isinstance(taken, StoredResponse) or taken.request_hash != body_hash or time.monotonic() >= deadline:
+                status_code, reply = idempotent_reply(taken, body_hash)
+                return _reply(reply, status_code)
+            await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+
+        pending = PendingPayment(
+            idempotency_key=idemp_key,
+            request_body=body,
+            request_hash=body_hash,
+            payment_method=req.payment_method,
+            installments=req.installments,
+            result=result,
+            claim_token=claim.token,
+        )
+        try:
+            resp = await sync_to_async(record_payment)(pending)
+        except IdempotencyClaimLost:
+            return _reply({"detail": "Idempotency key in progress"}, status.HTTP_409_CONFLICT)
+        except Exception:
+            await store.arelease([idemp_key], claim.token)
+            raise
+        return _reply(resp, status.HTTP_201_CREATED)
@@ -0,0 +1,42 @@
+"""Streaming export endpoint for finance dumps.
+
+``GET /api/v1/exports/<dataset>?format=csv|jsonl&date=YYYY-MM-DD`` (or
+``since``/``until``) streams `app.services.export` lines through a
+`StreamingHttpResponse`. It is a plain Django view because DRF reserves
+the ``format`` query parameter for renderer selection; access is checked
+with `app.api.permissions.has_support_access`, like the payment lookups.
+"""
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import status
+
+from app.services.export import CONTENT_TYPES, day_bounds, export_lines, parse_bound
+
+from .permissions import IsSupportClient, has_support_access
+from .views import QueryParamError, integer_param
+
+# DRF's min_value message, see rest_framework.fields.IntegerField
+MIN_VALUE = "Ensure this value is greater than or equal to {}."
+
+
+@require_GET
+def export_view(request, dataset):
+    if not has_support_access(request):
+        return JsonResponse({"detail": IsSupportClient.message}, status=status.HTTP_403_FORBIDDEN)
+    fmt = request.GET.get("format", "csv")
+    try:
+        if request.GET.get("date"):
+            since, until = day_bounds(request.GET["date"])
+        else:
+            since, until = parse_bound(request.GET.get("since")), parse_bound(request.GET.get("until"))
+        chunk_size = integer_param(request.GET, "chunk_size", 2000)
+        if chunk_size < 1:
+            raise QueryParamError("chunk_size", MIN_VALUE.format(1))
+        lines = export_lines(dataset, fmt, since=since, until=until, chunk_size=chunk_size)
+    except QueryParamError as e:
+        return JsonResponse(e.detail, status=status.HTTP_400_BAD_REQUEST)
+    except ValueError as e:
+        return JsonResponse({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{dataset}.{fmt}"'
+    return response
@@ -0,0 +1,73 @@
+"""Request metrics middleware and the `/metrics` endpoint.
+
+`RequestMetricsMiddleware` measures each request: its latency, the time of
+every pipeline stage marked with `app.services.metrics.stage` (parse,
+validate, calculate, idempotency, db, render) and the number of database
+queries. With ``REQUEST_METRICS["ENABLED"]`` off the middleware removes
+itself from the chain and `/metrics` answers 404.
+"""
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+
+from app.services import metrics
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics.metrics_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        metrics.install_query_counter()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timings, token = metrics.begin_request()
+        start = time.perf_counter_ns()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        self._observe(request, response, start, timings)
+        return response
+
+    async def __acall__(self, request):
+        timings, token = metrics.begin_request()
+        start = time.perf_counter_ns()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        self._observe(request, response, start, timings)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time that too
+        timings = metrics.current_timings()
+        if timings is not None:
+            start = time.perf_counter_ns()
+            response.add_post_render_callback(lambda r: timings.add("render", time.perf_counter_ns() - start))
+        return response
+
+    @staticmethod
+    def _observe(request, response, start, timings):
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match is not None else "unmatched"
+        duration_us = (time.perf_counter_ns() - start) // 1000
+        metrics.observe(view, request.method, response.status_code, duration_us, timings)
+
+
+def metrics_view(request):
+    """Histograms of the measured requests, in the Prometheus text format."""
+    if not metrics.metrics_enabled():
+        raise Http404
+    return HttpResponse(metrics.registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
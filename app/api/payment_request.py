@@ -0,0 +1,332 @@
+"""Parsing of quote/payment request bodies into a `PaymentRequest`.
+
+`parse_payment_request` is a hand-written, single-pass equivalent of
+`PaymentRequestSerializer` followed by `validate_payment_request_data`: it
+walks the body once, converting fields with DRF's rules and collecting the
+totals the business validation needs. Field errors have the same shape and
+messages as the serializer's; the first business-rule violation is kept on
+the request (`error`) so views report it where they always have.
+
+`parse_with_serializer` is the DRF path. The views use whichever the
+`PAYMENT_REQUEST_PARSER` setting names.
+
+Both accept ``"split_template": "<id>"`` in place of ``"splits"`` (see
+`app.services.split_templates`); `parse_payment_request` also interns
+inline splits, so `PaymentRequest.splits` is usually `CompiledSplits`.
+"""
+import re
+from collections.abc import Mapping
+from decimal import Context, Decimal, DecimalException
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework import status
+
+from app.services.metrics import stage
+from app.services.split_templates import get_split_template, intern_splits, splits_as_json
+from app.services.split_types import CompiledSplits, Split, as_splits
+from app.services.payment_validator import (
+    PaymentValidationError,
+    validate_payment_fields,
+    validate_payment_request_data,
+    validate_payment_request_fields,
+)
+
+
+class PaymentRequest:
+    """A parsed quote/payment body; `installments` already defaults to 1."""
+
+    __slots__ = ("amount", "currency", "payment_method", "installments", "splits", "error")
+
+    def __init__(
+        self,
+        amount: Decimal,
+        currency: str,
+        payment_method: str,
+        installments: int,
+        splits: Sequence[Split],
+        error: Optional[PaymentValidationError] = None,
+    ):
+        self.amount = amount
+        self.currency = currency
+        self.payment_method = payment_method
+        self.installments = installments
+        self.splits = splits
+        # first business-rule violation, reported by the view
+        self.error = error
+
+
+class PaymentRequestError(Exception):
+    """The body does not have the request's shape; `detail` is the error body."""
+
+    def __init__(self, detail, status_code: int = status.HTTP_400_BAD_REQUEST):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def _split_template(template_id: str) -> CompiledSplits:
+    template = get_split_template(template_id)
+    if template is None:
+        raise PaymentRequestError({"split_template": [UNKNOWN_TEMPLATE.format(template_id)]})
+    return template
+
+
+def parse_with_serializer(body) -> PaymentRequest:
+    from .serializers import PaymentRequestSerializer
+
+    if isinstance(body, Mapping) and body.get("split_template") is not None:
+        if "splits" in body:
+            raise PaymentRequestError({"split_template": [SPLITS_AND_TEMPLATE]})
+        template = _split_template(str(body["split_template"]))
+        body = {**body, "splits": splits_as_json(template)}
+    serializer = PaymentRequestSerializer(data=body)
+    if not serializer.is_valid():
+        raise PaymentRequestError(serializer.errors)
+    data = serializer.validated_data
+    try:
+        with stage("validate"):
+            validate_payment_request_data(data)
+        error = None
+    except PaymentValidationError as e:
+        error = e
+    return PaymentRequest(
+        amount=data["amount"],
+        currency=data["currency"],
+        payment_method=data["payment_method"],
+        installments=data.get("installments") or 1,
+        splits=as_splits(data["splits"]),
+        error=error,
+    )
+
+
+# DRF's messages, see rest_framework.fields
+REQUIRED = "This field is required."
+NULL = "This field may not be null."
+BLANK = "This field may not be blank."
+NOT_A_STRING = "Not a valid string."
+NULL_CHARACTERS = "Null characters are not allowed."
+NOT_A_NUMBER = "A valid number is required."
+NOT_AN_INTEGER = "A valid integer is required."
+STRING_TOO_LARGE = "String value too large."
+MAX_STRING_LENGTH = 1000
+SPLITS_AND_TEMPLATE = "Provide either splits or split_template, not both."
+UNKNOWN_TEMPLATE = 'Unknown split template "{}".'
+
+# PaymentRequestSerializer.amount: DecimalField(max_digits=12, decimal_places=2)
+AMOUNT_MAX_DIGITS = 12
+AMOUNT_DECIMAL_PLACES = 2
+_CENT = Decimal("0.01")
+_AMOUNT_CONTEXT = Context(prec=AMOUNT_MAX_DIGITS)
+
+_MISSING = object()
+_SURROGATE = re.compile("[\ud800-\udfff]")
+_INTEGRAL_SUFFIX = re.compile(r"\.0*\s*$")
+
+
+class _Invalid(Exception):
+    def __init__(self, detail):
+        self.detail = detail
+
+
+def _char(value) -> str:
+    if value is _MISSING:
+        raise _Invalid([REQUIRED])
+    if value is None:
+        raise _Invalid([NULL])
+    if value.__class__ is not str:
+        if str(value).strip() == "":
+            raise _Invalid([BLANK])
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise _Invalid([NOT_A_STRING])
+    text = str(value).strip()
+    if not text:
+        raise _Invalid([BLANK])
+    if "\x00" in text or _SURROGATE.search(text):
+        errors = [NULL_CHARACTERS] if "\x00" in text else []
+        surrogate = _SURROGATE.search(text)
+        if surrogate:
+            errors.append(f"Surrogate characters are not allowed: U+{ord(surrogate.group()):X}.")
+        raise _Invalid(errors)
+    return text
+
+
+def _integer(value) -> int:
+    if value is _MISSING:
+        raise _Invalid([REQUIRED])
+    if value is None:
+        raise _Invalid([NULL])
+    if value.__class__ is int:
+        return value
+    if isinstance(value, str) and len(value) > MAX_STRING_LENGTH:
+        raise _Invalid([STRING_TOO_LARGE])
+    try:
+        return int(_INTEGRAL_SUFFIX.sub("", str(value)))
+    except (ValueError, TypeError):
+        raise _Invalid([NOT_AN_INTEGER])
+
+
+def _amount(value) -> Decimal:
+    if value is _MISSING:
+        raise _Invalid([REQUIRED])
+    if value is None:
+        raise _Invalid([NULL])
+    text = str(value).strip()
+    if len(text) > MAX_STRING_LENGTH:
+        raise _Invalid([STRING_TOO_LARGE])
+    try:
+        amount = Decimal(text)
+    except DecimalException:
+        raise _Invalid([NOT_A_NUMBER])
+    if not amount.is_finite():
+        raise _Invalid([NOT_A_NUMBER])
+
+    _, digits, exponent = amount.as_tuple()
+    if exponent >= 0:
+        total, whole, places = len(digits) + exponent, len(digits) + exponent, 0
+    elif len(digits) > -exponent:
+        total, whole, places = len(digits), len(digits) + exponent, -exponent
+    else:
+        total, whole, places = -exponent, 0, -exponent
+    if total > AMOUNT_MAX_DIGITS:
+        raise _Invalid([f"Ensure that there are no more than {AMOUNT_MAX_DIGITS} digits in total."])
+    if places > AMOUNT_DECIMAL_PLACES:
+        raise _Invalid([f"Ensure that there are no more than {AMOUNT_DECIMAL_PLACES} decimal places."])
+    if whole > AMOUNT_MAX_DIGITS - AMOUNT_DECIMAL_PLACES:
+        raise _Invalid(
+            [f"Ensure that there are no more than {AMOUNT_MAX_DIGITS - AMOUNT_DECIMAL_PLACES} digits before the decimal point."]
+        )
+    return amount.quantize(_CENT, context=_AMOUNT_CONTEXT)
+
+
+def _not_a_dict(value) -> Dict:
+    return {"non_field_errors": [f"Invalid data. Expected a dictionary, but got {type(value).__name__}."]}
+
+
+def _splits(value):
+    """Parsed splits plus their percent total, in one walk."""
+    if value is _MISSING:
+        raise _Invalid([REQUIRED])
+    if value is None:
+        raise _Invalid([NULL])
+    if isinstance(value, (str, Mapping)) or not hasattr(value, "__iter__"):
+        raise _Invalid({"non_field_errors": [f'Expected a list of items but got type "{type(value).__name__}".']})
+
+    splits, errors, failed, total_pct = [], [], False, 0
+    for item in value:
+        if item is None:
+            errors.append([NULL])
+            failed = True
+            continue
+        if not isinstance(item, Mapping):
+            errors.append(_not_a_dict(item))
+            failed = True
+            continue
+        fields, item_errors = [], {}
+        for name, parse in (("recipient_id", _char), ("role", _char), ("percent", _integer)):
+            try:
+                fields.append(parse(item.get(name, _MISSING)))
+            except _Invalid as e:
+                item_errors[name] = e.detail
+        errors.append(item_errors)
+        if item_errors:
+            failed = True
+        elif not failed:
+            splits.append(Split(*fields))
+            total_pct += fields[2]
+    if failed:
+        raise _Invalid(errors)
+    return tuple(splits), total_pct
+
+
+def parse_payment_request(body) -> PaymentRequest:
+    """Single-pass equivalent of `parse_with_serializer`."""
+    if body is None:
+        raise PaymentRequestError({"non_field_errors": ["No data provided"]})
+    if not isinstance(body, Mapping):
+        raise PaymentRequestError(_not_a_dict(body))
+
+    errors = {}
+    values = {}
+    for name, parse in (("amount", _amount), ("currency", _char), ("payment_method", _char)):
+        try:
+            values[name] = parse(body.get(name, _MISSING))
+        except _Invalid as e:
+            errors[name] = e.detail
+    installments = body.get("installments")
+    if installments is not None:
+        try:
+            installments = _integer(installments)
+        except _Invalid as e:
+            errors["installments"] = e.detail
+    template_id = body.get("split_template")
+    if template_id is None:
+        try:
+            splits, total_pct = _splits(body.get("splits", _MISSING))
+        except _Invalid as e:
+            errors["splits"] = e.detail
+    else:
+        try:
+            template_id = _char(template_id)
+            if "splits" in body:
+                raise _Invalid([SPLITS_AND_TEMPLATE])
+        except _Invalid as e:
+            errors["split_template"] = e.detail
+    if errors:
+        raise PaymentRequestError(errors)
+    # a compiled template carries its split validation outcome
+    compiled = intern_splits(splits) if template_id is None else _split_template(template_id)
+
+    request = PaymentRequest(
+        amount=values["amount"],
+        currency=values["currency"],
+        payment_method=values["payment_method"],
+        installments=installments or 1,
+        splits=splits if compiled is None else compiled,
+    )
+    try:
+        with stage("validate"):
+            if compiled is None:
+                validate_payment_request_fields(
+                    request.currency, request.payment_method, request.installments, len(splits), total_pct
+                )
+            else:
+                validate_payment_fields(request.currency, request.payment_method, request.installments)
+                if compiled.error is not None:
+                    raise compiled.error
+    except PaymentValidationError as e:
+        request.error = e
+    return request
+
+
+def parse_split_template(body) -> Tuple[Optional[str], Tuple[Split, ...]]:
+    """Id (optional) and splits of a split template registration body."""
+    if not isinstance(body, Mapping):
+        raise PaymentRequestError(_not_a_dict(body))
+    errors = {}
+    template_id = body.get("id")
+    if template_id is not None:
+        try:
+            template_id = _char(template_id)
+        except _Invalid as e:
+            errors["id"] = e.detail
+    try:
+        splits, _ = _splits(body.get("splits", _MISSING))
+    except _Invalid as e:
+        errors["splits"] = e.detail
+    if errors:
+        raise PaymentRequestError(errors)
+    return template_id, splits
+
+
+_parsers: Dict[str, Callable] = {}
+
+
+def get_payment_request_parser() -> Callable[..., PaymentRequest]:
+    """Return the parser selected by the `PAYMENT_REQUEST_PARSER` setting (a dotted path)."""
+    path = getattr(settings, "PAYMENT_REQUEST_PARSER", "app.api.payment_request.parse_payment_request")
+    parser = _parsers.get(path)
+    if parser is None:
+        parser = _parsers[path] = import_string(path)
+    return parser
@@ -0,0 +1,28 @@
+"""Access to the support and finance endpoints (payment lookups, exports).
+
+They return whole payments, ledger entries and idempotency keys, so they
+answer only staff users and requests carrying ``Authorization: Bearer
+<token>`` with one of ``SUPPORT_API_TOKENS``.
+"""
+import hmac
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+
+def has_support_access(request) -> bool:
+    """Whether `request` (a Django or DRF request) may use the support endpoints."""
+    user = getattr(request, "user", None)
+    if user is not None and user.is_active and user.is_staff:
+        return True
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    return any(hmac.compare_digest(token.encode(), allowed.encode()) for allowed in settings.SUPPORT_API_TOKENS)
+
+
+class IsSupportClient(BasePermission):
+    message = "Support access required"
+
+    def has_permission(self, request, view):
+        return has_support_access(request)
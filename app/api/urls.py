@@ -1,7 +1,27 @@
 from django.urls import path
-from .views import QuoteView, PaymentView
+from .views import (
+    QuoteView,
+    QuoteCacheStatsView,
+    PaymentView,
+    PaymentBatchView,
+    PaymentDetailView,
+    RecipientBalanceView,
+    SplitTemplateView,
+    SplitTemplateDetailView,
+)
+from . import async_views, export_views
 
 urlpatterns = [
     path("checkout/quote", QuoteView.as_view(), name="quote"),
+    path("checkout/quote/cache", QuoteCacheStatsView.as_view(), name="quote-cache"),
     path("payments", PaymentView.as_view(), name="payments"),
+    path("payments/batch", PaymentBatchView.as_view(), name="payments-batch"),
+    path("payments/<str:payment_id>", PaymentDetailView.as_view(), name="payment"),
+    path("split-templates", SplitTemplateView.as_view(), name="split-templates"),
+    path("split-templates/<str:template_id>", SplitTemplateDetailView.as_view(), name="split-template"),
+    path("recipients/<str:recipient_id>/balance", RecipientBalanceView.as_view(), name="recipient-balance"),
+    path("exports/<str:dataset>", export_views.export_view, name="export"),
+    # native async variants, for ASGI deployments
+    path("async/checkout/quote", async_views.quote_view, name="quote-async"),
+    path("async/payments", async_views.payment_view, name="payments-async"),
 ]
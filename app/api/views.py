@@ -1,122 +1,460 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import PaymentRequestSerializer
-from decimal import Decimal
-from app.services.split_calculator import SimpleSplitCalculator, SplitCalculationError
-from app.services.payment_validator import (
-    PaymentValidationError,
-    validate_payment_request_data,
-    validate_payment_method,
+from .payment_request import NOT_AN_INTEGER, PaymentRequest, PaymentRequestError, get_payment_request_parser, parse_split_template
+from .permissions import IsSupportClient
+import time
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from app.services.split_calculator import SplitCalculationError, get_split_calculator
+from app.services.quote_cache import get_quote_cache, quote_cache_key
+from app.services.idempotency import IdempotencyClaimLost, StoredResponse, get_idempotency_store, request_hash
+from app.services.payment_recorder import PendingPayment, record_payment, record_payments
+from app.services.metrics import stage
+from app.services.balances import get_balance
+from app.services.sharding import shard_aliases, shard_for_key, use_shard
+from app.services.export import parse_bound
+from app.services.payment_query import PaymentFilters, get_payment, list_payments
+from app.services.split_templates import (
+    SplitTemplateConflict,
+    SplitTemplateError,
+    get_split_template,
+    register_split_template,
+    splits_as_json,
 )
-from app.models import Payment, LedgerEntry, OutboxEvent
-from django.db import transaction
-import uuid
+
+
+# how often a duplicate request re-checks an in-progress idempotency claim
+IDEMPOTENCY_POLL_SECONDS = 0.05
+# max_length of Payment.idempotency_key and IdempotencyRecord.key
+MAX_IDEMPOTENCY_KEY_LENGTH = 128
+
+
+def idempotency_key_error(key, name: str) -> Optional[str]:
+    """Why `key` (the idempotency key called `name`) is unusable, or None."""
+    if key is None or (isinstance(key, str) and not key.strip()):
+        return f"{name} required"
+    if not isinstance(key, str):
+        return f"{name} must be a string"
+    if len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        return f"{name} must be at most {MAX_IDEMPOTENCY_KEY_LENGTH} characters"
+    return None
+
+
+class QueryParamError(ValueError):
+    """An invalid query parameter; `detail` is the field-error body, as DRF's."""
+
+    def __init__(self, name: str, message: str):
+        super().__init__(message)
+        self.detail = {name: [message]}
+
+
+def integer_param(params, name: str, default: int) -> int:
+    """Query parameter `name` as an int (`default` when absent or empty)."""
+    value = params.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise QueryParamError(name, NOT_AN_INTEGER) from None
+
+
+def idempotent_reply(taken, body_hash: str) -> Tuple[int, Dict]:
+    """Status and body for a key already claimed by another request."""
+    if taken.request_hash != body_hash:
+        return status.HTTP_409_CONFLICT, {"detail": "Idempotency key conflict: different payload"}
+    if isinstance(taken, StoredResponse):
+        return status.HTTP_200_OK, taken.body
+    return status.HTTP_409_CONFLICT, {"detail": "Idempotency key in progress"}
+
+
+def quote(req: PaymentRequest) -> Tuple[int, Dict]:
+    """Status and body of a quote for a parsed request; pure CPU."""
+    if req.error is not None:
+        return req.error.status_code, {"detail": str(req.error)}
+
+    calc = get_split_calculator()
+
+    def compute():
+        # the cache holds the rendered body, so hits skip formatting too
+        with stage("calculate"):
+            return calc.quote(amount=req.amount, payment_method=req.payment_method, installments=req.installments, splits=req.splits).as_dict()
+
+    try:
+        cache = get_quote_cache()
+        if cache is None:
+            result = compute()
+        else:
+            key = quote_cache_key(
+                amount=req.amount,
+                payment_method=req.payment_method,
+                installments=req.installments,
+                splits=req.splits,
+                calculator=type(calc).__qualname__,
+            )
+            result = cache.get_or_compute(key, compute)
+    except SplitCalculationError as e:
+        return status.HTTP_400_BAD_REQUEST, {"detail": str(e)}
+    return status.HTTP_200_OK, result
+
+
+def calculate_payment(req: PaymentRequest):
+    """Split a parsed payment: a `QuoteResult`, or an error (status, body)."""
+    if req.error is not None:
+        return req.error.status_code, {"detail": str(req.error)}
+
+    calc = get_split_calculator()
+    try:
+        with stage("calculate"):
+            return calc.quote(amount=req.amount, payment_method=req.payment_method, installments=req.installments, splits=req.splits)
+    except SplitCalculationError as e:
+        return status.HTTP_400_BAD_REQUEST, {"detail": str(e)}
 
 
 class QuoteView(APIView):
     def post(self, request):
-        serializer = PaymentRequestSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        data = serializer.validated_data
-        amount = data["amount"]
-        # validate basics
-        if data["currency"] != "BRL":
-            return Response({"detail": "unsupported currency"}, status=status.HTTP_400_BAD_REQUEST)
-
         try:
-            validate_payment_request_data(data)
-        except PaymentValidationError as e:
-            return Response({"detail": str(e)}, status=e.status_code)
+            with stage("parse"):
+                req = get_payment_request_parser()(request.data)
+        except PaymentRequestError as e:
+            return Response(e.detail, status=e.status_code)
+        status_code, body = quote(req)
+        return Response(body, status=status_code)
+
+
+class QuoteCacheStatsView(APIView):
+    """Hit/miss/eviction counters of the quote cache."""
+
+    def get(self, request):
+        cache = get_quote_cache()
+        return Response(cache.stats() if cache is not None else {"enabled": False})
+
+
+class RecipientBalanceView(APIView):
+    """Receivable balance of a recipient, kept up to date by each payment."""
+
+    def get(self, request, recipient_id):
+        balance = get_balance(recipient_id)
+        if balance is None:
+            return Response({"detail": "Recipient not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(
+            {
+                "recipient_id": balance.recipient_id,
+                "balance": f"{balance.balance:.2f}",
+                "entry_count": balance.entry_count,
+                "updated_at": balance.updated_at,
+            }
+        )
 
-        calc = SimpleSplitCalculator()
+
+def split_template_body(template) -> Dict:
+    return {"id": template.template_id, "splits": splits_as_json(template)}
+
+
+class SplitTemplateView(APIView):
+    """Register a split template: ``{"id": optional, "splits": [...]}``.
+
+    Without an id the template is named after the hash of its splits, so
+    registering the same splits twice returns the same template (200).
+    """
+
+    def post(self, request):
         try:
-            result = calc.calculate(amount=amount, payment_method=data["payment_method"], installments=data.get("installments") or 1, splits=data["splits"])
-        except SplitCalculationError as e:
+            template_id, splits = parse_split_template(request.data)
+        except PaymentRequestError as e:
+            return Response(e.detail, status=e.status_code)
+        try:
+            template, created = register_split_template(splits, template_id)
+        except SplitTemplateConflict as e:
+            return Response({"detail": str(e)}, status=status.HTTP_409_CONFLICT)
+        except SplitTemplateError as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-        return Response(result)
+        return Response(split_template_body(template), status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+class SplitTemplateDetailView(APIView):
+    def get(self, request, template_id):
+        template = get_split_template(template_id)
+        if template is None:
+            return Response({"detail": "Split template not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(split_template_body(template))
+
+
+def payment_body(payment) -> Dict:
+    """A stored payment with its ledger entries (prefetched), as the read endpoints return it."""
+    return {
+        "payment_id": payment.payment_id,
+        "status": payment.status,
+        "gross_amount": f"{payment.gross_amount:.2f}",
+        "platform_fee_amount": f"{payment.platform_fee_amount:.2f}",
+        "net_amount": f"{payment.net_amount:.2f}",
+        "payment_method": payment.payment_method,
+        "installments": payment.installments,
+        "created_at": payment.created_at,
+        "ledger_entries": [
+            {
+                "recipient_id": e.recipient_id,
+                "role": e.role,
+                "amount": f"{e.amount:.2f}",
+                "settlement_id": e.settlement_id,
+            }
+            for e in payment.ledger_entries.all()
+        ],
+    }
 
 
 class PaymentView(APIView):
+    def get_permissions(self):
+        # listing is a support tool; creating payments stays open
+        if self.request.method == "GET":
+            return [IsSupportClient()]
+        return super().get_permissions()
+
+    def get(self, request):
+        """Payments newest first: ``?recipient_id=&payment_method=&status=&since=&until=&limit=&cursor=``.
+
+        ``next_cursor`` (null on the last page) is passed back as ``cursor``
+        with the same filters to read the next page.
+        """
+        params = request.query_params
+        try:
+            filters = PaymentFilters(
+                recipient_id=params.get("recipient_id") or None,
+                payment_method=params.get("payment_method") or None,
+                status=params.get("status") or None,
+                since=parse_bound(params.get("since")),
+                until=parse_bound(params.get("until")),
+            )
+            page = list_payments(filters, cursor=params.get("cursor") or None, limit=integer_param(params, "limit", 50))
+        except QueryParamError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"results": [payment_body(p) for p in page.payments], "next_cursor": page.next_cursor})
+
     def post(self, request):
-        serializer = PaymentRequestSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        data = serializer.validated_data
+        try:
+            with stage("parse"):
+                req = get_payment_request_parser()(request.data)
+        except PaymentRequestError as e:
+            return Response(e.detail, status=e.status_code)
 
         idemp_key = request.headers.get("Idempotency-Key")
 
-        # Idempotency key is required and must not be blank
-        if not idemp_key:
-            return Response({"detail": "Idempotency-Key header required"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # idempotency handling
-        if idemp_key:
-            existing = Payment.objects.filter(idempotency_key=idemp_key).first()
-            if existing:
-                # compare request bodies
-                if existing.request_body == request.data:
-                    # return previous result
-                    ledger = list(existing.ledger_entries.values("recipient_id", "role", "amount"))
-                    outbox = OutboxEvent.objects.filter(payload__payment_id=existing.payment_id).first()
-                    resp = {
-                        "payment_id": existing.payment_id,
-                        "status": existing.status,
-                        "gross_amount": f"{existing.gross_amount:.2f}",
-                        "platform_fee_amount": f"{existing.platform_fee_amount:.2f}",
-                        "net_amount": f"{existing.net_amount:.2f}",
-                        "receivables": [{"recipient_id": l['recipient_id'], "role": l['role'], "amount": f"{l['amount']:.2f}"} for l in ledger],
-                        "outbox_event": {"type": outbox.type, "status": outbox.status} if outbox else None,
-                    }
-                    return Response(resp)
+        # Idempotency key is required, must not be blank and must fit the column
+        key_error = idempotency_key_error(idemp_key, "Idempotency-Key header")
+        if key_error:
+            return Response({"detail": key_error}, status=status.HTTP_400_BAD_REQUEST)
+
+        # everything about this key lives on its shard
+        with use_shard(shard_for_key(idemp_key)):
+            # idempotency handling: answered from the idempotency store, without
+            # touching the payment tables
+            body_hash = request_hash(request.data)
+            if idemp_key:
+                with stage("idempotency"):
+                    stored = get_idempotency_store().get(idemp_key)
+                if stored:
+                    # compare request body hashes
+                    if stored.request_hash == body_hash:
+                        # return previous result
+                        return Response(stored.body)
+                    else:
+                        return Response({"detail": "Idempotency key conflict: different payload"}, status=status.HTTP_409_CONFLICT)
+
+
+            # centralized validation
+            result = calculate_payment(req)
+            if isinstance(result, tuple):
+                status_code, body = result
+                return Response(body, status=status_code)
+
+            # claim the key before writing: concurrent duplicates either wait for
+            # this request to finish or get a 409
+            store = get_idempotency_store()
+            deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+            while True:
+                with stage("idempotency"):
+                    claim = store.claim({idemp_key: body_hash}, lock_seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+                if idemp_key in claim.owned:
+                    break
+                taken = claim.taken[idemp_key]
+                if isinstance(taken, StoredResponse) or taken.request_hash != body_hash or time.monotonic() >= deadline:
+                    status_code, body = idempotent_reply(taken, body_hash)
+                    return Response(body, status=status_code)
+                time.sleep(IDEMPOTENCY_POLL_SECONDS)
+
+            # persist within a DB transaction: if any write fails, rollback everything
+            try:
+                resp = record_payment(
+                    PendingPayment(
+                        idempotency_key=idemp_key,
+                        request_body=request.data,
+                        request_hash=body_hash,
+                        payment_method=req.payment_method,
+                        installments=req.installments,
+                        result=result,
+                        claim_token=claim.token,
+                    )
+                )
+            except IdempotencyClaimLost:
+                return Response({"detail": "Idempotency key in progress"}, status=status.HTTP_409_CONFLICT)
+            except Exception:
+                store.release([idemp_key], claim.token)
+                raise
+            return Response(resp, status=status.HTTP_201_CREATED)
+
+
+class PaymentDetailView(APIView):
+    permission_classes = [IsSupportClient]
+
+    def get(self, request, payment_id):
+        payment = get_payment(payment_id)
+        if payment is None:
+            return Response({"detail": "Payment not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(payment_body(payment))
+
+
+class PaymentBatchView(APIView):
+    """Confirm many payments in one request.
+
+    Body: ``{"payments": [{"idempotency_key": "...", "payload": {...}}, ...]}``
+    where each ``payload`` is a regular `/payments` request body. Every item
+    is validated, calculated and checked for idempotency on its own, and all
+    new payments of a database shard are written with bulk inserts in a
+    single transaction (one per shard, see `app.services.sharding`). The
+    response lists one ``{"idempotency_key", "status_code", "body"}`` result
+    per item, in request order.
+    """
+
+    max_batch_size = 1000
+
+    def post(self, request):
+        items = request.data.get("payments") if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "payments must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_batch_size:
+            return Response({"detail": f"at most {self.max_batch_size} payments per batch"}, status=status.HTTP_400_BAD_REQUEST)
+
+        keys = [item.get("idempotency_key") if isinstance(item, dict) else None for item in items]
+        # each shard's items are confirmed (and committed) on their own
+        by_shard: Dict[str, List[int]] = {}
+        for idx, key in enumerate(keys):
+            # unusable keys are reported (as 400s) with the first shard's items
+            valid = idempotency_key_error(key, "idempotency_key") is None
+            by_shard.setdefault(shard_for_key(key) if valid else shard_aliases()[0], []).append(idx)
+        results: List[Dict] = [{} for _ in items]
+        for alias, indexes in by_shard.items():
+            with use_shard(alias):
+                shard_results = self._confirm([items[i] for i in indexes], [keys[i] for i in indexes])
+            for idx, result in zip(indexes, shard_results):
+                results[idx] = result
+        return Response({"results": results})
+
+    def _confirm(self, items: List, keys: List) -> List[Dict]:
+        """Results of `items` (with idempotency `keys`), all on the current shard."""
+        errors = [idempotency_key_error(key, "idempotency_key") for key in keys]
+        with stage("idempotency"):
+            existing = get_idempotency_store().get_many(k for k, error in zip(keys, errors) if error is None)
+
+        results: List[Dict] = [{} for _ in items]
+        pending: List[PendingPayment] = []
+        pending_idx: List[int] = []
+        seen: Dict[str, int] = {}  # idempotency key -> index of its first occurrence in this batch
+        for idx, (item, key) in enumerate(zip(items, keys)):
+            results[idx]["idempotency_key"] = key
+            if errors[idx]:
+                self._fail(results[idx], errors[idx], status.HTTP_400_BAD_REQUEST)
+                continue
+            body = item.get("payload")
+            body_hash = request_hash(body)
+
+            stored = existing.get(key)
+            if stored is not None:
+                if stored.request_hash == body_hash:
+                    results[idx].update(status_code=status.HTTP_200_OK, body=stored.body)
                 else:
-                    return Response({"detail": "Idempotency key conflict: different payload"}, status=status.HTTP_409_CONFLICT)
+                    self._fail(results[idx], "Idempotency key conflict: different payload", status.HTTP_409_CONFLICT)
+                continue
+            if key in seen:
+                first_idx = seen[key]
+                if request_hash(items[first_idx].get("payload")) != body_hash:
+                    self._fail(results[idx], "Idempotency key conflict: different payload", status.HTTP_409_CONFLICT)
+                else:
+                    # resolved once the first occurrence is persisted (or failed)
+                    results[idx]["replay_of"] = first_idx
+                continue
+            seen[key] = idx
+
+            outcome = self._prepare(key, body, body_hash)
+            if isinstance(outcome, PendingPayment):
+                pending.append(outcome)
+                pending_idx.append(idx)
+            else:
+                results[idx].update(outcome)
 
+        # claim every new key at once; keys held by concurrent requests are
+        # reported per item instead of waiting
+        store = get_idempotency_store()
+        with stage("idempotency"):
+            claim = store.claim({p.idempotency_key: p.request_hash for p in pending}, lock_seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+        owned: List[PendingPayment] = []
+        owned_idx: List[int] = []
+        for idx, p in zip(pending_idx, pending):
+            if p.idempotency_key in claim.owned:
+                p.claim_token = claim.token
+                owned.append(p)
+                owned_idx.append(idx)
+            else:
+                status_code, body = idempotent_reply(claim.taken[p.idempotency_key], p.request_hash)
+                results[idx].update(status_code=status_code, body=body)
 
-        # centralized validation
         try:
-            validate_payment_request_data(data)
-        except PaymentValidationError as e:
-            return Response({"detail": str(e)}, status=e.status_code)
+            recorded = record_payments(owned)
+        except IdempotencyClaimLost:
+            # nothing of this shard was written; other shards keep their results
+            store.release(claim.owned, claim.token)
+            for idx in owned_idx:
+                self._fail(results[idx], "Idempotency key in progress", status.HTTP_409_CONFLICT)
+        except Exception:
+            store.release(claim.owned, claim.token)
+            raise
+        else:
+            for idx, resp in zip(owned_idx, recorded):
+                results[idx].update(status_code=status.HTTP_201_CREATED, body=resp)
 
-        splits = data["splits"]
-        installments = data.get("installments") or 1
+        for result in results:
+            first_idx = result.pop("replay_of", None)
+            if first_idx is not None:
+                first = results[first_idx]
+                created = first["status_code"] == status.HTTP_201_CREATED
+                result.update(status_code=status.HTTP_200_OK if created else first["status_code"], body=first["body"])
 
-        calc = SimpleSplitCalculator()
+        return results
+
+    @staticmethod
+    def _fail(result: Dict, detail: str, status_code: int) -> None:
+        result.update(status_code=status_code, body={"detail": detail})
+
+    def _prepare(self, key: str, body, body_hash: str):
+        """Validate and calculate one item: a `PendingPayment` or an error result."""
         try:
-            result = calc.calculate(amount=data["amount"], payment_method=data["payment_method"], installments=installments, splits=splits)
-        except SplitCalculationError as e:
-            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            with stage("parse"):
+                req = get_payment_request_parser()(body)
+        except PaymentRequestError as e:
+            return {"status_code": e.status_code, "body": e.detail}
 
-        # persist within a DB transaction: if any write fails, rollback everything
-        payment_id = f"pmt_{uuid.uuid4().hex[:8]}"
-        with transaction.atomic():
-            payment = Payment.objects.create(
-                payment_id=payment_id,
-                status="captured",
-                gross_amount=Decimal(result["gross_amount"]),
-                platform_fee_amount=Decimal(result["platform_fee_amount"]),
-                net_amount=Decimal(result["net_amount"]),
-                payment_method=data["payment_method"],
-                installments=installments,
-                idempotency_key=idemp_key,
-                request_body=request.data,
-            )
+        result = calculate_payment(req)
+        if isinstance(result, tuple):
+            status_code, error = result
+            return {"status_code": status_code, "body": error}
 
-            receivables = []
-            for r in result["receivables"]:
-                amount_r = Decimal(r["amount"])
-                LedgerEntry.objects.create(payment=payment, recipient_id=r["recipient_id"], role=r.get("role"), amount=amount_r)
-                receivables.append({"recipient_id": r["recipient_id"], "role": r.get("role"), "amount": r["amount"]})
-
-            outbox = OutboxEvent.objects.create(type="payment_captured", payload={"payment_id": payment.payment_id, "status": "captured"}, status="pending")
-
-        resp = {
-            "payment_id": payment.payment_id,
-            "status": payment.status,
-            "gross_amount": result["gross_amount"],
-            "platform_fee_amount": result["platform_fee_amount"],
-            "net_amount": result["net_amount"],
-            "receivables": receivables,
-            "outbox_event": {"type": outbox.type, "status": outbox.status},
-        }
-        return Response(resp, status=status.HTTP_201_CREATED)
+        return PendingPayment(
+            idempotency_key=key,
+            request_body=body,
+            request_hash=body_hash,
+            payment_method=req.payment_method,
+            installments=req.installments,
+            result=result,
+        )
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class PaymentsConfig(AppConfig):
+    name = "app"
+
+    def ready(self):
+        from app.services.warmup import warm_up, warmup_enabled
+
+        if warmup_enabled():
+            warm_up()
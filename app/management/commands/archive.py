@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.services.archival import Archiver, JsonlSink, archive_settings, check_retention, get_archive_sink
+from app.services.sharding import on_every_shard
+
+
+class Command(BaseCommand):
+    help = (
+        "Move published outbox events and old payments (with their ledger entries) to the archive, "
+        "and delete idempotency records past the retention window, in bounded batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--only", choices=["outbox", "payments", "idempotency"], help="run a single step")
+        parser.add_argument("--outbox-days", type=float, help="archive published events older than this (ARCHIVE setting by default)")
+        parser.add_argument("--payment-days", type=float, help="archive payments older than this")
+        parser.add_argument("--idempotency-days", type=float, help="keep idempotency records for this long")
+        parser.add_argument("--batch-size", type=int, help="rows per transaction")
+        parser.add_argument("--max-batches", type=int, help="stop each step after this many batches")
+        parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+        parser.add_argument("--jsonl", metavar="DIRECTORY", help="write gzip JSONL segments here instead of the configured sink")
+        parser.add_argument("--dry-run", action="store_true", help="only count the candidates")
+
+    def handle(self, *args, **options):
+        try:
+            config = archive_settings()
+            outbox_days = options["outbox_days"] if options["outbox_days"] is not None else config["OUTBOX_AFTER_DAYS"]
+            payment_days = options["payment_days"] if options["payment_days"] is not None else config["PAYMENTS_AFTER_DAYS"]
+            idempotency_days = (
+                options["idempotency_days"] if options["idempotency_days"] is not None else config["IDEMPOTENCY_RETENTION_DAYS"]
+            )
+            check_retention(payment_days, idempotency_days)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        sink = JsonlSink(options["jsonl"]) if options["jsonl"] else get_archive_sink(config)
+        archiver = Archiver(sink, batch_size=options["batch_size"] or config["BATCH_SIZE"], pause=options["pause"])
+        steps = [
+            ("outbox", "archived", outbox_days, archiver.outbox_candidates, archiver.archive_outbox),
+            ("payments", "archived", payment_days, archiver.payment_candidates, archiver.archive_payments),
+            ("idempotency", "deleted", idempotency_days, archiver.idempotency_candidates, archiver.prune_idempotency),
+        ]
+        for name, verb, days, candidates, run in steps:
+            if options["only"] and options["only"] != name:
+                continue
+            # each shard archives its own rows
+            if options["dry_run"]:
+                n = sum(on_every_shard(lambda: candidates(days).count()).values())
+                self.stdout.write(f"{name}: {n} rows older than {days:g} days")
+            else:
+                n = sum(on_every_shard(lambda: run(days, max_batches=options["max_batches"])).values())
+                self.stdout.write(f"{name}: {n} rows {verb} (older than {days:g} days)")
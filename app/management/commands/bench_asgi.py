@@ -0,0 +1,175 @@
+import asyncio
+import io
+import json
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+PAYLOAD = {
+    "amount": "297.00",
+    "currency": "BRL",
+    "payment_method": "card",
+    "installments": 3,
+    "splits": [
+        {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+        {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 30},
+    ],
+}
+
+ENDPOINTS = {
+    "quote": ("/api/v1/checkout/quote", "/api/v1/async/checkout/quote"),
+    "payments": ("/api/v1/payments", "/api/v1/async/payments"),
+}
+
+
+def _check(url, status_code, content):
+    if status_code >= 400:
+        raise CommandError(f"{url} answered {status_code}: {content[:200]!r}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests/s and p99 latency of the sync DRF views behind the project's WSGI application with "
+        "the sync and native async views behind its ASGI application, at the same concurrency. Requests are "
+        "handed to the WSGI/ASGI callables in-process, so the numbers exclude HTTP server overhead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--endpoint", choices=[*ENDPOINTS, "all"], default="quote")
+        parser.add_argument("--requests", type=int, default=2000, help="requests per run")
+        parser.add_argument("--concurrency", type=int, default=8, help="WSGI threads / in-flight ASGI requests")
+        parser.add_argument("--yes", action="store_true", help="allow the payments runs to write rows")
+
+    def handle(self, *args, **options):
+        endpoints = list(ENDPOINTS) if options["endpoint"] == "all" else [options["endpoint"]]
+        if "payments" in endpoints and not options["yes"]:
+            raise CommandError("the payments runs create payments; pass --yes to confirm it targets a scratch database")
+
+        n, concurrency = options["requests"], options["concurrency"]
+        self.stdout.write(f"{'endpoint':<10} {'server':<11} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+        for endpoint in endpoints:
+            sync_url, async_url = ENDPOINTS[endpoint]
+            runs = [
+                ("wsgi", self._run_wsgi, sync_url),
+                ("asgi-sync", self._run_asgi, sync_url),
+                ("asgi-async", self._run_asgi, async_url),
+            ]
+            for server, run, url in runs:
+                prefix = uuid.uuid4().hex[:8]
+                keys = [f"bench-{prefix}-{i}" for i in range(n)]
+                start = time.perf_counter()
+                timings = run(url, keys, concurrency)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"{endpoint:<10} {server:<11} {n / elapsed:>9.1f} " + self._fmt(timings))
+
+    @staticmethod
+    def _run_wsgi(url, keys, concurrency):
+        from cakto_engine.wsgi import application
+
+        body = json.dumps(PAYLOAD).encode()
+
+        def call(key):
+            environ = {
+                "REQUEST_METHOD": "POST",
+                "PATH_INFO": url,
+                "SCRIPT_NAME": "",
+                "QUERY_STRING": "",
+                "SERVER_NAME": "testserver",
+                "SERVER_PORT": "80",
+                "SERVER_PROTOCOL": "HTTP/1.1",
+                "CONTENT_TYPE": "application/json",
+                "CONTENT_LENGTH": str(len(body)),
+                "HTTP_HOST": "testserver",
+                "HTTP_IDEMPOTENCY_KEY": key,
+                "wsgi.input": io.BytesIO(body),
+                "wsgi.url_scheme": "http",
+                "wsgi.errors": sys.stderr,
+                "wsgi.multithread": True,
+                "wsgi.multiprocess": False,
+                "wsgi.run_once": False,
+            }
+            status_line = []
+            start = time.perf_counter()
+            response = application(environ, lambda status, headers: status_line.append(status))
+            content = b"".join(response)
+            response.close()
+            elapsed = (time.perf_counter() - start) * 1000
+            _check(url, int(status_line[0].split()[0]), content)
+            return elapsed
+
+        try:
+            with ThreadPoolExecutor(concurrency) as pool:
+                return list(pool.map(call, keys))
+        finally:
+            connections.close_all()
+
+    @staticmethod
+    def _run_asgi(url, keys, concurrency):
+        from cakto_engine.asgi import application
+
+        body = json.dumps(PAYLOAD).encode()
+
+        async def call(key):
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "POST",
+                "scheme": "http",
+                "path": url,
+                "raw_path": url.encode(),
+                "query_string": b"",
+                "root_path": "",
+                "headers": [
+                    (b"host", b"testserver"),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"idempotency-key", key.encode()),
+                ],
+                "client": ("127.0.0.1", 50000),
+                "server": ("testserver", 80),
+            }
+            messages = [{"type": "http.request", "body": body, "more_body": False}]
+            disconnected = asyncio.Event()
+            sent = {}
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    sent["status"] = message["status"]
+                else:
+                    sent["body"] = sent.get("body", b"") + message.get("body", b"")
+
+            await application(scope, receive, send)
+            disconnected.set()
+            _check(url, sent["status"], sent["body"])
+
+        async def worker(queue, timings):
+            while queue:
+                key = queue.pop()
+                start = time.perf_counter()
+                await call(key)
+                timings.append((time.perf_counter() - start) * 1000)
+
+        async def main():
+            queue, timings = list(keys), []
+            await asyncio.gather(*(worker(queue, timings) for _ in range(concurrency)))
+            return timings
+
+        return asyncio.run(main())
+
+    @staticmethod
+    def _fmt(timings):
+        timings = sorted(timings)
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        return f"{statistics.median(timings):>9.3f} {p99:>9.3f}"
@@ -0,0 +1,49 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from app.api.payment_request import PaymentRequestError, parse_payment_request, parse_with_serializer
+
+
+def _payload(n_splits):
+    percents = [100 // n_splits] * n_splits
+    percents[0] += 100 - sum(percents)
+    return {
+        "amount": "297.00",
+        "currency": "BRL",
+        "payment_method": "card",
+        "installments": 3,
+        "splits": [{"recipient_id": f"recipient_{i}", "role": "affiliate", "percent": p} for i, p in enumerate(percents)],
+    }
+
+
+CASES = {
+    **{f"valid, {n} splits": _payload(n) for n in (1, 3, 5)},
+    "unsupported method (422)": {**_payload(2), "payment_method": "boleto"},
+    "invalid amount (400)": {**_payload(2), "amount": "abc"},
+}
+
+
+def _call(parse, body):
+    try:
+        parse(body)
+    except PaymentRequestError:
+        pass
+
+
+class Command(BaseCommand):
+    help = "Time parse_payment_request against PaymentRequestSerializer + validate_payment_request_data."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--number", type=int, default=5000, help="parses per timing")
+        parser.add_argument("--repeat", type=int, default=5, help="timings per case; the best one is reported")
+
+    def handle(self, *args, **options):
+        number, repeat = options["number"], options["repeat"]
+        self.stdout.write(f"{'case':<26} {'drf us':>9} {'lean us':>9} {'speedup':>8}")
+        for name, body in CASES.items():
+            drf, lean = (
+                min(timeit.repeat(lambda: _call(parse, body), number=number, repeat=repeat)) / number * 1e6
+                for parse in (parse_with_serializer, parse_payment_request)
+            )
+            self.stdout.write(f"{name:<26} {drf:>9.2f} {lean:>9.2f} {drf / lean:>7.1f}x")
@@ -0,0 +1,112 @@
+import random
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from app.models import LedgerEntry, OutboxEvent, Payment
+from app.services.payment_recorder import replay_responses
+
+BODY = {
+    "amount": "297.00",
+    "currency": "BRL",
+    "payment_method": "card",
+    "installments": 3,
+    "splits": [
+        {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+        {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 30},
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure idempotent replay latency while the payment/outbox tables grow. "
+        "Seeds rows into the configured database: run it against a scratch DB."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="payments to reach (e.g. 10000000)")
+        parser.add_argument("--checkpoints", type=int, default=5, help="measure at this many table sizes (log-spaced)")
+        parser.add_argument("--samples", type=int, default=200, help="replays timed per checkpoint")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument("--json-path", action="store_true", help="also time the old payload__payment_id outbox lookup")
+        parser.add_argument("--yes", action="store_true", help="do not ask before writing rows")
+
+    def handle(self, *args, **options):
+        if not options["yes"]:
+            raise CommandError("this command inserts millions of rows; pass --yes to confirm it targets a scratch database")
+
+        target, n_checkpoints = options["rows"], options["checkpoints"]
+        checkpoints = sorted({max(1, int(target ** ((i + 1) / n_checkpoints))) for i in range(n_checkpoints)})
+        prefix = uuid.uuid4().hex[:6]
+        seeded = 0
+        self.stdout.write(f"{'rows':>12} {'p50 ms':>9} {'p99 ms':>9}" + (f" {'json p50':>9} {'json p99':>9}" if options["json_path"] else ""))
+        for checkpoint in checkpoints:
+            while seeded < checkpoint:
+                n = min(options["chunk_size"], checkpoint - seeded)
+                self._seed(prefix, seeded, n)
+                seeded += n
+            keys = [f"{prefix}-{random.randrange(seeded)}" for _ in range(options["samples"])]
+            line = f"{seeded:>12} " + self._fmt(self._time(keys, self._replay))
+            if options["json_path"]:
+                line += " " + self._fmt(self._time(keys, self._replay_json_path))
+            self.stdout.write(line)
+
+    @staticmethod
+    def _seed(prefix, start, n):
+        payments = [
+            Payment(
+                payment_id=f"pmt_{prefix}{start + i:010d}",
+                status="captured",
+                gross_amount=Decimal("297.00"),
+                platform_fee_amount=Decimal("26.70"),
+                net_amount=Decimal("270.30"),
+                payment_method="card",
+                installments=3,
+                idempotency_key=f"{prefix}-{start + i}",
+                request_body=BODY,
+            )
+            for i in range(n)
+        ]
+        with transaction.atomic():
+            Payment.objects.bulk_create(payments)
+            LedgerEntry.objects.bulk_create(
+                LedgerEntry(payment=p, recipient_id=r, role=role, amount=Decimal(a))
+                for p in payments
+                for r, role, a in (("producer_1", "producer", "189.21"), ("affiliate_9", "affiliate", "81.09"))
+            )
+            OutboxEvent.objects.bulk_create(
+                OutboxEvent(type="payment_captured", payment=p, payload={"payment_id": p.payment_id, "status": "captured"})
+                for p in payments
+            )
+
+    @staticmethod
+    def _replay(key):
+        payment = Payment.objects.filter(idempotency_key=key).first()
+        return replay_responses([payment])
+
+    @staticmethod
+    def _replay_json_path(key):
+        # the lookup used before OutboxEvent had a payment foreign key
+        payment = Payment.objects.filter(idempotency_key=key).first()
+        list(payment.ledger_entries.values("recipient_id", "role", "amount"))
+        return OutboxEvent.objects.filter(payload__payment_id=payment.payment_id).first()
+
+    @staticmethod
+    def _time(keys, fn):
+        timings = []
+        for key in keys:
+            start = time.perf_counter()
+            fn(key)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    @staticmethod
+    def _fmt(timings):
+        timings = sorted(timings)
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        return f"{statistics.median(timings):>9.3f} {p99:>9.3f}"
@@ -0,0 +1,58 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from app.services.benchmarks import compare_results, default_cases, load_results, run_suite
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the benchmark suite (calculators, quote/payment views, replays, outbox growth) against a "
+        "throwaway test database and write the results as JSON; --compare diffs them with an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default="benchmark-results.json", help="where to write the results")
+        parser.add_argument("--iterations", type=int, default=200, help="timed calls per case")
+        parser.add_argument("--warmup", type=int, default=20, help="untimed calls per case")
+        parser.add_argument("--outbox-sizes", default="0,10000,100000", help="outbox table sizes for the growth cases")
+        parser.add_argument("--only", help="run the cases whose name contains this text")
+        parser.add_argument("--compare", help="results JSON of an earlier run (e.g. the previous commit)")
+        parser.add_argument("--metric", default="p50_us", choices=["mean_us", "min_us", "p50_us", "p95_us", "p99_us"])
+        parser.add_argument("--threshold", type=float, default=0.10, help="slowdown reported as a regression (0.10 = 10%%)")
+        parser.add_argument("--fail-on-regression", action="store_true", help="exit with an error when a case regressed")
+
+    def handle(self, *args, **options):
+        baseline = load_results(options["compare"]) if options["compare"] else None
+        sizes = [int(s) for s in options["outbox_sizes"].split(",") if s.strip()]
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(f"{'case':<48} {'p50 us':>10} {'p99 us':>10} {'ops/s':>10}")
+            results = run_suite(
+                default_cases(sizes),
+                iterations=options["iterations"],
+                warmup=options["warmup"],
+                only=options["only"],
+                progress=lambda name, r: self.stdout.write(f"{name:<48} {r['p50_us']:>10.1f} {r['p99_us']:>10.1f} {r['ops_per_sec']:>10.1f}"),
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        Path(options["output"]).write_text(json.dumps(results, indent=2) + "\n")
+        self.stdout.write(f"results written to {options['output']}")
+
+        if baseline is not None:
+            rows = compare_results(baseline, results, metric=options["metric"], threshold=options["threshold"])
+            self.stdout.write(f"\n{'case':<48} {'baseline':>10} {'current':>10} {'change':>8}")
+            for row in rows:
+                flag = "  REGRESSION" if row["regression"] else ""
+                self.stdout.write(f"{row['case']:<48} {row['baseline']:>10.1f} {row['current']:>10.1f} {row['change']:>+8.1%}{flag}")
+            regressions = [r["case"] for r in rows if r["regression"]]
+            if regressions and options["fail_on_regression"]:
+                raise CommandError(f"{len(regressions)} case(s) regressed: {', '.join(regressions)}")
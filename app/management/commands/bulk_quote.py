@@ -0,0 +1,116 @@
+import csv
+import json
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from app.services.bulk_quote import bulk_quote, fee_table_from_percentages, remainder_indexes
+from app.services.split_calculator import SplitCalculationError, format_cents
+
+
+def _read_rows(path: Path, fmt: str):
+    """Yield order dicts from a JSONL file (one request body per line) or a CSV file.
+
+    CSV files need the columns `amount`, `payment_method`, `installments`
+    and `splits` (a JSON list); an optional `id` column is passed through.
+    """
+    with path.open(newline="") as fh:
+        if fmt == "jsonl":
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            for row in csv.DictReader(fh):
+                row["splits"] = json.loads(row["splits"])
+                yield row
+
+
+class Command(BaseCommand):
+    help = "Re-price orders from a CSV/JSONL file with the vectorized quote engine."
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="orders file (.csv or .jsonl)")
+        parser.add_argument("--output", required=True, help="quotes file (.csv or .jsonl)")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="input format (default: from the extension)")
+        parser.add_argument("--fee-table", help='JSON file like {"card": {"1": "3.99", "2": "6.99"}, "pix": {"1": "0"}}')
+        parser.add_argument("--chunk-size", type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        src, dst = Path(options["input"]), Path(options["output"])
+        in_fmt = options["format"] or ("csv" if src.suffix == ".csv" else "jsonl")
+        out_fmt = "csv" if dst.suffix == ".csv" else "jsonl"
+
+        fee_table = None
+        if options["fee_table"]:
+            with open(options["fee_table"]) as fh:
+                fee_table = fee_table_from_percentages(json.load(fh))
+
+        rows = _read_rows(src, in_fmt)
+        total = 0
+        with dst.open("w", newline="") as out:
+            writer = None
+            if out_fmt == "csv":
+                writer = csv.writer(out)
+                writer.writerow(["id", "gross_amount", "platform_fee_amount", "net_amount", "receivables"])
+            while True:
+                chunk = list(islice(rows, options["chunk_size"]))
+                if not chunk:
+                    break
+                try:
+                    quotes = self._quote_chunk(chunk, fee_table)
+                except (SplitCalculationError, ValueError, KeyError) as e:
+                    raise CommandError(f"orders {total}..{total + len(chunk) - 1}: {e}")
+                for order, quote in zip(chunk, quotes):
+                    if writer:
+                        writer.writerow([order.get("id", ""), quote["gross_amount"], quote["platform_fee_amount"], quote["net_amount"], json.dumps(quote["receivables"])])
+                    else:
+                        if "id" in order:
+                            quote = {"id": order["id"], **quote}
+                        out.write(json.dumps(quote) + "\n")
+                total += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"quoted {total} orders into {dst}"))
+
+    @staticmethod
+    def _quote_chunk(chunk, fee_table):
+        width = max(len(order["splits"]) for order in chunk)
+        amounts, methods, installments = [], [], []
+        percents = [[0] * width for _ in chunk]
+        producers = [[False] * width for _ in chunk]
+        for row, order in enumerate(chunk):
+            cents = Decimal(str(order["amount"])) * 100
+            if cents != cents.to_integral_value():
+                raise ValueError(f"amount must have at most 2 decimal places: {order['amount']}")
+            amounts.append(int(cents))
+            methods.append(order["payment_method"])
+            installments.append(int(order.get("installments") or 1))
+            for col, split in enumerate(order["splits"]):
+                percents[row][col] = int(split["percent"])
+                producers[row][col] = split.get("role") == "producer"
+
+        percents_arr = np.asarray(percents, dtype=np.int64)
+        result = bulk_quote(
+            amounts,
+            methods,
+            installments,
+            percents_arr,
+            remainder_indexes(percents_arr, np.asarray(producers, dtype=bool)),
+            fee_table=fee_table,
+        )
+        receivables = result.receivable_cents.tolist()
+        gross, fee, net = result.gross_cents.tolist(), result.fee_cents.tolist(), result.net_cents.tolist()
+        return [
+            {
+                "gross_amount": format_cents(gross[row]),
+                "platform_fee_amount": format_cents(fee[row]),
+                "net_amount": format_cents(net[row]),
+                "receivables": [
+                    {"recipient_id": s["recipient_id"], "role": s.get("role"), "amount": format_cents(receivables[row][col])}
+                    for col, s in enumerate(order["splits"])
+                ],
+            }
+            for row, order in enumerate(chunk)
+        ]
@@ -0,0 +1,45 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.services.accounting_check import run_check
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify gross = fee + net, ledger total = net and exactly one outbox event for every payment, "
+        "in parallel id-range shards; resumable through --checkpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="worker processes")
+        parser.add_argument("--shard-size", type=int, default=50_000, help="payment ids per shard (unit of work and checkpoint)")
+        parser.add_argument("--chunk-size", type=int, default=5_000, help="payment ids per aggregate query")
+        parser.add_argument("--checkpoint", help="JSON file recording finished shards; an existing one is resumed")
+        parser.add_argument("--restart", action="store_true", help="ignore (and replace) an existing checkpoint")
+        parser.add_argument("--report", default="accounting-mismatches.jsonl", help="mismatch report (one JSON object per line)")
+        parser.add_argument("--fail-on-mismatch", action="store_true", help="exit with an error when a mismatch is found")
+
+    def handle(self, *args, **options):
+        if options["restart"] and options["checkpoint"] and os.path.exists(options["checkpoint"]):
+            os.remove(options["checkpoint"])
+        try:
+            checkpoint = run_check(
+                workers=options["workers"],
+                shard_size=options["shard_size"],
+                chunk_size=options["chunk_size"],
+                checkpoint_path=options["checkpoint"],
+                progress=lambda done, total, found: self.stderr.write(f"shards {done}/{total}, mismatches {found}"),
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        count = 0
+        with open(options["report"], "w") as fh:
+            for mismatch in checkpoint.mismatches():
+                fh.write(json.dumps(mismatch) + "\n")
+                count += 1
+        self.stdout.write(f"{count} mismatches written to {options['report']}")
+        if count and options["fail_on_mismatch"]:
+            raise CommandError(f"{count} accounting mismatches found")
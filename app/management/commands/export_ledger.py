@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.services.export import DATASETS, FORMATS, ExportError, day_bounds, export_lines, parse_bound
+
+
+class Command(BaseCommand):
+    help = "Stream payments or ledger entries to a CSV/JSONL file with keyset pagination (constant memory)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=list(DATASETS))
+        parser.add_argument("--output", default="-", help="file to write ('-' for stdout)")
+        parser.add_argument("--format", choices=FORMATS, help="output format (default: from the extension, else csv)")
+        parser.add_argument("--date", help="export the rows created on this day (YYYY-MM-DD)")
+        parser.add_argument("--since", help="created at or after this date/datetime")
+        parser.add_argument("--until", help="created before this date/datetime")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="rows per keyset page")
+
+    def handle(self, *args, **options):
+        output = options["output"]
+        fmt = options["format"] or ("jsonl" if output.endswith(".jsonl") else "csv")
+        try:
+            if options["date"]:
+                since, until = day_bounds(options["date"])
+            else:
+                since, until = parse_bound(options["since"]), parse_bound(options["until"])
+            lines = export_lines(options["dataset"], fmt, since=since, until=until, chunk_size=options["chunk_size"])
+        except ExportError as e:
+            raise CommandError(str(e))
+
+        rows = 0
+        if output == "-":
+            for line in lines:
+                self.stdout.write(line, ending="")
+                rows += 1
+            return
+        with open(output, "w", newline="", encoding="utf-8") as out:
+            for line in lines:
+                out.write(line)
+                rows += 1
+        rows -= fmt == "csv"  # header
+        self.stderr.write(f"{rows} {options['dataset']} rows written to {output}")
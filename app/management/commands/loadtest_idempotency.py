@@ -0,0 +1,76 @@
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+from rest_framework.test import APIClient
+
+from app.models import Payment
+
+PAYLOAD = {
+    "amount": "297.00",
+    "currency": "BRL",
+    "payment_method": "card",
+    "installments": 3,
+    "splits": [
+        {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+        {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 30},
+    ],
+}
+
+
+def _post(key):
+    try:
+        response = APIClient().post("/api/v1/payments", PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY=key)
+        return response.status_code
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire parallel payment requests at the view stack and check that each idempotency key "
+        "produced exactly one payment. Writes rows into the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--keys", type=int, default=10, help="distinct keys the duplicate run spreads requests over")
+        parser.add_argument("--threads", type=int, default=32)
+        parser.add_argument("--yes", action="store_true", help="do not ask before writing rows")
+
+    def handle(self, *args, **options):
+        if not options["yes"]:
+            raise CommandError("this command creates payments; pass --yes to confirm it targets a scratch database")
+
+        n, threads = options["requests"], options["threads"]
+        prefix = uuid.uuid4().hex[:8]
+        runs = {
+            "distinct": [f"{prefix}-d-{i}" for i in range(n)],
+            "duplicates": [f"{prefix}-x-{i % options['keys']}" for i in range(n)],
+        }
+        self.stdout.write(f"{'run':<12} {'req/s':>9} {'201':>6} {'200':>6} {'409':>6} {'other':>6}")
+        for name, keys in runs.items():
+            start = time.perf_counter()
+            with ThreadPoolExecutor(threads) as pool:
+                codes = Counter(pool.map(_post, keys))
+            elapsed = time.perf_counter() - start
+            other = sum(v for k, v in codes.items() if k not in (200, 201, 409))
+            self.stdout.write(
+                f"{name:<12} {len(keys) / elapsed:>9.1f} {codes[201]:>6} {codes[200]:>6} {codes[409]:>6} {other:>6}"
+            )
+
+            per_key = (
+                Payment.objects.filter(idempotency_key__in=set(keys))
+                .values("idempotency_key")
+                .annotate(n=Count("id", distinct=True), entries=Count("ledger_entries"))
+            )
+            doubled = [row["idempotency_key"] for row in per_key if row["n"] != 1 or row["entries"] != len(PAYLOAD["splits"])]
+            if doubled:
+                raise CommandError(f"{name}: keys with duplicated payments or ledger entries: {doubled[:10]}")
+            if codes[201] != len(per_key):
+                raise CommandError(f"{name}: {codes[201]} created responses for {len(per_key)} payments")
+        self.stdout.write(self.style.SUCCESS("one payment per key"))
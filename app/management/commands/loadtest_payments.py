@@ -0,0 +1,123 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from rest_framework.test import APIClient
+
+from cakto_engine.database import PROFILES
+
+PAYLOAD = {
+    "amount": "297.00",
+    "currency": "BRL",
+    "payment_method": "card",
+    "installments": 3,
+    "splits": [
+        {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+        {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 30},
+    ],
+}
+
+
+def _post(key):
+    start = time.perf_counter()
+    try:
+        response = APIClient().post("/api/v1/payments", PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY=key)
+        status_code = response.status_code
+    except Exception:
+        status_code = 0
+    finally:
+        # what request_finished does in a server: honours CONN_MAX_AGE / the pool
+        close_old_connections()
+    return status_code, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure payment throughput of the configured database with parallel requests; "
+        "--profiles runs it once per database profile (e.g. sqlite,sqlite-wal) and compares them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--profiles", help=f"comma-separated profiles to compare: {', '.join(PROFILES)}")
+        parser.add_argument("--json", action="store_true", help="print the result as one JSON line")
+        parser.add_argument("--migrate", action="store_true", help="apply migrations first")
+        parser.add_argument("--yes", action="store_true", help="do not ask before writing rows")
+
+    def handle(self, *args, **options):
+        if not options["yes"]:
+            raise CommandError("this command creates payments; pass --yes to confirm it targets a scratch database")
+        if options["profiles"]:
+            return self._compare(options)
+
+        if options["migrate"]:
+            call_command("migrate", verbosity=0)
+        n = options["requests"]
+        prefix = uuid.uuid4().hex[:8]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options["threads"]) as pool:
+            results = list(pool.map(_post, [f"{prefix}-{i}" for i in range(n)]))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(t for _, t in results)
+        db = settings.DATABASES["default"]
+        result = {
+            "vendor": connection.vendor,
+            "conn_max_age": db.get("CONN_MAX_AGE", 0),
+            "pool": bool(db.get("OPTIONS", {}).get("pool")),
+            "journal_mode": self._journal_mode(),
+            "requests": n,
+            "threads": options["threads"],
+            "req_per_sec": round(n / elapsed, 1),
+            "p50_ms": round(statistics.median(latencies) * 1000, 2),
+            "p99_ms": round(latencies[min(n - 1, int(n * 0.99))] * 1000, 2),
+            "created": sum(1 for code, _ in results if code == 201),
+            "errors": sum(1 for code, _ in results if code != 201),
+        }
+        if options["json"]:
+            self.stdout.write(json.dumps(result))
+        else:
+            for key, value in result.items():
+                self.stdout.write(f"{key:<14} {value}")
+
+    @staticmethod
+    def _journal_mode():
+        if connection.vendor != "sqlite":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            return cursor.fetchone()[0]
+
+    def _compare(self, options):
+        names = [p.strip() for p in options["profiles"].split(",") if p.strip()]
+        unknown = [p for p in names if p not in PROFILES]
+        if unknown:
+            raise CommandError(f"unknown profiles {unknown}; expected some of {', '.join(PROFILES)}")
+
+        self.stdout.write(f"{'profile':<22} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in names:
+                env = {**os.environ, **PROFILES[name]}
+                if env["DATABASE_ENGINE"] == "sqlite":
+                    # a fresh file per profile, so they start from the same state
+                    env["SQLITE_PATH"] = os.path.join(tmp, f"{name}.sqlite3")
+                cmd = [
+                    sys.executable, "manage.py", "loadtest_payments", "--yes", "--json", "--migrate",
+                    "--requests", str(options["requests"]), "--threads", str(options["threads"]),
+                ]
+                proc = subprocess.run(cmd, env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+                if proc.returncode != 0:
+                    raise CommandError(f"{name}: {proc.stderr.strip()[-2000:]}")
+                r = json.loads(proc.stdout.strip().splitlines()[-1])
+                self.stdout.write(f"{name:<22} {r['req_per_sec']:>9.1f} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['errors']:>7}")
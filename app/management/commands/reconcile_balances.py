@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from app.services.balances import reconcile_balances
+
+
+class Command(BaseCommand):
+    help = "Recompute recipient balances from the ledger in chunks and report (or --fix) any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500, help="recipients checked per transaction")
+        parser.add_argument("--fix", action="store_true", help="overwrite drifted balances with the ledger totals")
+        parser.add_argument("--fail-on-drift", action="store_true", help="exit with an error when drift is found")
+
+    def handle(self, *args, **options):
+        checked = drifted = 0
+        for n, drifts in reconcile_balances(chunk_size=options["chunk_size"], fix=options["fix"]):
+            checked += n
+            drifted += len(drifts)
+            for d in drifts:
+                self.stdout.write(
+                    f"{'' if d.shard == DEFAULT_DB_ALIAS else f'[{d.shard}] '}{d.recipient_id}: stored {d.stored_balance:.2f} ({d.stored_count} entries), "
+                    f"ledger {d.ledger_balance:.2f} ({d.ledger_count} entries), drift {d.difference:+.2f}"
+                )
+        action = "fixed" if options["fix"] else "found"
+        self.stdout.write(f"{checked} recipients checked, drift {action} in {drifted}")
+        if drifted and options["fail_on_drift"] and not options["fix"]:
+            raise CommandError(f"{drifted} recipient balance(s) drifted from the ledger")
@@ -0,0 +1,64 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from app.services.outbox_relay import OutboxRelay, get_publisher, outbox_lag_metrics
+
+
+def _run_worker(options):
+    # each process opens its own DB connections
+    connections.close_all()
+    relay = OutboxRelay(
+        get_publisher(),
+        batch_size=options["batch_size"],
+        lease_seconds=options["lease_seconds"],
+        max_attempts=options["max_attempts"],
+        backoff_base=options["backoff_base"],
+        backoff_max=options["backoff_max"],
+    )
+    try:
+        relay.run(poll_interval=options["poll_interval"], once=options["once"])
+    except KeyboardInterrupt:
+        pass
+    return relay.stats()
+
+
+class Command(BaseCommand):
+    help = "Publish pending outbox events in batches (see app.services.outbox_relay)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="seconds to sleep when there is nothing to claim")
+        parser.add_argument("--lease-seconds", type=float, default=60, help="claims not settled within this time are retried")
+        parser.add_argument("--max-attempts", type=int, default=10, help="events failing this many times are marked failed")
+        parser.add_argument("--backoff-base", type=float, default=1.0)
+        parser.add_argument("--backoff-max", type=float, default=300.0)
+        parser.add_argument("--workers", type=int, default=1, help="number of relay processes")
+        parser.add_argument("--once", action="store_true", help="exit once the backlog is drained")
+        parser.add_argument("--metrics", action="store_true", help="only print backlog/lag metrics")
+
+    def handle(self, *args, **options):
+        if options["metrics"]:
+            self._print_metrics()
+            return
+
+        if options["workers"] <= 1:
+            results = [_run_worker(options)]
+        else:
+            connections.close_all()
+            with multiprocessing.get_context("fork").Pool(options["workers"]) as pool:
+                results = pool.map(_run_worker, [options] * options["workers"])
+
+        for stats in results:
+            last_lag = stats["last_lag_seconds"]
+            self.stdout.write(
+                f"worker {stats['worker_id'][:8]}: published={stats['published']} failures={stats['failures']} "
+                f"dead={stats['dead']} last_lag={'-' if last_lag is None else f'{last_lag:.3f}s'} "
+                f"max_lag={stats['max_lag_seconds']:.3f}s"
+            )
+        self._print_metrics()
+
+    def _print_metrics(self):
+        metrics = outbox_lag_metrics()
+        self.stdout.write(" ".join(f"{k}={v}" for k, v in metrics.items()))
@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.services.replay import load_fee_overrides, run_replay
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-run every stored payment request through a split calculator and fee table version and "
+        "diff gross, fee, net and ledger amounts with the persisted ones, in parallel id-range shards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calculator", help="dotted path of a SplitCalculatorInterface (default: SPLIT_CALCULATOR)")
+        parser.add_argument("--fee-table", help="fee table JSON in the FEE_TABLE_FILE format (default: the current table)")
+        parser.add_argument("--workers", type=int, default=4, help="worker processes")
+        parser.add_argument("--shard-size", type=int, default=50_000, help="payment ids per shard (unit of work)")
+        parser.add_argument("--chunk-size", type=int, default=2_000, help="payment ids per query")
+        parser.add_argument("--report", default="replay-diffs.jsonl", help="difference report (one JSON object per line)")
+        parser.add_argument("--fail-on-diff", action="store_true", help="exit with an error when a payment differs")
+
+    def handle(self, *args, **options):
+        try:
+            overrides = load_fee_overrides(options["fee_table"]) if options["fee_table"] else None
+        except (OSError, ValueError) as e:
+            raise CommandError(f"cannot read fee table: {e}")
+
+        with open(options["report"], "w") as fh:
+
+            def write(diffs):
+                fh.writelines(json.dumps(d) + "\n" for d in diffs)
+
+            stats = run_replay(
+                calculator=options["calculator"],
+                fee_overrides=overrides,
+                workers=options["workers"],
+                shard_size=options["shard_size"],
+                chunk_size=options["chunk_size"],
+                on_diffs=write,
+                progress=lambda done, total, s: self.stderr.write(
+                    f"shards {done}/{total}, replayed {s.replayed}, differing {sum(s.mismatched.values())}"
+                ),
+            )
+
+        differing = sum(stats.mismatched.values())
+        self.stdout.write(f"{stats.replayed} payments replayed, {stats.matched} identical, {differing} differing")
+        for name, n in stats.mismatched.most_common():
+            self.stdout.write(f"  {name}: {n}")
+        self.stdout.write(f"differences written to {options['report']}")
+        if differing and options["fail_on_diff"]:
+            raise CommandError(f"{differing} payments differ from their replay")
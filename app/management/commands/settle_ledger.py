@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.services.export import ExportError, parse_bound
+from app.services.settlement import settle
+
+
+class Command(BaseCommand):
+    help = "Group unsettled ledger entries into per-recipient/role settlement batches, in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cutoff", help="settle entries created up to this ISO date/datetime (default: now)")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="entries settled per transaction")
+        parser.add_argument("--run-id", help="finish an interrupted run (with its --cutoff)")
+
+    def handle(self, *args, **options):
+        try:
+            cutoff = parse_bound(options["cutoff"])
+            run = settle(
+                cutoff=cutoff,
+                chunk_size=options["chunk_size"],
+                run_id=options["run_id"],
+                progress=lambda r: self.stderr.write(f"{r.entries} entries settled"),
+            )
+        except (ExportError, ValueError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            f"run {run.run_id}: {run.entries} entries settled into {run.settlements} settlements, total {run.total:.2f}"
+        )
@@ -0,0 +1,39 @@
+import statistics
+
+from django.core.management.base import BaseCommand
+
+from app.services.startup import QUOTE_PATH, measure_startup
+
+COLUMNS = ("setup_ms", "first_request_ms", "second_request_ms", "ready_ms", "process_ms")
+
+
+class Command(BaseCommand):
+    help = (
+        "Start fresh worker processes and report the median time of django.setup() (imports and warm-up), "
+        "of the first and second request and of the whole process, with and without the warm-up."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="processes started per profile")
+        parser.add_argument("--path", default=QUOTE_PATH, help="endpoint of the timed requests (POSTed a sample quote body)")
+        parser.add_argument("--no-compare", action="store_true", help="only measure the configured settings (no WARMUP=0 profile)")
+
+    def handle(self, *args, **options):
+        if options["no_compare"]:
+            profiles = {"configured": {}}
+        else:
+            profiles = {"warmup on": {"WARMUP": "1"}, "warmup off": {"WARMUP": "0"}}
+
+        self.stdout.write(f"{'profile':<12} " + " ".join(f"{c[:-3]:>15}" for c in COLUMNS))
+        for name, env in profiles.items():
+            runs = [measure_startup(options["path"], env) for _ in range(options["runs"])]
+            medians = {c: statistics.median(r[c] for r in runs) for c in COLUMNS}
+            self.stdout.write(f"{name:<12} " + " ".join(f"{medians[c]:>15.1f}" for c in COLUMNS))
+            last = runs[-1]
+            if last["warmup_ms"]:
+                steps = ", ".join(f"{step} {ms:.1f}" for step, ms in last["warmup_ms"].items())
+                self.stdout.write(f"{'':<12} warm-up ms: {steps}")
+            self.stdout.write(
+                f"{'':<12} {last['modules']} modules loaded, drf-spectacular views loaded: {last['spectacular_loaded']}"
+                f" ({last['spectacular_modules']} drf-spectacular modules)"
+            )
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.11 on 2026-10-17 20:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def link_outbox_to_payments(apps, schema_editor):
+    """Fill `OutboxEvent.payment` from the `payload.payment_id` of existing rows."""
+    db = schema_editor.connection.alias
+    OutboxEvent = apps.get_model('app', 'OutboxEvent')
+    Payment = apps.get_model('app', 'Payment')
+    batch = []
+    events = OutboxEvent.objects.using(db).filter(payment__isnull=True).only('id', 'payload').order_by('id')
+    for event in events.iterator(chunk_size=2000):
+        batch.append(event)
+        if len(batch) == 2000:
+            _link_batch(db, Payment, OutboxEvent, batch)
+            batch = []
+    _link_batch(db, Payment, OutboxEvent, batch)
+
+
+def _link_batch(db, Payment, OutboxEvent, events):
+    payment_ids = {(e.payload or {}).get('payment_id') for e in events}
+    pks = dict(Payment.objects.using(db).filter(payment_id__in=payment_ids).values_list('payment_id', 'id'))
+    linked = []
+    for e in events:
+        pk = pks.get((e.payload or {}).get('payment_id'))
+        if pk is not None:
+            e.payment_id = pk
+            linked.append(e)
+    OutboxEvent.objects.using(db).bulk_update(linked, ['payment'], batch_size=500)
+
+
+def clear_duplicate_idempotency_keys(apps, schema_editor):
+    """Keep each idempotency key on its first payment only, so it can become unique.
+
+    Later payments with the same key (duplicates recorded before the key was
+    enforced) keep their rows but lose the key.
+    """
+    db = schema_editor.connection.alias
+    Payment = apps.get_model('app', 'Payment')
+    duplicates = (
+        Payment.objects.using(db).filter(idempotency_key__isnull=False)
+        .values('idempotency_key')
+        .annotate(n=Count('id'), first=Min('id'))
+        .filter(n__gt=1)
+        .values_list('idempotency_key', 'first')
+    )
+    for key, first in duplicates.iterator(chunk_size=2000):
+        Payment.objects.using(db).filter(idempotency_key=key).exclude(id=first).update(idempotency_key=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_outbox_relay_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='payment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='outbox_events', to='app.payment'),
+        ),
+        migrations.RunPython(link_outbox_to_payments, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='outboxevent',
+            name='claimed_by',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.RunPython(clear_duplicate_idempotency_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='payment',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=128, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(fields=['status', 'created_at'], name='outbox_status_created_idx'),
+        ),
+    ]
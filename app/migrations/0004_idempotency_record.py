@@ -0,0 +1,80 @@
+# Generated by Django 5.2.11 on 2026-10-17 20:43
+
+import hashlib
+import json
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_idempotency_records(apps, schema_editor):
+    """Store the replay response of payments created before this migration."""
+    Payment = apps.get_model('app', 'Payment')
+    LedgerEntry = apps.get_model('app', 'LedgerEntry')
+    OutboxEvent = apps.get_model('app', 'OutboxEvent')
+    IdempotencyRecord = apps.get_model('app', 'IdempotencyRecord')
+
+    payments = Payment.objects.filter(idempotency_key__isnull=False).order_by('id')
+    last_id = 0
+    while True:
+        batch = list(payments.filter(id__gt=last_id)[:1000])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        ledger = {}
+        for entry in LedgerEntry.objects.filter(payment__in=batch).order_by('id'):
+            ledger.setdefault(entry.payment_id, []).append(entry)
+        outboxes = {}
+        for event in OutboxEvent.objects.filter(payment__in=batch).order_by('id'):
+            outboxes.setdefault(event.payment_id, event)
+        records = []
+        for p in batch:
+            outbox = outboxes.get(p.id)
+            body = {
+                "payment_id": p.payment_id,
+                "status": p.status,
+                "gross_amount": f"{p.gross_amount:.2f}",
+                "platform_fee_amount": f"{p.platform_fee_amount:.2f}",
+                "net_amount": f"{p.net_amount:.2f}",
+                "receivables": [
+                    {"recipient_id": e.recipient_id, "role": e.role, "amount": f"{e.amount:.2f}"}
+                    for e in ledger.get(p.id, [])
+                ],
+                "outbox_event": {"type": outbox.type, "status": outbox.status} if outbox else None,
+            }
+            records.append(IdempotencyRecord(
+                key=p.idempotency_key,
+                request_hash=_request_hash(p.request_body),
+                status_code=201,
+                response_body=body,
+                created_at=p.created_at,
+            ))
+        IdempotencyRecord.objects.bulk_create(records, ignore_conflicts=True)
+
+
+def _request_hash(body):
+    # frozen copy of app.services.idempotency.request_hash
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_outbox_payment_fk_and_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=128, unique=True)),
+                ('request_hash', models.CharField(max_length=64)),
+                ('status_code', models.IntegerField()),
+                ('response_body', models.JSONField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(backfill_idempotency_records, migrations.RunPython.noop),
+    ]
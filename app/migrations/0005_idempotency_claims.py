@@ -0,0 +1,38 @@
+# Generated by Django 5.2.11 on 2026-10-17 20:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_idempotency_record'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencyrecord',
+            name='claim_token',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='idempotencyrecord',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='idempotencyrecord',
+            name='state',
+            field=models.CharField(default='completed', max_length=16),
+        ),
+        migrations.AlterField(
+            model_name='idempotencyrecord',
+            name='response_body',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='idempotencyrecord',
+            name='status_code',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.11 on 2026-10-17 21:02
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_balances(apps, schema_editor):
+    """Create the balance of every recipient already in the ledger."""
+    LedgerEntry = apps.get_model('app', 'LedgerEntry')
+    RecipientBalance = apps.get_model('app', 'RecipientBalance')
+    totals = LedgerEntry.objects.values('recipient_id').annotate(total=Sum('amount'), n=Count('id')).order_by('recipient_id')
+    RecipientBalance.objects.bulk_create(
+        (RecipientBalance(recipient_id=t['recipient_id'], balance=t['total'], entry_count=t['n']) for t in totals.iterator(chunk_size=2000)),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_idempotency_claims'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipientBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient_id', models.CharField(max_length=64, unique=True)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('entry_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.11 on 2026-10-17 21:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_export_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True)),
+                ('type', models.CharField(max_length=64)),
+                ('payment_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(max_length=32)),
+                ('attempts', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedPayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True)),
+                ('payment_id', models.CharField(db_index=True, max_length=64)),
+                ('status', models.CharField(max_length=32)),
+                ('gross_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('platform_fee_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('net_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('payment_method', models.CharField(max_length=32)),
+                ('installments', models.IntegerField(blank=True, null=True)),
+                ('idempotency_key', models.CharField(blank=True, db_index=True, max_length=128, null=True)),
+                ('request_body', models.JSONField(blank=True, null=True)),
+                ('ledger_entries', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipientbalance',
+            name='archived_balance',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=18),
+        ),
+        migrations.AddField(
+            model_name='recipientbalance',
+            name='archived_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.11 on 2026-10-17 21:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_archive_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Settlement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_id', models.CharField(max_length=32)),
+                ('recipient_id', models.CharField(max_length=64)),
+                ('role', models.CharField(max_length=32)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('entry_count', models.IntegerField(default=0)),
+                ('first_entry_at', models.DateTimeField(blank=True, null=True)),
+                ('last_entry_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(default='open', max_length=16)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['recipient_id', 'created_at'], name='settlement_recipient_idx')],
+                'constraints': [models.UniqueConstraint(fields=('run_id', 'recipient_id', 'role'), name='settlement_run_recipient_role_uniq')],
+            },
+        ),
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='settlement',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='entries', to='app.settlement'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['settlement', 'created_at', 'id'], name='ledger_settlement_created_idx'),
+        ),
+    ]
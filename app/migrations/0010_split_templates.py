@@ -0,0 +1,23 @@
+# Generated by Django 5.2.11 on 2026-10-17 21:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_settlements'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SplitTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('template_id', models.CharField(max_length=64, unique=True)),
+                ('splits', models.JSONField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.11 on 2026-10-17 21:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_split_templates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['recipient_id', 'created_at', 'payment'], name='ledger_recipient_created_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+from django.db.models import F, Max, OuterRef, Subquery
+
+BATCH_SIZE = 5000
+
+
+def align_entry_dates(apps, schema_editor):
+    """Give existing ledger entries the `created_at` of their payment, a range of ids at a time."""
+    db = schema_editor.connection.alias
+    LedgerEntry = apps.get_model('app', 'LedgerEntry')
+    Payment = apps.get_model('app', 'Payment')
+    entries = LedgerEntry.objects.using(db)
+    last = entries.aggregate(last=Max('id'))['last'] or 0
+    payment_created = Payment.objects.using(db).filter(pk=OuterRef('payment_id')).values('created_at')[:1]
+    for start in range(0, last + 1, BATCH_SIZE):
+        entries.filter(id__gte=start, id__lt=start + BATCH_SIZE).exclude(created_at=F('payment__created_at')).update(
+            created_at=Subquery(payment_created)
+        )
+
+
+class Migration(migrations.Migration):
+    # each batch commits on its own, so large ledgers are not locked for the whole run
+    atomic = False
+
+    dependencies = [
+        ('app', '0011_ledger_recipient_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(align_entry_dates, migrations.RunPython.noop),
+    ]
@@ -10,10 +10,16 @@ class Payment(models.Model):
     net_amount = models.DecimalField(max_digits=12, decimal_places=2)
     payment_method = models.CharField(max_length=32)
     installments = models.IntegerField(null=True, blank=True)
-    idempotency_key = models.CharField(max_length=128, null=True, blank=True, db_index=True)
+    idempotency_key = models.CharField(max_length=128, null=True, blank=True, unique=True)
     request_body = models.JSONField(null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # keyset pagination of exports
+            models.Index(fields=["created_at", "id"], name="payment_created_id_idx"),
+        ]
+
     def __str__(self):
         return self.payment_id
 
@@ -24,6 +30,21 @@ class LedgerEntry(models.Model):
     role = models.CharField(max_length=32)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     created_at = models.DateTimeField(default=timezone.now)
+    # payout batch the entry was paid in; null while unsettled
+    settlement = models.ForeignKey(
+        "Settlement", null=True, blank=True, on_delete=models.PROTECT, related_name="entries", db_index=False
+    )
+
+    class Meta:
+        indexes = [
+            # keyset pagination of exports
+            models.Index(fields=["created_at", "id"], name="ledger_created_id_idx"),
+            # settlement runs: unsettled entries (settlement IS NULL) in (created_at, id)
+            # order, and the entries of a settlement when its totals are computed
+            models.Index(fields=["settlement", "created_at", "id"], name="ledger_settlement_created_idx"),
+            # payments of a recipient in a date range (covers the payment query's subquery)
+            models.Index(fields=["recipient_id", "created_at", "payment"], name="ledger_recipient_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.recipient_id}:{self.amount}"
@@ -31,10 +52,155 @@ class LedgerEntry(models.Model):
 
 class OutboxEvent(models.Model):
     type = models.CharField(max_length=64)
+    payment = models.ForeignKey(Payment, null=True, blank=True, on_delete=models.SET_NULL, related_name="outbox_events")
     payload = models.JSONField()
     status = models.CharField(max_length=32, default="pending")
     created_at = models.DateTimeField(default=timezone.now)
     published_at = models.DateTimeField(null=True, blank=True)
+    # relay bookkeeping: delivery attempts, next retry (or lease expiry while
+    # "processing") and the token of the relay worker holding the claim
+    attempts = models.IntegerField(default=0)
+    available_at = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    last_error = models.TextField(blank=True, default="")
+
+    class Meta:
+        indexes = [
+            # relay polling: pending events in created_at order
+            models.Index(fields=["status", "created_at"], name="outbox_status_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.type}:{self.status}"
+
+
+class IdempotencyRecord(models.Model):
+    """Claim and final response of an idempotent request, keyed by its Idempotency-Key.
+
+    A request first inserts an "in_progress" row (the unique key makes the
+    claim atomic), then replaces it with the "completed" response in the
+    same transaction as the payment. Lets replays and conflicts be answered
+    without reading the payment tables.
+    """
+
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+
+    key = models.CharField(max_length=128, unique=True)
+    request_hash = models.CharField(max_length=64)
+    state = models.CharField(max_length=16, default=COMPLETED)
+    # owner of an in-progress claim and when it may be taken over
+    claim_token = models.CharField(max_length=32, blank=True, default="")
+    locked_until = models.DateTimeField(null=True, blank=True)
+    status_code = models.IntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.key
+
+
+class RecipientBalance(models.Model):
+    """Running total of a recipient's ledger entries.
+
+    Updated in the same transaction that writes the entries, so reading a
+    balance never scans the ledger; `reconcile_balances` recomputes it
+    from the ledger to detect drift.
+    """
+
+    recipient_id = models.CharField(max_length=64, unique=True)
+    balance = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    entry_count = models.IntegerField(default=0)
+    # part of the balance whose ledger entries were archived
+    archived_balance = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    archived_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.recipient_id}:{self.balance}"
+
+
+class SplitTemplate(models.Model):
+    """A split configuration registered once and referenced by payments through its id.
+
+    Immutable: the id is either the hash of the splits or a name chosen at
+    registration, and stored request bodies that reference it must keep
+    resolving to the same splits.
+    """
+
+    template_id = models.CharField(max_length=64, unique=True)
+    splits = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.template_id
+
+
+class Settlement(models.Model):
+    """Payout batch of one recipient and role within a settlement run.
+
+    Entries are assigned while its run is "open"; the totals are computed
+    from them when the run closes the batch.
+    """
+
+    OPEN = "open"
+    CLOSED = "closed"
+
+    run_id = models.CharField(max_length=32)
+    recipient_id = models.CharField(max_length=64)
+    role = models.CharField(max_length=32)
+    total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    entry_count = models.IntegerField(default=0)
+    first_entry_at = models.DateTimeField(null=True, blank=True)
+    last_entry_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=16, default=OPEN)
+    created_at = models.DateTimeField(default=timezone.now)
+    closed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["run_id", "recipient_id", "role"], name="settlement_run_recipient_role_uniq"),
+        ]
+        indexes = [models.Index(fields=["recipient_id", "created_at"], name="settlement_recipient_idx")]
+
+    def __str__(self):
+        return f"{self.recipient_id}:{self.role}:{self.total}"
+
+
+class ArchivedPayment(models.Model):
+    """A payment moved out of `Payment` by the archiver, with its ledger entries inlined."""
+
+    original_id = models.BigIntegerField(unique=True)
+    payment_id = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=32)
+    gross_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    platform_fee_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    net_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    payment_method = models.CharField(max_length=32)
+    installments = models.IntegerField(null=True, blank=True)
+    idempotency_key = models.CharField(max_length=128, null=True, blank=True, db_index=True)
+    request_body = models.JSONField(null=True, blank=True)
+    ledger_entries = models.JSONField(default=list)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.payment_id
+
+
+class ArchivedOutboxEvent(models.Model):
+    """A published outbox event moved out of `OutboxEvent` by the archiver."""
+
+    original_id = models.BigIntegerField(unique=True)
+    type = models.CharField(max_length=64)
+    # primary key of the payment (live or archived), not a foreign key
+    payment_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    payload = models.JSONField()
+    status = models.CharField(max_length=32)
+    attempts = models.IntegerField(default=0)
+    created_at = models.DateTimeField()
+    published_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.type}:{self.original_id}"
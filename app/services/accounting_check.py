@@ -0,0 +1,173 @@
+"""Accounting discrepancy checks over every `Payment`.
+
+For each payment: ``gross = fee + net``, the sum of its ledger entries
+equals ``net_amount``, and it has exactly one `OutboxEvent` (live or in
+`ArchivedOutboxEvent`; events archived to JSONL segments cannot be seen, so
+use the table sink where this check matters). The payment id
+range of every database in ``DATABASE_SHARDS`` is cut into shards processed
+by a pool of worker processes; a worker reads its shard in chunks, with one
+grouped (aggregate) query per table per chunk, and returns the mismatches
+(tagged with the database). Finished shards and their mismatches are saved
+to a JSON checkpoint, so an interrupted run resumes where it stopped.
+"""
+import json
+import multiprocessing
+import os
+from decimal import Decimal
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Count, Max, Min, Sum
+
+from app.models import ArchivedOutboxEvent, LedgerEntry, OutboxEvent, Payment
+
+from .sharding import shard_aliases, use_shard
+
+GROSS_MISMATCH = "gross_not_fee_plus_net"
+LEDGER_MISMATCH = "ledger_total_not_net"
+OUTBOX_MISMATCH = "outbox_events_not_one"
+
+_ZERO = Decimal("0")
+
+
+def check_chunk(lo: int, hi: int) -> List[Dict]:
+    """Mismatches of the payments with ``lo <= id < hi``."""
+    payments = list(
+        Payment.objects.filter(id__gte=lo, id__lt=hi)
+        .order_by("id")
+        .values_list("id", "payment_id", "gross_amount", "platform_fee_amount", "net_amount")
+    )
+    if not payments:
+        return []
+    ledger = dict(
+        LedgerEntry.objects.filter(payment_id__gte=lo, payment_id__lt=hi)
+        .values("payment_id")
+        .annotate(total=Sum("amount"))
+        .order_by()
+        .values_list("payment_id", "total")
+    )
+    # published events may already sit in the archive table
+    outbox: Dict[int, int] = {}
+    for model in (OutboxEvent, ArchivedOutboxEvent):
+        counts = (
+            model.objects.filter(payment_id__gte=lo, payment_id__lt=hi)
+            .values("payment_id")
+            .annotate(n=Count("id"))
+            .order_by()
+            .values_list("payment_id", "n")
+        )
+        for pk, n in counts:
+            outbox[pk] = outbox.get(pk, 0) + n
+
+    mismatches = []
+    for pk, payment_id, gross, fee, net in payments:
+        found = []
+        if gross != fee + net:
+            found.append({"check": GROSS_MISMATCH, "expected": f"{gross:.2f}", "actual": f"{fee + net:.2f}"})
+        total = ledger.get(pk) or _ZERO
+        if total != net:
+            found.append({"check": LEDGER_MISMATCH, "expected": f"{net:.2f}", "actual": f"{total:.2f}"})
+        events = outbox.get(pk, 0)
+        if events != 1:
+            found.append({"check": OUTBOX_MISMATCH, "expected": 1, "actual": events})
+        mismatches.extend({"id": pk, "payment_id": payment_id, **m} for m in found)
+    return mismatches
+
+
+def check_shard(shard: Tuple[str, int, int, int]) -> Tuple[str, int, List[Dict]]:
+    """Check ids ``[lo, hi)`` of database `alias` in chunks of `chunk_size` ids;
+    returns ``(alias, lo, mismatches)``.
+
+    The alias travels with the work unit: `use_shard` does not reach pool workers.
+    """
+    alias, lo, hi, chunk_size = shard
+    mismatches = []
+    with use_shard(alias):
+        for start in range(lo, hi, chunk_size):
+            mismatches.extend({**m, "shard": alias} for m in check_chunk(start, min(start + chunk_size, hi)))
+    return alias, lo, mismatches
+
+
+def _init_worker():
+    # forked workers must not share the parent's DB connections
+    connections.close_all()
+
+
+def _key(alias: str, lo: int) -> str:
+    return f"{alias}:{lo}"
+
+
+class Checkpoint:
+    """Shards already checked (by database and first id, see `_key`) and their
+    mismatches, in a JSON file."""
+
+    def __init__(self, path: Optional[str], shard_size: int):
+        self.path = path
+        self.shard_size = shard_size
+        self.done: Dict[str, List[Dict]] = {}
+        if path and os.path.exists(path):
+            with open(path) as fh:
+                state = json.load(fh)
+            if state.get("shard_size") != shard_size:
+                raise ValueError(f"checkpoint {path} was written with shard size {state.get('shard_size')}, not {shard_size}")
+            # checkpoints written before sharding only name the first id
+            self.done = {key if ":" in key else _key(DEFAULT_DB_ALIAS, int(key)): found for key, found in state["done"].items()}
+
+    def record(self, alias: str, lo: int, mismatches: List[Dict]) -> None:
+        self.done[_key(alias, lo)] = mismatches
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump({"shard_size": self.shard_size, "done": self.done}, fh)
+        os.replace(tmp, self.path)
+
+    def mismatches(self) -> Iterator[Dict]:
+        order = {alias: index for index, alias in enumerate(shard_aliases())}
+
+        def position(key):
+            alias, _, lo = key.rpartition(":")
+            return order.get(alias, len(order)), alias, int(lo)
+
+        for key in sorted(self.done, key=position):
+            yield from self.done[key]
+
+
+def run_check(
+    workers: int = 4,
+    shard_size: int = 50_000,
+    chunk_size: int = 5_000,
+    checkpoint_path: Optional[str] = None,
+    progress: Optional[Callable[[int, int, int], None]] = None,
+) -> Checkpoint:
+    """Check every payment of every database shard; returns the checkpoint
+    holding all mismatches.
+
+    `progress(done, total, found)` is called after each shard.
+    """
+    checkpoint = Checkpoint(checkpoint_path, shard_size)
+    shards = []
+    for alias in shard_aliases():
+        bounds = Payment.objects.using(alias).aggregate(lo=Min("id"), hi=Max("id"))
+        if bounds["lo"] is None:
+            continue
+        # shards are aligned on multiples of shard_size so checkpoints stay valid as payments are added
+        first = bounds["lo"] - bounds["lo"] % shard_size
+        shards += [(alias, lo, lo + shard_size, chunk_size) for lo in range(first, bounds["hi"] + 1, shard_size)]
+    if not shards:
+        return checkpoint
+    todo = [s for s in shards if _key(s[0], s[1]) not in checkpoint.done]
+
+    def collect(results):
+        for alias, lo, found in results:
+            checkpoint.record(alias, lo, found)
+            if progress:
+                progress(len(checkpoint.done), len(shards), sum(len(f) for f in checkpoint.done.values()))
+
+    if workers <= 1 or len(todo) <= 1:
+        collect(map(check_shard, todo))
+    else:
+        connections.close_all()
+        with multiprocessing.get_context("fork").Pool(workers, initializer=_init_worker) as pool:
+            collect(pool.imap_unordered(check_shard, todo))
+    return checkpoint
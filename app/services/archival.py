@@ -0,0 +1,259 @@
+"""Time-based archival of published outbox events and old payments.
+
+`Archiver` moves rows out of the hot tables in bounded batches: it picks
+the ids of at most `batch_size` candidates, then copies them to an
+`ArchiveSink` and deletes them in one short transaction, so no lock is held
+for longer than a batch.
+
+- Published outbox events older than ``OUTBOX_AFTER_DAYS`` (by
+  ``published_at``) leave `OutboxEvent`, which the relay polls.
+- Payments older than ``PAYMENTS_AFTER_DAYS`` whose outbox events are all
+  published and whose ledger entries are all settled (see
+  `app.services.settlement`, which only reads `LedgerEntry`) leave together
+  with their ledger entries and outbox events.
+  The archived amounts are recorded on `RecipientBalance` so balances and
+  their reconciliation stay correct.
+- `IdempotencyRecord` rows are deleted after ``IDEMPOTENCY_RETENTION_DAYS``.
+  Replays are answered from these records, never from the payment tables,
+  so a key stays answerable for the whole window even after its payment is
+  archived. The window may not be shorter than ``PAYMENTS_AFTER_DAYS``,
+  and a record is kept past it while its payment is still live: a live
+  payment without its record would turn a replay into a duplicate key
+  error.
+
+Sinks: `TableSink` (``ArchivedPayment``/``ArchivedOutboxEvent``, the default)
+or `JsonlSink` (gzip-compressed JSONL segments, one per batch). Segments
+are written and synced before the rows are deleted, so a crash can
+duplicate a batch in the archive (rows carry their original id) but never
+lose one.
+
+An `Archiver` works on the current shard; ``manage.py archive`` runs every
+step on each shard in turn (see `app.services.sharding.on_every_shard`).
+"""
+import gzip
+import json
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from app.models import ArchivedOutboxEvent, ArchivedPayment, IdempotencyRecord, LedgerEntry, OutboxEvent, Payment
+
+from .balances import apply_archived_entries
+
+OUTBOX_FIELDS = ("id", "type", "payment_id", "payload", "status", "attempts", "created_at", "published_at")
+PAYMENT_FIELDS = (
+    "id", "payment_id", "status", "gross_amount", "platform_fee_amount", "net_amount",
+    "payment_method", "installments", "idempotency_key", "request_body", "created_at",
+)
+LEDGER_FIELDS = ("payment_id", "recipient_id", "role", "amount", "created_at", "settlement_id")
+
+
+class ArchiveSink(ABC):
+    """Destination of archived rows (dicts of column values, ``id`` being the original key)."""
+
+    @abstractmethod
+    def write_outbox(self, rows: List[Dict]) -> None:
+        pass
+
+    @abstractmethod
+    def write_payments(self, rows: List[Dict]) -> None:
+        """Payment rows, each with its ``ledger_entries`` list."""
+
+
+class TableSink(ArchiveSink):
+    """Archive tables in the same database, written in the batch's transaction."""
+
+    def write_outbox(self, rows: List[Dict]) -> None:
+        ArchivedOutboxEvent.objects.bulk_create(
+            [ArchivedOutboxEvent(original_id=r["id"], **{k: v for k, v in r.items() if k != "id"}) for r in rows],
+            ignore_conflicts=True,
+        )
+
+    def write_payments(self, rows: List[Dict]) -> None:
+        ArchivedPayment.objects.bulk_create(
+            [
+                ArchivedPayment(
+                    original_id=r["id"],
+                    ledger_entries=[_jsonable(e) for e in r["ledger_entries"]],
+                    **{k: v for k, v in r.items() if k not in ("id", "ledger_entries")},
+                )
+                for r in rows
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def _jsonable(row: Dict) -> Dict:
+    out = {}
+    for key, value in row.items():
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = f"{value:.2f}"
+        elif isinstance(value, list):
+            value = [_jsonable(v) if isinstance(v, dict) else v for v in value]
+        out[key] = value
+    return out
+
+
+class JsonlSink(ArchiveSink):
+    """One gzip-compressed JSONL segment per batch under ``<directory>/<kind>/``."""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def _write(self, kind: str, rows: List[Dict]) -> Path:
+        folder = self.directory / kind
+        folder.mkdir(parents=True, exist_ok=True)
+        name = f"{kind}-{timezone.now():%Y%m%dT%H%M%S}-{rows[0]['id']}-{uuid.uuid4().hex[:6]}.jsonl.gz"
+        path = folder / name
+        tmp = folder / f".{name}.tmp"
+        with open(tmp, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as fh:
+                for row in rows:
+                    fh.write(json.dumps(_jsonable(row), separators=(",", ":")).encode() + b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, path)
+        return path
+
+    def write_outbox(self, rows: List[Dict]) -> None:
+        self._write("outbox", rows)
+
+    def write_payments(self, rows: List[Dict]) -> None:
+        self._write("payments", rows)
+
+
+class Archiver:
+    def __init__(
+        self,
+        sink: ArchiveSink,
+        batch_size: int = 500,
+        pause: float = 0.0,
+        now: Optional[Callable[[], datetime]] = None,
+    ):
+        self.sink = sink
+        self.batch_size = batch_size
+        # seconds to sleep between batches, leaving room for the write traffic
+        self.pause = pause
+        self.now = now or timezone.now
+
+    def _batches(self, candidates, move: Callable[[List[int]], int], max_batches: Optional[int]) -> int:
+        moved = batches = 0
+        while max_batches is None or batches < max_batches:
+            ids = list(candidates.order_by("id").values_list("id", flat=True)[: self.batch_size])
+            if not ids:
+                break
+            with transaction.atomic(using=router.db_for_write(candidates.model)):
+                moved += move(ids)
+            batches += 1
+            if self.pause:
+                time.sleep(self.pause)
+        return moved
+
+    def outbox_candidates(self, days: float):
+        cutoff = self.now() - timedelta(days=days)
+        return OutboxEvent.objects.filter(status="published", published_at__lt=cutoff)
+
+    def archive_outbox(self, days: float, max_batches: Optional[int] = None) -> int:
+        """Move published events older than `days`; returns how many."""
+
+        def move(ids):
+            rows = list(OutboxEvent.objects.filter(id__in=ids, status="published").values(*OUTBOX_FIELDS))
+            if rows:
+                self.sink.write_outbox(rows)
+            return OutboxEvent.objects.filter(id__in=[r["id"] for r in rows]).delete()[0]
+
+        return self._batches(self.outbox_candidates(days), move, max_batches)
+
+    @staticmethod
+    def _archivable(payments):
+        """`payments` whose outbox events are all published and ledger entries all settled."""
+        unpublished = OutboxEvent.objects.filter(payment=OuterRef("pk")).exclude(status="published")
+        unsettled = LedgerEntry.objects.filter(payment=OuterRef("pk"), settlement__isnull=True)
+        return payments.exclude(Exists(unpublished)).exclude(Exists(unsettled))
+
+    def payment_candidates(self, days: float):
+        cutoff = self.now() - timedelta(days=days)
+        return self._archivable(Payment.objects.filter(created_at__lt=cutoff))
+
+    def archive_payments(self, days: float, max_batches: Optional[int] = None) -> int:
+        """Move payments older than `days` with their ledger entries and outbox events; returns how many."""
+
+        def move(ids):
+            # re-check under the transaction: an event may have been re-queued
+            payments = list(self._archivable(Payment.objects.filter(id__in=ids)).values(*PAYMENT_FIELDS))
+            if not payments:
+                return 0
+            ids = [p["id"] for p in payments]
+            entries: Dict[int, List[Dict]] = {pk: [] for pk in ids}
+            for entry in LedgerEntry.objects.filter(payment_id__in=ids).order_by("id").values(*LEDGER_FIELDS):
+                entries[entry.pop("payment_id")].append(entry)
+            for payment in payments:
+                payment["ledger_entries"] = entries[payment["id"]]
+            events = list(OutboxEvent.objects.filter(payment_id__in=ids).values(*OUTBOX_FIELDS))
+
+            if events:
+                self.sink.write_outbox(events)
+            self.sink.write_payments(payments)
+            apply_archived_entries((e["recipient_id"], e["amount"]) for es in entries.values() for e in es)
+            OutboxEvent.objects.filter(id__in=[e["id"] for e in events]).delete()
+            LedgerEntry.objects.filter(payment_id__in=ids).delete()
+            Payment.objects.filter(id__in=ids).delete()
+            return len(ids)
+
+        return self._batches(self.payment_candidates(days), move, max_batches)
+
+    def idempotency_candidates(self, days: float):
+        cutoff = self.now() - timedelta(days=days)
+        # a payment that could not be archived yet (unpublished event, unsettled
+        # entries) keeps its record, or a replay would collide with its key
+        live_payment = Payment.objects.filter(idempotency_key=OuterRef("key"))
+        return IdempotencyRecord.objects.filter(
+            Q(state=IdempotencyRecord.COMPLETED, created_at__lt=cutoff)
+            | Q(state=IdempotencyRecord.IN_PROGRESS, locked_until__lt=cutoff)
+        ).exclude(Exists(live_payment))
+
+    def prune_idempotency(self, days: float, max_batches: Optional[int] = None) -> int:
+        """Delete idempotency records older than the retention window; returns how many."""
+        candidates = self.idempotency_candidates(days)
+        return self._batches(candidates, lambda ids: candidates.filter(id__in=ids).delete()[0], max_batches)
+
+
+def archive_settings() -> Dict:
+    """``ARCHIVE`` with defaults; rejects a retention window shorter than the payment age."""
+    config = {
+        "SINK": {"CLASS": "app.services.archival.TableSink", "OPTIONS": {}},
+        "OUTBOX_AFTER_DAYS": 7,
+        "PAYMENTS_AFTER_DAYS": 90,
+        "IDEMPOTENCY_RETENTION_DAYS": 90,
+        "BATCH_SIZE": 500,
+        **getattr(settings, "ARCHIVE", {}),
+    }
+    check_retention(config["PAYMENTS_AFTER_DAYS"], config["IDEMPOTENCY_RETENTION_DAYS"])
+    return config
+
+
+def check_retention(payment_days: float, idempotency_days: float) -> None:
+    if idempotency_days < payment_days:
+        raise ValueError(
+            f"IDEMPOTENCY_RETENTION_DAYS ({idempotency_days}) must be at least PAYMENTS_AFTER_DAYS ({payment_days}): "
+            "replays of live payments are answered from their idempotency records"
+        )
+
+
+def get_archive_sink(config: Optional[Dict] = None) -> ArchiveSink:
+    """Build the sink named by ``ARCHIVE["SINK"]`` (``{"CLASS": dotted path, "OPTIONS": kwargs}``)."""
+    sink = (config or archive_settings())["SINK"]
+    return import_string(sink["CLASS"])(**sink.get("OPTIONS", {}))
@@ -0,0 +1,166 @@
+"""Per-recipient balances materialized from the ledger.
+
+`apply_ledger_entries` adds new entries to `RecipientBalance` inside the
+transaction that inserts them (two statements per batch, whatever the
+number of recipients), so a balance read is a single-row lookup instead of
+a sum over the recipient's ledger. `reconcile_balances` walks the
+recipients of every shard in chunks, recomputes each balance from the
+shard's ledger (plus the entries already archived, see
+`apply_archived_entries`) and reports (optionally fixes) any drift.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from app.models import LedgerEntry, RecipientBalance
+
+from .sharding import shard_aliases, use_shard
+
+
+def balance_deltas(amounts: Iterable[Tuple[str, Decimal]]) -> Dict[str, Tuple[Decimal, int]]:
+    """Amount and number of entries to add per recipient, from (recipient_id, amount) pairs."""
+    deltas: Dict[str, Tuple[Decimal, int]] = {}
+    for recipient_id, amount in amounts:
+        total, n = deltas.get(recipient_id, (Decimal("0"), 0))
+        deltas[recipient_id] = (total + amount, n + 1)
+    return deltas
+
+
+def _add(deltas: Dict[str, Tuple[Decimal, int]], balance_field: str, count_field: str) -> None:
+    """Missing balance rows are inserted first (conflicts ignored), then one
+    ``UPDATE`` adds every delta with a ``CASE`` on the recipient. Recipients
+    are updated in sorted order so concurrent transactions lock them in the
+    same order.
+    """
+    if not deltas:
+        return
+    recipients = sorted(deltas)
+    RecipientBalance.objects.bulk_create(
+        [RecipientBalance(recipient_id=r) for r in recipients], ignore_conflicts=True, batch_size=500
+    )
+    money = DecimalField(max_digits=18, decimal_places=2)
+    RecipientBalance.objects.filter(recipient_id__in=recipients).update(
+        **{
+            balance_field: F(balance_field)
+            + Case(*(When(recipient_id=r, then=Value(deltas[r][0])) for r in recipients), output_field=money),
+            count_field: F(count_field)
+            + Case(*(When(recipient_id=r, then=Value(deltas[r][1])) for r in recipients), output_field=IntegerField()),
+            "updated_at": timezone.now(),
+        }
+    )
+
+
+def apply_ledger_entries(entries: Iterable[LedgerEntry]) -> None:
+    """Add `entries` to their recipients' balances; call inside the transaction writing them."""
+    _add(balance_deltas((e.recipient_id, e.amount) for e in entries), "balance", "entry_count")
+
+
+def apply_archived_entries(amounts: Iterable[Tuple[str, Decimal]]) -> None:
+    """Record that ledger entries ((recipient_id, amount) pairs) left the ledger.
+
+    Balances are unchanged; the archived part is what `reconcile_balances`
+    adds to the remaining ledger. Call inside the transaction deleting them.
+    """
+    _add(balance_deltas(amounts), "archived_balance", "archived_count")
+
+
+def get_balance(recipient_id: str) -> Optional[RecipientBalance]:
+    """The recipient's balance, added up over the payment shards (one row per shard)."""
+    found = []
+    for alias in shard_aliases():
+        balance = RecipientBalance.objects.using(alias).filter(recipient_id=recipient_id).first()
+        if balance is not None:
+            found.append(balance)
+    if len(found) <= 1:
+        return found[0] if found else None
+    return RecipientBalance(
+        recipient_id=recipient_id,
+        balance=sum(b.balance for b in found),
+        entry_count=sum(b.entry_count for b in found),
+        archived_balance=sum(b.archived_balance for b in found),
+        archived_count=sum(b.archived_count for b in found),
+        updated_at=max(b.updated_at for b in found),
+    )
+
+
+@dataclass
+class BalanceDrift:
+    recipient_id: str
+    stored_balance: Decimal
+    ledger_balance: Decimal
+    stored_count: int
+    ledger_count: int
+    shard: str = DEFAULT_DB_ALIAS
+
+    @property
+    def difference(self) -> Decimal:
+        return self.stored_balance - self.ledger_balance
+
+
+def _next_recipients(after: Optional[str], chunk_size: int) -> List[str]:
+    """The next `chunk_size` recipient ids, from the ledger or the balances, in order."""
+    ids = set()
+    for qs in (LedgerEntry.objects.values_list("recipient_id", flat=True), RecipientBalance.objects.values_list("recipient_id", flat=True)):
+        if after is not None:
+            qs = qs.filter(recipient_id__gt=after)
+        ids.update(qs.order_by("recipient_id").distinct()[:chunk_size])
+    return sorted(ids)[:chunk_size]
+
+
+def _reconcile_chunk(recipients: List[str], fix: bool, shard: str) -> List[BalanceDrift]:
+    # lock the stored balances first: a payment touching these recipients
+    # waits for us, so its entries are either in both reads or in neither
+    stored = {
+        b.recipient_id: b
+        for b in RecipientBalance.objects.select_for_update().filter(recipient_id__in=recipients).order_by("recipient_id")
+    }
+    ledger = {
+        row["recipient_id"]: (row["total"], row["n"])
+        for row in LedgerEntry.objects.filter(recipient_id__in=recipients)
+        .values("recipient_id")
+        .annotate(total=Sum("amount"), n=Count("id"))
+        .order_by()
+    }
+    drifts = []
+    for recipient_id in recipients:
+        balance = stored.get(recipient_id)
+        stored_total, stored_count = (balance.balance, balance.entry_count) if balance else (Decimal("0"), 0)
+        ledger_total, ledger_count = ledger.get(recipient_id, (Decimal("0"), 0))
+        if balance is not None:
+            ledger_total += balance.archived_balance
+            ledger_count += balance.archived_count
+        if stored_total != ledger_total or stored_count != ledger_count:
+            drifts.append(BalanceDrift(recipient_id, stored_total, ledger_total, stored_count, ledger_count, shard))
+    if fix and drifts:
+        now = timezone.now()
+        for drift in drifts:
+            RecipientBalance.objects.update_or_create(
+                recipient_id=drift.recipient_id,
+                defaults={"balance": drift.ledger_balance, "entry_count": drift.ledger_count, "updated_at": now},
+            )
+    return drifts
+
+
+def reconcile_balances(chunk_size: int = 500, fix: bool = False) -> Iterator[Tuple[int, List[BalanceDrift]]]:
+    """Compare every stored balance with the ledger, `chunk_size` recipients at a time.
+
+    Yields ``(recipients checked, drifts)`` per chunk; each chunk is read
+    (and, with `fix`, corrected) in its own short transaction. A recipient
+    paid on several shards has a balance row on each, checked against that
+    shard's ledger.
+    """
+    for shard in shard_aliases():
+        after = None
+        while True:
+            with use_shard(shard):
+                recipients = _next_recipients(after, chunk_size)
+                if not recipients:
+                    break
+                with transaction.atomic(using=shard):
+                    drifts = _reconcile_chunk(recipients, fix, shard)
+            yield len(recipients), drifts
+            after = recipients[-1]
@@ -0,0 +1,257 @@
+"""Benchmark suite for the quote, payment and replay hot paths.
+
+Each `Case` times one operation many times; `run_suite` returns JSON-ready
+per-case statistics and `compare_results` diffs two such runs so a
+regression between commits shows up as a percentage. The
+`python manage.py benchmark` command runs the suite against a throwaway
+test database and writes the results to a JSON file.
+"""
+import json
+import platform
+import statistics
+import subprocess
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional
+
+import django
+from django.db import connection
+
+Operation = Callable[[int], None]
+
+PAYLOAD = {
+    "amount": "297.00",
+    "currency": "BRL",
+    "payment_method": "card",
+    "installments": 3,
+    "splits": [
+        {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+        {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 30},
+    ],
+}
+
+
+@dataclass
+class Case:
+    """`setup()` runs once, untimed, and returns the operation to time.
+
+    The operation receives the iteration number, e.g. to build unique
+    idempotency keys.
+    """
+
+    name: str
+    setup: Callable[[], Operation]
+    group: str = ""
+
+
+def splits_payload(n_splits: int) -> Dict:
+    percents = [100 // n_splits] * n_splits
+    percents[0] += 100 - sum(percents)
+    roles = ["producer"] + ["affiliate"] * (n_splits - 1)
+    return {
+        **PAYLOAD,
+        "splits": [{"recipient_id": f"recipient_{i}", "role": r, "percent": p} for i, (r, p) in enumerate(zip(roles, percents))],
+    }
+
+
+def _calculator_case(calculator_path: str, n_splits: int) -> Case:
+    def setup():
+        from django.utils.module_loading import import_string
+
+        calc = import_string(calculator_path)()
+        splits = splits_payload(n_splits)["splits"]
+        amount = Decimal("297.00")
+        return lambda i: calc.calculate(amount=amount, payment_method="card", installments=3, splits=splits)
+
+    return Case(f"calculator.{calculator_path.rsplit('.', 1)[1]}.{n_splits}_splits", setup, group="calculator")
+
+
+def _client():
+    from django.test import Client
+
+    return Client()
+
+
+def _quote_view_case(cached: bool) -> Case:
+    def setup():
+        from app.services.quote_cache import get_quote_cache
+
+        client = _client()
+        cache = get_quote_cache()
+        if cache is not None:
+            cache.clear()
+
+        def op(i):
+            # a distinct amount per iteration misses the cache every time
+            body = PAYLOAD if cached else {**PAYLOAD, "amount": f"{100 + i}.00"}
+            response = client.post("/api/v1/checkout/quote", body, content_type="application/json")
+            assert response.status_code == 200, response.content
+
+        return op
+
+    return Case(f"quote_view.{'cached' if cached else 'uncached'}", setup, group="views")
+
+
+def _payment_case(prefix: str) -> Operation:
+    client = _client()
+
+    def op(i):
+        response = client.post("/api/v1/payments", PAYLOAD, content_type="application/json", headers={"idempotency-key": f"{prefix}-{i}"})
+        assert response.status_code == 201, response.content
+
+    return op
+
+
+def _replay_case(from_memory: bool) -> Case:
+    def setup():
+        from app.services.idempotency import get_idempotency_store
+
+        client = _client()
+        key = f"bench-replay-{time.monotonic_ns()}"
+        client.post("/api/v1/payments", PAYLOAD, content_type="application/json", headers={"idempotency-key": key})
+
+        def op(i):
+            if not from_memory:
+                get_idempotency_store().forget(key)
+            response = client.post("/api/v1/payments", PAYLOAD, content_type="application/json", headers={"idempotency-key": key})
+            assert response.status_code == 200, response.content
+
+        return op
+
+    return Case(f"payment_view.replay.{'cached' if from_memory else 'db'}", setup, group="views")
+
+
+def seed_published_outbox(total: int, chunk_size: int = 5000) -> None:
+    """Top the outbox up to `total` published events."""
+    from django.utils import timezone as dj_timezone
+
+    from app.models import OutboxEvent
+
+    missing = total - OutboxEvent.objects.count()
+    now = dj_timezone.now()
+    while missing > 0:
+        n = min(chunk_size, missing)
+        OutboxEvent.objects.bulk_create(
+            OutboxEvent(type="payment_captured", payload={}, status="published", published_at=now) for _ in range(n)
+        )
+        missing -= n
+
+
+def _outbox_cases(size: int) -> List[Case]:
+    def payment_setup():
+        seed_published_outbox(size)
+        return _payment_case(f"bench-outbox-{size}-{time.monotonic_ns()}")
+
+    def relay_setup():
+        from app.services.outbox_relay import InMemoryPublisher, OutboxRelay
+
+        seed_published_outbox(size)
+        relay = OutboxRelay(InMemoryPublisher(), batch_size=100)
+        create = _payment_case(f"bench-relay-{size}-{time.monotonic_ns()}")
+
+        def op(i):
+            create(i)  # leaves one pending event behind
+            relay.relay_once()
+
+        return op
+
+    return [
+        Case(f"outbox_growth.{size}.payment_view", payment_setup, group="outbox"),
+        Case(f"outbox_growth.{size}.payment_and_relay", relay_setup, group="outbox"),
+    ]
+
+
+def default_cases(outbox_sizes: Iterable[int] = (0, 10_000, 100_000)) -> List[Case]:
+    cases = [
+        _calculator_case(path, n)
+        for path in ("app.services.split_calculator.SimpleSplitCalculator", "app.services.split_calculator.CentsSplitCalculator")
+        for n in range(1, 6)
+    ]
+    cases += [
+        _quote_view_case(cached=True),
+        _quote_view_case(cached=False),
+        Case("payment_view.create", lambda: _payment_case(f"bench-create-{time.monotonic_ns()}"), group="views"),
+        _replay_case(from_memory=True),
+        _replay_case(from_memory=False),
+    ]
+    for size in sorted(outbox_sizes):
+        cases += _outbox_cases(size)
+    return cases
+
+
+def time_case(case: Case, iterations: int, warmup: int) -> Dict:
+    op = case.setup()
+    for i in range(warmup):
+        op(-1 - i)
+    timings: List[float] = []
+    for i in range(iterations):
+        start = time.perf_counter_ns()
+        op(i)
+        timings.append((time.perf_counter_ns() - start) / 1000)
+    timings.sort()
+
+    def pct(p):
+        return timings[min(len(timings) - 1, int(len(timings) * p))]
+
+    mean = statistics.fmean(timings)
+    return {
+        "group": case.group,
+        "iterations": iterations,
+        "mean_us": round(mean, 3),
+        "min_us": round(timings[0], 3),
+        "p50_us": round(statistics.median(timings), 3),
+        "p95_us": round(pct(0.95), 3),
+        "p99_us": round(pct(0.99), 3),
+        "ops_per_sec": round(1e6 / mean, 1) if mean else None,
+    }
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "commit": commit or None,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "machine": platform.machine(),
+    }
+
+
+def run_suite(
+    cases: Iterable[Case],
+    iterations: int = 200,
+    warmup: int = 20,
+    only: Optional[str] = None,
+    progress: Optional[Callable[[str, Dict], None]] = None,
+) -> Dict:
+    results = {}
+    for case in cases:
+        if only and only not in case.name:
+            continue
+        results[case.name] = time_case(case, iterations, warmup)
+        if progress:
+            progress(case.name, results[case.name])
+    return {"environment": environment(), "results": results}
+
+
+def compare_results(baseline: Dict, current: Dict, metric: str = "p50_us", threshold: float = 0.10) -> List[Dict]:
+    """Per-case change of `metric` between two runs; `regression` when slower by more than `threshold`."""
+    rows = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None or not before.get(metric):
+            continue
+        change = result[metric] / before[metric] - 1
+        rows.append({"case": name, "baseline": before[metric], "current": result[metric], "change": change, "regression": change > threshold})
+    return rows
+
+
+def load_results(path) -> Dict:
+    with open(path) as fh:
+        return json.load(fh)
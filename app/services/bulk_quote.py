@@ -0,0 +1,114 @@
+"""Vectorized quote engine for pricing simulations.
+
+Re-prices many orders at once with NumPy int64 cent arithmetic, following
+the same rules as `SimpleSplitCalculator`:
+
+- platform fee is `ROUND_HALF_UP` of ``amount * bps / 10000``;
+- each receivable is ``net * percent / 100`` rounded down;
+- the leftover cents go to the first `producer`, or to the first split with
+  the largest percent when there is no producer (see `remainder_target_index`).
+
+Inputs are columnar: one array per field and a ``(n_orders, n_splits)``
+matrix of percents, padded with zeros for orders with fewer splits.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, Mapping, Optional, Sequence
+
+import numpy as np
+
+from .fee_strategy import MAX_INSTALLMENTS, get_fee_table
+from .split_calculator import SplitCalculationError
+
+
+@dataclass
+class BulkQuoteResult:
+    gross_cents: np.ndarray
+    fee_cents: np.ndarray
+    net_cents: np.ndarray
+    receivable_cents: np.ndarray  # shape (n_orders, n_splits)
+
+
+def registry_fee_table() -> Dict[str, Dict[int, int]]:
+    """Fee table in basis points taken from the compiled `FeeTable`."""
+    fees = get_fee_table()
+    table: Dict[str, Dict[int, int]] = {}
+    for (method, installments), _ in fees.items():
+        bps = fees.basis_points(method, installments)
+        if bps is not None:
+            table.setdefault(method, {})[installments] = bps
+    return table
+
+
+def fee_table_from_percentages(percentages: Mapping[str, Mapping[int, Decimal]]) -> Dict[str, Dict[int, int]]:
+    """Convert a ``{method: {installments: percent}}`` table to basis points."""
+    table: Dict[str, Dict[int, int]] = {}
+    for method, rates in percentages.items():
+        table[method.lower()] = {}
+        for installments, pct in rates.items():
+            bps = Decimal(str(pct)) * 100
+            if bps != bps.to_integral_value():
+                raise ValueError(f"fee for {method} {installments}x is not a whole number of basis points: {pct}")
+            table[method.lower()][int(installments)] = int(bps)
+    return table
+
+
+def remainder_indexes(split_percents: np.ndarray, producer_mask: np.ndarray) -> np.ndarray:
+    """Vectorized `remainder_target_index`: first producer, else first largest percent."""
+    has_producer = producer_mask.any(axis=1)
+    return np.where(has_producer, producer_mask.argmax(axis=1), split_percents.argmax(axis=1))
+
+
+def bulk_quote(
+    amount_cents: Sequence[int],
+    payment_methods: Sequence[str],
+    installments: Sequence[int],
+    split_percents,
+    remainder_index: Sequence[int],
+    fee_table: Optional[Mapping[str, Mapping[int, int]]] = None,
+) -> BulkQuoteResult:
+    """Quote ``n`` orders at once.
+
+    `fee_table` maps method -> installments -> basis points and defaults to
+    `registry_fee_table()`; pass another table to run what-if simulations.
+    `remainder_index` is the split receiving the leftover cents of each
+    order, usually computed with `remainder_indexes`.
+    """
+    amounts = np.asarray(amount_cents, dtype=np.int64)
+    inst = np.asarray(installments, dtype=np.int64)
+    percents = np.asarray(split_percents, dtype=np.int64)
+    target = np.asarray(remainder_index, dtype=np.int64)
+    n = amounts.shape[0]
+    if percents.ndim != 2 or percents.shape[0] != n or inst.shape != (n,) or target.shape != (n,) or len(payment_methods) != n:
+        raise ValueError("all columns must describe the same number of orders")
+    if n and (amounts <= 0).any():
+        raise SplitCalculationError(f"amount must be > 0 (row {int(np.argmax(amounts <= 0))})")
+    if (percents < 0).any():
+        raise ValueError("split percents must be non-negative")
+
+    table = registry_fee_table() if fee_table is None else fee_table
+    methods, method_codes = np.unique(np.char.lower(np.asarray(payment_methods, dtype=str)), return_inverse=True)
+    # lookup matrix of basis points; -1 marks unsupported (method, installments)
+    max_inst = max(MAX_INSTALLMENTS, int(inst.max()) if n else 0)
+    bps_lookup = np.full((len(methods), max_inst + 1), -1, dtype=np.int64)
+    for code, method in enumerate(methods):
+        for i, bps in table.get(str(method), {}).items():
+            if not 0 <= bps <= 10000:
+                raise ValueError(f"fee for {method} {i}x must be between 0 and 10000 basis points")
+            if 0 <= i <= max_inst:
+                bps_lookup[code, i] = bps
+    inst = np.where(inst < 1, 1, inst)  # `installments or 1`, as in the views
+    bps = bps_lookup[method_codes.reshape(-1), inst]
+    if (bps < 0).any():
+        row = int(np.argmax(bps < 0))
+        raise SplitCalculationError(f"unsupported payment_method: {payment_methods[row]} ({int(inst[row])}x, row {row})")
+
+    # ROUND_HALF_UP for non-negative values
+    fee = (amounts * bps + 5000) // 10000
+    net = amounts - fee
+    # ROUND_DOWN for non-negative values
+    receivables = (net[:, None] * percents) // 100
+    diff = net - receivables.sum(axis=1)
+    receivables[np.arange(n), target] += diff
+
+    return BulkQuoteResult(gross_cents=amounts, fee_cents=fee, net_cents=net, receivable_cents=receivables)
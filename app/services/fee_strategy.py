@@ -1,6 +1,15 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
 from abc import ABC, abstractmethod
 from decimal import Decimal
-from typing import Dict
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
 
 
 class FeeStrategy(ABC):
@@ -16,10 +25,26 @@ class FeeStrategy(ABC):
 
 _fee_registry: Dict[str, FeeStrategy] = {}
 
+# installments compiled into the fee table for every registered method
+MAX_INSTALLMENTS = 12
+
+_fee_table: Optional["FeeTable"] = None
+_fee_table_lock = threading.Lock()
+_overrides_path: Optional[str] = None
+_overrides_mtime: Optional[float] = None
+_reload_interval = 5.0
+_next_check = 0.0
+
+
+def _invalidate_fee_table() -> None:
+    global _fee_table
+    _fee_table = None
+
 
 def register_fee_strategy(name: str):
     def _decorator(cls):
         _fee_registry[name.lower()] = cls()
+        _invalidate_fee_table()
         return cls
 
     return _decorator
@@ -39,13 +64,152 @@ class CardFeeStrategy(FeeStrategy):
         return Decimal("4.99") + Decimal("2.00") * Decimal(installments - 1)
 
 
+def _to_basis_points(pct: Decimal) -> Optional[int]:
+    bps = pct * 100
+    if bps != bps.to_integral_value():
+        return None
+    return int(bps)
+
+
+class FeeTable:
+    """Immutable fee table compiled from the registered strategies.
+
+    Holds the percentage and basis points of every (method, installments)
+    pair for installments 1..`MAX_INSTALLMENTS` (and any overridden pair),
+    so lookups are a single dict access. Pairs outside the table are
+    rejected rather than priced by the live strategies, so a table only
+    ever returns the rates its `version` fingerprints: two tables with the
+    same rates have the same version, in any process.
+    """
+
+    __slots__ = ("_rates", "methods", "version")
+
+    def __init__(self, rates: Mapping[Tuple[str, int], Decimal]):
+        self._rates = MappingProxyType({key: (pct, _to_basis_points(pct)) for key, pct in rates.items()})
+        self.methods: FrozenSet[str] = frozenset(method for method, _ in rates)
+        canonical = json.dumps(sorted((m, i, str(pct)) for (m, i), pct in rates.items()))
+        self.version = hashlib.sha256(canonical.encode()).hexdigest()[:12]
+
+    def _lookup(self, payment_method: str, installments: int) -> Tuple[Decimal, Optional[int]]:
+        method = payment_method.lower()
+        rate = self._rates.get((method, installments))
+        if rate is not None:
+            return rate
+        if method not in self.methods:
+            raise ValueError(f"unsupported payment_method: {payment_method}")
+        raise ValueError(f"unsupported installments for {payment_method}: {installments}")
+
+    def percentage(self, payment_method: str, installments: int) -> Decimal:
+        return self._lookup(payment_method, installments)[0]
+
+    def basis_points(self, payment_method: str, installments: int) -> Optional[int]:
+        return self._lookup(payment_method, installments)[1]
+
+    def items(self):
+        """Iterate over ``((method, installments), percentage)`` pairs."""
+        return ((key, pct) for key, (pct, _) in self._rates.items())
+
+
+def compile_fee_table(overrides: Optional[Mapping[str, Mapping[int, Decimal]]] = None) -> FeeTable:
+    """Build a `FeeTable` from the registry, with optional per-entry overrides.
+
+    `overrides` is ``{method: {installments: percentage}}``; methods that
+    have no registered strategy become supported through it.
+    """
+    rates: Dict[Tuple[str, int], Decimal] = {}
+    for method, strategy in _fee_registry.items():
+        for installments in range(1, MAX_INSTALLMENTS + 1):
+            rates[(method, installments)] = strategy.percentage(installments)
+    for method, by_installments in (overrides or {}).items():
+        for installments, pct in by_installments.items():
+            rates[(method.lower(), int(installments))] = Decimal(str(pct))
+    return FeeTable(rates)
+
+
+def _read_overrides(path: Optional[str]):
+    if not path:
+        return None, None
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None, None
+    with open(path) as fh:
+        return json.load(fh), mtime
+
+
+def reload_fee_table() -> FeeTable:
+    """Recompile the fee table now and make it the current one.
+
+    Reads the `FEE_TABLE_FILE` setting (a JSON file of overrides, see
+    `compile_fee_table`) and `FEE_TABLE_RELOAD_INTERVAL` (seconds between
+    checks of the file's mtime by `get_fee_table`).
+    """
+    global _fee_table, _overrides_path, _overrides_mtime, _reload_interval, _next_check
+    from django.conf import settings
+
+    with _fee_table_lock:
+        _overrides_path = getattr(settings, "FEE_TABLE_FILE", None)
+        _reload_interval = getattr(settings, "FEE_TABLE_RELOAD_INTERVAL", 5.0)
+        overrides, _overrides_mtime = _read_overrides(_overrides_path)
+        _next_check = time.monotonic() + _reload_interval
+        _fee_table = compile_fee_table(overrides)
+        return _fee_table
+
+
+def pin_fee_table(table: FeeTable) -> None:
+    """Make `table` the current fee table and stop watching `FEE_TABLE_FILE`.
+
+    For processes that must price with one specific table version (e.g.
+    replays); `reload_fee_table` goes back to the configured one.
+    """
+    global _fee_table, _overrides_path
+    with _fee_table_lock:
+        _fee_table = table
+        _overrides_path = None
+
+
+def get_fee_table() -> FeeTable:
+    """Return the current fee table, compiling it on first use.
+
+    When `FEE_TABLE_FILE` is set, its mtime is checked at most once every
+    `FEE_TABLE_RELOAD_INTERVAL` seconds and the table is rebuilt when the
+    file changes, so new fees apply without restarting the process. A file
+    that cannot be read or compiled (e.g. caught half-written) is logged and
+    the current table stays in use until the file changes again.
+    """
+    global _next_check, _overrides_mtime
+    table = _fee_table
+    if table is None:
+        return reload_fee_table()
+    if _overrides_path and time.monotonic() >= _next_check:
+        _next_check = time.monotonic() + _reload_interval
+        try:
+            mtime = os.stat(_overrides_path).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime != _overrides_mtime:
+            try:
+                return reload_fee_table()
+            except Exception:
+                logger.exception("fee table file %s is invalid; keeping fee table %s", _overrides_path, table.version)
+                with _fee_table_lock:
+                    _overrides_mtime = mtime
+    return table
+
+
 def get_fee_percentage(payment_method: str, installments: int) -> Decimal:
-    strategy = _fee_registry.get(payment_method.lower())
-    if not strategy:
-        raise ValueError(f"unsupported payment_method: {payment_method}")
-    return strategy.percentage(installments)
+    return get_fee_table().percentage(payment_method, installments)
+
+
+def get_fee_basis_points(payment_method: str, installments: int) -> Optional[int]:
+    """Return the fee rate in basis points (1 bp = 0.01%), e.g. 399 for 3.99%.
+
+    Returns None when the percentage cannot be expressed as a whole number of
+    basis points, so callers can fall back to `Decimal` arithmetic.
+    """
+    return get_fee_table().basis_points(payment_method, installments)
 
 
-def supported_payment_methods():
-    """Return a list of registered payment method names (lowercased)."""
-    return list(_fee_registry.keys())
+def supported_payment_methods() -> FrozenSet[str]:
+    """Return the registered payment method names (lowercased)."""
+    return get_fee_table().methods
@@ -0,0 +1,276 @@
+import hashlib
+import json
+import uuid
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Dict, Iterable, Mapping, Optional, Set
+
+from django.utils import timezone
+
+from .cache import LRUCache
+
+
+def request_hash(body: Any) -> str:
+    """SHA-256 of the canonical JSON of a request body (key order does not matter)."""
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    request_hash: str
+    status_code: int
+    body: Dict
+
+
+@dataclass(frozen=True)
+class InFlight:
+    """Another request holds the claim on this key and has not finished yet."""
+
+    request_hash: str
+
+
+@dataclass
+class ClaimResult:
+    token: str
+    # keys this request now owns and must complete (or release)
+    owned: Set[str] = field(default_factory=set)
+    # keys owned by someone else: their final response, or `InFlight`
+    taken: Dict[str, Any] = field(default_factory=dict)
+
+
+class IdempotencyClaimLost(Exception):
+    """A claim expired and was taken over before the payment was written."""
+
+
+class IdempotencyStore:
+    """Final responses of idempotent requests, in three tiers.
+
+    Lookups go in-process LRU -> optional shared Django cache -> the
+    `IdempotencyRecord` table, and fill the faster tiers on the way back.
+    Only completed responses are cached. A request first `claim`s its key;
+    `payment_recorder.record_payments` then swaps the claim for the final
+    response in the same transaction as the payment, so the table is always
+    authoritative.
+    """
+
+    key_prefix = "idempotency:"
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 3600, shared=None):
+        self.local = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.ttl = ttl
+        self.shared = shared
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, StoredResponse]:
+        from app.models import IdempotencyRecord
+
+        found: Dict[str, StoredResponse] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            stored = self.local.get(key)
+            if stored is not None:
+                found[key] = stored
+            else:
+                missing.append(key)
+
+        if missing and self.shared is not None:
+            shared = self.shared.get_many([self.key_prefix + k for k in missing])
+            for key in missing:
+                stored = shared.get(self.key_prefix + key)
+                if stored is not None:
+                    found[key] = stored
+                    self.local.set(key, stored)
+            missing = [k for k in missing if k not in found]
+
+        if missing:
+            for key, req_hash, status_code, body in self._completed(missing):
+                found[key] = StoredResponse(req_hash, status_code, body)
+                self.remember(key, found[key])
+        return found
+
+    async def aget(self, key: str) -> Optional[StoredResponse]:
+        return (await self.aget_many([key])).get(key)
+
+    async def aget_many(self, keys: Iterable[str]) -> Dict[str, StoredResponse]:
+        """`get_many` for async views; the table is read with the async ORM."""
+        found: Dict[str, StoredResponse] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            stored = self.local.get(key)
+            if stored is not None:
+                found[key] = stored
+            else:
+                missing.append(key)
+
+        if missing and self.shared is not None:
+            shared = await self.shared.aget_many([self.key_prefix + k for k in missing])
+            for key in missing:
+                stored = shared.get(self.key_prefix + key)
+                if stored is not None:
+                    found[key] = stored
+                    self.local.set(key, stored)
+            missing = [k for k in missing if k not in found]
+
+        if missing:
+            async for key, req_hash, status_code, body in self._completed(missing):
+                found[key] = StoredResponse(req_hash, status_code, body)
+                await self.aremember(key, found[key])
+        return found
+
+    @staticmethod
+    def _completed(keys):
+        from app.models import IdempotencyRecord
+
+        return IdempotencyRecord.objects.filter(key__in=keys, state=IdempotencyRecord.COMPLETED).values_list(
+            "key", "request_hash", "status_code", "response_body"
+        )
+
+    def claim(self, hashes: Mapping[str, str], lock_seconds: float = 30) -> ClaimResult:
+        """Atomically claim keys (key -> request hash) before doing the work.
+
+        Each key gets an "in_progress" record; the unique constraint makes
+        the insert the lock, so only one concurrent request wins a key and
+        requests for other keys never wait on each other. Claims whose
+        `locked_until` passed (a crashed request) are taken over. Costs two
+        queries whatever the number of keys, plus one per takeover.
+        """
+        from app.models import IdempotencyRecord
+
+        result = ClaimResult(token=uuid.uuid4().hex)
+        if not hashes:
+            return result
+        now = timezone.now()
+        locked_until = now + timedelta(seconds=lock_seconds)
+        IdempotencyRecord.objects.bulk_create(self._claim_rows(hashes, result.token, locked_until), ignore_conflicts=True)
+        for row in IdempotencyRecord.objects.filter(key__in=list(hashes)).values_list(*self._claim_fields):
+            takeover = self._classify(result, row, now)
+            if takeover is not None and takeover.update(
+                request_hash=hashes[row[0]], claim_token=result.token, locked_until=locked_until
+            ):
+                result.owned.add(row[0])
+            elif takeover is not None:
+                result.taken[row[0]] = InFlight(row[1])
+        for key, taken in result.taken.items():
+            if isinstance(taken, StoredResponse):
+                self.remember(key, taken)
+        return result
+
+    async def aclaim(self, hashes: Mapping[str, str], lock_seconds: float = 30) -> ClaimResult:
+        """`claim` for async views, with the same queries through the async ORM."""
+        from app.models import IdempotencyRecord
+
+        result = ClaimResult(token=uuid.uuid4().hex)
+        if not hashes:
+            return result
+        now = timezone.now()
+        locked_until = now + timedelta(seconds=lock_seconds)
+        await IdempotencyRecord.objects.abulk_create(self._claim_rows(hashes, result.token, locked_until), ignore_conflicts=True)
+        async for row in IdempotencyRecord.objects.filter(key__in=list(hashes)).values_list(*self._claim_fields):
+            takeover = self._classify(result, row, now)
+            if takeover is not None and await takeover.aupdate(
+                request_hash=hashes[row[0]], claim_token=result.token, locked_until=locked_until
+            ):
+                result.owned.add(row[0])
+            elif takeover is not None:
+                result.taken[row[0]] = InFlight(row[1])
+        for key, taken in result.taken.items():
+            if isinstance(taken, StoredResponse):
+                await self.aremember(key, taken)
+        return result
+
+    _claim_fields = ("key", "request_hash", "state", "claim_token", "locked_until", "status_code", "response_body")
+
+    @staticmethod
+    def _claim_rows(hashes: Mapping[str, str], token: str, locked_until):
+        from app.models import IdempotencyRecord
+
+        return [
+            IdempotencyRecord(
+                key=key,
+                request_hash=req_hash,
+                state=IdempotencyRecord.IN_PROGRESS,
+                claim_token=token,
+                locked_until=locked_until,
+            )
+            for key, req_hash in hashes.items()
+        ]
+
+    def _classify(self, result: ClaimResult, row, now):
+        """Sort one claimed-back row into `result`.
+
+        Returns the conditional-update queryset that takes over an expired
+        claim, or None when the row was settled here.
+        """
+        from app.models import IdempotencyRecord
+
+        key, req_hash, state, token, lock, status_code, body = row
+        if token == result.token:
+            result.owned.add(key)
+        elif state == IdempotencyRecord.COMPLETED:
+            result.taken[key] = StoredResponse(req_hash, status_code, body)
+        elif lock is not None and lock < now:
+            return IdempotencyRecord.objects.filter(key=key, state=IdempotencyRecord.IN_PROGRESS, claim_token=token)
+        else:
+            result.taken[key] = InFlight(req_hash)
+        return None
+
+    def release(self, keys: Iterable[str], token: str) -> None:
+        """Drop unfinished claims so the keys can be retried."""
+        from app.models import IdempotencyRecord
+
+        IdempotencyRecord.objects.filter(key__in=list(keys), claim_token=token, state=IdempotencyRecord.IN_PROGRESS).delete()
+
+    async def arelease(self, keys: Iterable[str], token: str) -> None:
+        from app.models import IdempotencyRecord
+
+        await IdempotencyRecord.objects.filter(
+            key__in=list(keys), claim_token=token, state=IdempotencyRecord.IN_PROGRESS
+        ).adelete()
+
+    def remember(self, key: str, stored: StoredResponse) -> None:
+        """Put a committed response in the cache tiers."""
+        self.local.set(key, stored)
+        if self.shared is not None:
+            self.shared.set(self.key_prefix + key, stored, self.ttl)
+
+    async def aremember(self, key: str, stored: StoredResponse) -> None:
+        self.local.set(key, stored)
+        if self.shared is not None:
+            await self.shared.aset(self.key_prefix + key, stored, self.ttl)
+
+    def forget(self, key: str) -> None:
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(self.key_prefix + key)
+
+    def stats(self) -> Dict:
+        return {**self.local.stats(), "shared": self.shared is not None}
+
+
+_store: Optional[IdempotencyStore] = None
+_store_config = None
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    """Return the store configured by the `IDEMPOTENCY_STORE` setting.
+
+    ``IDEMPOTENCY_STORE = {"MAX_ENTRIES": 10000, "TTL": 3600, "DJANGO_CACHE": None}``;
+    set ``DJANGO_CACHE`` to a cache alias to share the cache tier across workers.
+    """
+    global _store, _store_config
+    from django.conf import settings
+
+    config = getattr(settings, "IDEMPOTENCY_STORE", None)
+    if _store is None or config is not _store_config:
+        _store_config = config
+        config = config or {}
+        shared = None
+        if config.get("DJANGO_CACHE"):
+            from django.core.cache import caches
+
+            shared = caches[config["DJANGO_CACHE"]]
+        _store = IdempotencyStore(max_entries=config.get("MAX_ENTRIES", 10000), ttl=config.get("TTL", 3600), shared=shared)
+    return _store
@@ -0,0 +1,164 @@
+"""Time-ordered id generators.
+
+Ids sort by creation time, so new rows land at the right edge of their
+unique index instead of at random places in it, and they are long enough
+that collisions are not a concern at any volume:
+
+- `UlidGenerator`: 48-bit millisecond timestamp + 80 random bits, as 26
+  Crockford base32 characters. Ids made in the same millisecond by one
+  process increment the random part, so they stay ordered.
+- `SnowflakeGenerator`: 41-bit millisecond timestamp (from `epoch`),
+  10-bit node id and 12-bit sequence, as 13 base32 characters. Unique as
+  long as every process uses its own node id: ``node_id``/``NODE_ID`` when
+  set (one per process, e.g. from a worker index), otherwise derived from
+  the pid, again in every forked child.
+
+`get_payment_id_generator` builds the one named by the
+`PAYMENT_ID_GENERATOR` setting.
+"""
+import os
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Optional
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DECODE = {c: i for i, c in enumerate(CROCKFORD)}
+
+
+def encode_base32(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(CROCKFORD[digit])
+    return "".join(reversed(chars))
+
+
+def decode_base32(text: str) -> int:
+    value = 0
+    for c in text.upper():
+        value = value * 32 + _DECODE[c]
+    return value
+
+
+def _now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
+class IdGenerator(ABC):
+    """Produces unique, time-ordered string ids, each starting with `prefix`."""
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def new_id(self) -> str:
+        pass
+
+    @abstractmethod
+    def timestamp_ms(self, id_: str) -> int:
+        """Creation time (Unix milliseconds) encoded in an id of this generator."""
+
+
+class UlidGenerator(IdGenerator):
+    RANDOM_BITS = 80
+
+    def __init__(self, prefix: str = ""):
+        super().__init__(prefix)
+        self._reset()
+        # a forked child must not continue the parent's sequence
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._last_ms = -1
+        self._last_random = 0
+        self._lock = threading.Lock()
+
+    def new_id(self) -> str:
+        with self._lock:
+            now = max(_now_ms(), self._last_ms)
+            if now == self._last_ms:
+                self._last_random += 1
+                if self._last_random >> self.RANDOM_BITS:
+                    # 2**80 ids in one millisecond: borrow the next one
+                    now += 1
+                    self._last_random = secrets.randbits(self.RANDOM_BITS)
+            else:
+                self._last_random = secrets.randbits(self.RANDOM_BITS)
+            self._last_ms = now
+            value = (now << self.RANDOM_BITS) | self._last_random
+        return self.prefix + encode_base32(value, 26)
+
+    def timestamp_ms(self, id_: str) -> int:
+        return decode_base32(id_[len(self.prefix) : len(self.prefix) + 26]) >> self.RANDOM_BITS
+
+
+class SnowflakeGenerator(IdGenerator):
+    NODE_BITS = 10
+    SEQUENCE_BITS = 12
+    DEFAULT_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def __init__(self, node_id: Optional[int] = None, prefix: str = "", epoch: Optional[datetime] = None):
+        super().__init__(prefix)
+        if node_id is None and os.environ.get("NODE_ID"):
+            node_id = int(os.environ["NODE_ID"])
+        if node_id is not None and not 0 <= node_id < 1 << self.NODE_BITS:
+            raise ValueError(f"node id must be between 0 and {(1 << self.NODE_BITS) - 1}")
+        self._fixed_node_id = node_id
+        self.epoch_ms = int((epoch or self.DEFAULT_EPOCH).timestamp() * 1000)
+        self._reset()
+        # a forked child must not continue the parent's sequence, nor share its derived node id
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        if self._fixed_node_id is not None:
+            self.node_id = self._fixed_node_id
+        else:
+            self.node_id = os.getpid() % (1 << self.NODE_BITS)
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def new_id(self) -> str:
+        with self._lock:
+            # a clock stepping back keeps using the last timestamp
+            now = max(_now_ms() - self.epoch_ms, self._last_ms)
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & ((1 << self.SEQUENCE_BITS) - 1)
+                if self._sequence == 0:
+                    now += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            value = (now << (self.NODE_BITS + self.SEQUENCE_BITS)) | (self.node_id << self.SEQUENCE_BITS) | self._sequence
+        return self.prefix + encode_base32(value, 13)
+
+    def timestamp_ms(self, id_: str) -> int:
+        value = decode_base32(id_[len(self.prefix) : len(self.prefix) + 13])
+        return (value >> (self.NODE_BITS + self.SEQUENCE_BITS)) + self.epoch_ms
+
+
+_generator: Optional[IdGenerator] = None
+_generator_config = object()  # sentinel: not configured yet
+
+
+def get_payment_id_generator() -> IdGenerator:
+    """The generator configured by the `PAYMENT_ID_GENERATOR` setting.
+
+    ``PAYMENT_ID_GENERATOR = {"CLASS": "app.services.ids.SnowflakeGenerator",
+    "OPTIONS": {"node_id": 7}}``; ids get the ``pmt_`` prefix unless
+    ``OPTIONS`` sets another.
+    """
+    global _generator, _generator_config
+    config = getattr(settings, "PAYMENT_ID_GENERATOR", None)
+    if config is not _generator_config:
+        options = {"prefix": "pmt_", **((config or {}).get("OPTIONS") or {})}
+        cls = import_string((config or {}).get("CLASS", "app.services.ids.UlidGenerator"))
+        _generator, _generator_config = cls(**options), config
+    return _generator
@@ -0,0 +1,264 @@
+"""In-process request metrics: per-stage timings and query counts.
+
+Code marks pipeline stages with ``with stage("calculate"): ...``. While a
+request is being measured (see `app.api.instrumentation.RequestMetricsMiddleware`)
+each stage's duration is added to that request's `RequestTimings`; outside
+of one, `stage()` returns a shared no-op context manager, so the hooks cost
+a context-variable lookup when metrics are disabled.
+
+Measuring is switched on by ``REQUEST_METRICS["ENABLED"]``. Durations and
+query counts go into `Histogram`s, an HDR-style log-linear
+histogram with fixed memory and ~1.6% relative error, and are rendered in
+the Prometheus text format by `MetricsRegistry.render`.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# 2**SUB_BUCKET_BITS linear sub-buckets per power of two above the first
+SUB_BUCKET_BITS = 7
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+_HALF = _SUB_BUCKETS // 2
+
+
+class Histogram:
+    """Counts of non-negative integer values (e.g. microseconds) in log-linear buckets.
+
+    Values below 128 are counted exactly; above, each power of two is split
+    into 64 buckets, so a reported value is within 1/64 of the recorded one.
+    `highest` bounds the memory (values above it are clamped).
+    """
+
+    def __init__(self, highest: int = 3_600_000_000):
+        self.highest = highest
+        self.counts: List[int] = [0] * (self._index(highest) + 1)
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _index(value: int) -> int:
+        if value < _SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        return _SUB_BUCKETS + (shift - 1) * _HALF + (value >> shift) - _HALF
+
+    @staticmethod
+    def _highest_equivalent(index: int) -> int:
+        if index < _SUB_BUCKETS:
+            return index
+        shift, sub = divmod(index - _SUB_BUCKETS, _HALF)
+        shift += 1
+        return ((sub + _HALF + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        value = min(max(int(value), 0), self.highest)
+        index = self._index(value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, p: float) -> int:
+        """Smallest bucket bound that covers `p` (0-100) percent of the values."""
+        with self._lock:
+            if not self.count:
+                return 0
+            target = max(1, int(round(self.count * p / 100)))
+            seen = 0
+            for index, n in enumerate(self.counts):
+                seen += n
+                if seen >= target:
+                    return min(self._highest_equivalent(index), self.max)
+            return self.max
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = [0] * len(self.counts)
+            self.count = self.total = self.max = 0
+            self.min = None
+
+
+class MetricsRegistry:
+    """Histograms by metric name and labels, rendered as Prometheus summaries."""
+
+    quantiles = (0.5, 0.9, 0.95, 0.99, 0.999)
+
+    def __init__(self):
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._help: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str, scale: float = 1.0) -> None:
+        """`scale` converts recorded values to the exposed unit (1e-6 for microseconds -> seconds)."""
+        self._help[name] = (help_text, scale)
+
+    def histogram(self, name: str, labels: Labels = ()) -> Histogram:
+        try:
+            return self._histograms[name][labels]
+        except KeyError:
+            with self._lock:
+                return self._histograms.setdefault(name, {}).setdefault(labels, Histogram())
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name in sorted(self._histograms):
+            help_text, scale = self._help.get(name, ("", 1.0))
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} summary")
+            for labels, hist in sorted(self._histograms[name].items()):
+                for q in self.quantiles:
+                    lines.append(f"{name}{_labels(labels + (('quantile', str(q)),))} {_number(hist.percentile(q * 100) * scale)}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(hist.total * scale)}")
+                lines.append(f"{name}_count{_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _number(value: float) -> str:
+    return f"{value:.9g}"
+
+
+registry = MetricsRegistry()
+registry.describe("cakto_request_duration_seconds", "Request latency by view and status.", scale=1e-6)
+registry.describe("cakto_request_stage_seconds", "Time spent per pipeline stage (parse, validate, calculate, db, render).", scale=1e-6)
+registry.describe("cakto_request_queries", "Database queries per request.")
+
+
+class RequestTimings:
+    """Stage durations (nanoseconds) and the query count of one request.
+
+    Stages may nest (``validate`` runs inside ``parse``); each records its
+    own time only, so the stages of a request add up to at most its latency.
+    """
+
+    __slots__ = ("stages", "queries", "nested_ns")
+
+    def __init__(self):
+        self.stages: Dict[str, int] = {}
+        self.queries = 0
+        # time spent in stages nested in the currently open one
+        self.nested_ns = 0
+
+    def add(self, name: str, ns: int) -> None:
+        self.stages[name] = self.stages.get(name, 0) + ns
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+class _NoopStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopStage()
+
+
+class _TimedStage:
+    __slots__ = ("timings", "name", "start", "outer_nested")
+
+    def __init__(self, timings: RequestTimings, name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        timings = self.timings
+        self.outer_nested, timings.nested_ns = timings.nested_ns, 0
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter_ns() - self.start
+        timings = self.timings
+        timings.add(self.name, elapsed - timings.nested_ns)
+        timings.nested_ns = self.outer_nested + elapsed
+        return False
+
+
+def stage(name: str):
+    """Time the enclosed block as stage `name` of the current request, if it is measured."""
+    timings = _current.get()
+    if timings is None:
+        return _NOOP
+    return _TimedStage(timings, name)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """Add an externally measured duration to the current request."""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, int(seconds * 1e9))
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def begin_request() -> Tuple[RequestTimings, object]:
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token) -> None:
+    _current.reset(token)
+
+
+def metrics_enabled() -> bool:
+    return bool(getattr(settings, "REQUEST_METRICS", {}).get("ENABLED", False))
+
+
+def count_queries(execute, sql, params, many, context):
+    """Database execute wrapper counting queries of the measured request."""
+    timings = _current.get()
+    if timings is not None:
+        timings.queries += 1
+    return execute(sql, params, many, context)
+
+
+def _wrap_connection(connection, **kwargs):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def install_query_counter() -> None:
+    """Count queries on this thread's open connections and on every new one."""
+    connection_created.connect(_wrap_connection, dispatch_uid="app.services.metrics.count_queries")
+    for connection in connections.all(initialized_only=True):
+        _wrap_connection(connection)
+
+
+def observe(view: str, method: str, status_code: int, duration_us: int, timings: RequestTimings) -> None:
+    registry.histogram("cakto_request_duration_seconds", (("view", view), ("method", method), ("status", str(status_code)))).record(duration_us)
+    for name, ns in timings.stages.items():
+        registry.histogram("cakto_request_stage_seconds", (("view", view), ("stage", name))).record(ns // 1000)
+    registry.histogram("cakto_request_queries", (("view", view),)).record(timings.queries)
@@ -0,0 +1,235 @@
+"""Outbox relay: drains pending `OutboxEvent` rows to a publisher.
+
+Events are claimed in batches ordered by `created_at`. A claim stamps the
+rows with `status="processing"`, a worker token (`claimed_by`) and a lease
+(`available_at`); rows whose lease expired are claimable again, so a crashed
+worker never strands events. Delivery is at-least-once.
+
+On PostgreSQL/MySQL the candidate rows are locked with
+``SELECT ... FOR UPDATE SKIP LOCKED`` so concurrent workers never wait on
+each other. Other backends (SQLite) claim with a single conditional
+``UPDATE``, which their write lock already serializes.
+
+Each payment shard has its own outbox (an event commits with its payment):
+`relay_once` claims one batch from every shard in turn.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from app.models import OutboxEvent
+
+from .sharding import on_every_shard
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxPublisher(ABC):
+    """Delivers a batch of events. Raising marks the whole batch for retry."""
+
+    @abstractmethod
+    def publish(self, events: List[OutboxEvent]) -> None:
+        pass
+
+
+def event_message(event: OutboxEvent) -> Dict:
+    return {
+        "id": event.id,
+        "type": event.type,
+        "payload": event.payload,
+        "created_at": event.created_at.isoformat(),
+    }
+
+
+class InMemoryPublisher(OutboxPublisher):
+    """Keeps published messages in `messages`; meant for tests."""
+
+    def __init__(self):
+        self.messages: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def publish(self, events: List[OutboxEvent]) -> None:
+        with self._lock:
+            self.messages.extend(event_message(e) for e in events)
+
+
+class FilePublisher(OutboxPublisher):
+    """Appends one JSON line per event to `path`."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def publish(self, events: List[OutboxEvent]) -> None:
+        lines = "".join(json.dumps(event_message(e)) + "\n" for e in events)
+        with open(self.path, "a") as fh:
+            fh.write(lines)
+            fh.flush()
+
+
+class LoggingPublisher(OutboxPublisher):
+    """Logs each event; the default until a real broker is plugged in."""
+
+    def publish(self, events: List[OutboxEvent]) -> None:
+        for e in events:
+            logger.info("outbox event %s", json.dumps(event_message(e)))
+
+
+def get_publisher() -> OutboxPublisher:
+    """Build the publisher configured by the `OUTBOX_PUBLISHER` setting.
+
+    ``OUTBOX_PUBLISHER = {"CLASS": "app.services.outbox_relay.FilePublisher",
+    "OPTIONS": {"path": "outbox.jsonl"}}``
+    """
+    config = getattr(settings, "OUTBOX_PUBLISHER", None) or {}
+    cls = import_string(config.get("CLASS", "app.services.outbox_relay.LoggingPublisher"))
+    return cls(**config.get("OPTIONS", {}))
+
+
+class OutboxRelay:
+    def __init__(
+        self,
+        publisher: OutboxPublisher,
+        batch_size: int = 100,
+        lease_seconds: float = 60,
+        max_attempts: int = 10,
+        backoff_base: float = 1.0,
+        backoff_max: float = 300.0,
+    ):
+        self.publisher = publisher
+        self.batch_size = batch_size
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.worker_id = uuid.uuid4().hex
+        # counters for this worker
+        self.published = 0
+        self.failures = 0
+        self.dead = 0
+        self.last_lag_seconds: Optional[float] = None
+        self.max_lag_seconds = 0.0
+
+    def _claimable(self, now) -> Q:
+        pending = Q(status="pending") & (Q(available_at__isnull=True) | Q(available_at__lte=now))
+        expired = Q(status="processing", available_at__lte=now)
+        return pending | expired
+
+    def claim(self) -> List[OutboxEvent]:
+        """Claim up to `batch_size` events, oldest first."""
+        now = timezone.now()
+        token = f"{self.worker_id}:{uuid.uuid4().hex[:8]}"
+        candidates = OutboxEvent.objects.filter(self._claimable(now)).order_by("created_at", "id")
+        claim = {"status": "processing", "claimed_by": token, "available_at": now + self.lease, "attempts": F("attempts") + 1}
+
+        db = router.db_for_write(OutboxEvent)
+        with transaction.atomic(using=db):
+            if connections[db].features.has_select_for_update_skip_locked:
+                ids = list(candidates.select_for_update(skip_locked=True).values_list("id", flat=True)[: self.batch_size])
+                OutboxEvent.objects.filter(id__in=ids).update(**claim)
+            else:
+                # the claimable condition is re-checked by the UPDATE itself
+                ids = candidates.values("id")[: self.batch_size]
+                OutboxEvent.objects.filter(self._claimable(now), id__in=ids).update(**claim)
+        return list(OutboxEvent.objects.filter(claimed_by=token).order_by("created_at", "id"))
+
+    def backoff(self, attempts: int) -> float:
+        return min(self.backoff_max, self.backoff_base * (2 ** max(attempts - 1, 0)))
+
+    def relay_once(self) -> int:
+        """Claim, publish and settle one batch per shard. Returns the number of events published."""
+        return sum(on_every_shard(self.relay_batch).values())
+
+    def relay_batch(self) -> int:
+        """Claim, publish and settle one batch of the current shard."""
+        events = self.claim()
+        if not events:
+            return 0
+        token = events[0].claimed_by
+        ids = [e.id for e in events]
+        try:
+            self.publisher.publish(events)
+        except Exception as exc:  # any publisher error means "retry later"
+            logger.warning("outbox publish failed for %d events: %s", len(events), exc)
+            self._fail(events, token, exc)
+            return 0
+
+        now = timezone.now()
+        OutboxEvent.objects.filter(id__in=ids, claimed_by=token).update(
+            status="published", published_at=now, claimed_by="", available_at=None, last_error=""
+        )
+        lags = [(now - e.created_at).total_seconds() for e in events]
+        self.last_lag_seconds = sum(lags) / len(lags)
+        self.max_lag_seconds = max(self.max_lag_seconds, max(lags))
+        self.published += len(events)
+        return len(events)
+
+    def _fail(self, events: List[OutboxEvent], token: str, exc: Exception) -> None:
+        now = timezone.now()
+        self.failures += len(events)
+        by_attempts: Dict[int, List[int]] = {}
+        for e in events:
+            by_attempts.setdefault(e.attempts, []).append(e.id)
+        for attempts, ids in by_attempts.items():
+            rows = OutboxEvent.objects.filter(id__in=ids, claimed_by=token)
+            if attempts >= self.max_attempts:
+                self.dead += rows.update(status="failed", claimed_by="", available_at=None, last_error=str(exc))
+            else:
+                retry_at = now + timedelta(seconds=self.backoff(attempts))
+                rows.update(status="pending", claimed_by="", available_at=retry_at, last_error=str(exc))
+
+    def run(self, poll_interval: float = 1.0, once: bool = False, stop: Optional[threading.Event] = None) -> int:
+        """Relay until stopped; with `once`, until there is nothing left to claim."""
+        total = 0
+        while stop is None or not stop.is_set():
+            n = self.relay_once()
+            total += n
+            if n == 0:
+                if once:
+                    break
+                time.sleep(poll_interval)
+        return total
+
+    def stats(self) -> Dict:
+        return {
+            "worker_id": self.worker_id,
+            "published": self.published,
+            "failures": self.failures,
+            "dead": self.dead,
+            "last_lag_seconds": self.last_lag_seconds,
+            "max_lag_seconds": self.max_lag_seconds,
+        }
+
+
+def _backlog():
+    counts = {row["status"]: row["n"] for row in OutboxEvent.objects.order_by().values("status").annotate(n=Count("id"))}
+    oldest = OutboxEvent.objects.filter(status__in=["pending", "processing"]).aggregate(oldest=Min("created_at"))["oldest"]
+    return counts, oldest
+
+
+def outbox_lag_metrics() -> Dict:
+    """Backlog size per status and age of the oldest pending event, over every shard."""
+    counts: Dict[str, int] = {}
+    oldest = None
+    for shard_counts, shard_oldest in on_every_shard(_backlog).values():
+        for status, n in shard_counts.items():
+            counts[status] = counts.get(status, 0) + n
+        if shard_oldest is not None and (oldest is None or shard_oldest < oldest):
+            oldest = shard_oldest
+    return {
+        "pending": counts.get("pending", 0),
+        "processing": counts.get("processing", 0),
+        "published": counts.get("published", 0),
+        "failed": counts.get("failed", 0),
+        "oldest_pending_age_seconds": (timezone.now() - oldest).total_seconds() if oldest else 0.0,
+    }
@@ -0,0 +1,140 @@
+"""Read-only payment lookups for support and reconciliation tools.
+
+`list_payments` returns payments newest first, filtered by recipient,
+``created_at`` range, method and status, one page at a time with keyset
+(cursor) pagination: the cursor is the ``(created_at, shard index, id)``
+of the last row of the previous page, and the next page is read with an
+index range scan starting right after it, so page 1000 costs the same as
+page 1 (no ``OFFSET``). Each shard answers with one query on
+``payment_created_id_idx``; the recipient filter is an ``IN`` subquery on
+``ledger_recipient_created_idx``, which covers it (ledger entries carry
+their payment's ``created_at``; migration 0012 aligned the older ones).
+The ledger entries of the page are then prefetched with one query per
+shard, so a page costs two queries per shard whatever its size.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from django.db.models import Prefetch, Q, prefetch_related_objects
+from django.utils.dateparse import parse_datetime
+
+from app.models import LedgerEntry, Payment
+
+from .sharding import shard_aliases, shard_for_payment_id
+
+MAX_PAGE_SIZE = 200
+
+
+class PaymentQueryError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class PaymentFilters:
+    recipient_id: Optional[str] = None
+    payment_method: Optional[str] = None
+    status: Optional[str] = None
+    # since <= created_at < until
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Position of a payment in the listing order."""
+
+    created_at: datetime
+    shard: int
+    id: int
+
+    def encode(self) -> str:
+        raw = json.dumps([self.created_at.isoformat(), self.shard, self.id], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, value: str) -> "Cursor":
+        try:
+            created_at, shard, pk = json.loads(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+            parsed = parse_datetime(created_at)
+            if parsed is None or not isinstance(shard, int) or not isinstance(pk, int):
+                raise ValueError(value)
+        except (binascii.Error, TypeError, ValueError) as e:
+            raise PaymentQueryError(f"invalid cursor {value!r}") from e
+        return cls(parsed, shard, pk)
+
+
+@dataclass
+class PaymentPage:
+    payments: List[Payment]
+    next_cursor: Optional[str]
+
+
+def _entries() -> Prefetch:
+    return Prefetch("ledger_entries", queryset=LedgerEntry.objects.order_by("id"))
+
+
+def _filtered(alias: str, filters: PaymentFilters, upper: Optional[datetime]):
+    qs = Payment.objects.using(alias)
+    bounds = {}
+    if filters.since is not None:
+        bounds["created_at__gte"] = filters.since
+    if filters.until is not None:
+        bounds["created_at__lt"] = filters.until
+    if upper is not None:
+        bounds["created_at__lte"] = upper
+    if filters.recipient_id:
+        # the same bounds on the entries keep the subquery on a range of the index
+        qs = qs.filter(id__in=LedgerEntry.objects.filter(recipient_id=filters.recipient_id, **bounds).values("payment_id"))
+    if filters.payment_method:
+        qs = qs.filter(payment_method=filters.payment_method)
+    if filters.status:
+        qs = qs.filter(status=filters.status)
+    return qs.filter(**bounds)
+
+
+def _after(qs, cursor: Cursor, shard: int):
+    """Rows of shard `shard` that come after `cursor` in the listing order."""
+    if shard < cursor.shard:
+        return qs
+    if shard > cursor.shard:
+        return qs.filter(created_at__lt=cursor.created_at)
+    return qs.filter(Q(created_at__lt=cursor.created_at) | Q(id__lt=cursor.id))
+
+
+def list_payments(filters: PaymentFilters, cursor: Optional[str] = None, limit: int = 50) -> PaymentPage:
+    """One page of payments (with their ledger entries), newest first."""
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise PaymentQueryError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    after = Cursor.decode(cursor) if cursor else None
+    rows = []
+    for index, alias in enumerate(shard_aliases()):
+        qs = _filtered(alias, filters, after.created_at if after else None)
+        if after is not None:
+            qs = _after(qs, after, index)
+        rows += [(p.created_at, index, p.id, p) for p in qs.order_by("-created_at", "-id")[: limit + 1]]
+    rows.sort(key=lambda row: row[:3], reverse=True)
+
+    by_shard: Dict[str, List[Payment]] = {}
+    for _, _, _, payment in rows[:limit]:
+        by_shard.setdefault(payment._state.db, []).append(payment)
+    for payments in by_shard.values():
+        prefetch_related_objects(payments, _entries())
+
+    next_cursor = None
+    if len(rows) > limit:
+        created_at, index, pk, _ = rows[limit - 1]
+        next_cursor = Cursor(created_at, index, pk).encode()
+    return PaymentPage([row[3] for row in rows[:limit]], next_cursor)
+
+
+def get_payment(payment_id: str) -> Optional[Payment]:
+    """The payment `payment_id` with its ledger entries, from its shard."""
+    try:
+        alias = shard_for_payment_id(payment_id)
+    except IndexError:  # names a shard that is not configured
+        return None
+    return Payment.objects.using(alias).prefetch_related(_entries()).filter(payment_id=payment_id).first()
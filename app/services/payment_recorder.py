@@ -0,0 +1,179 @@
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db import router, transaction
+
+from app.models import IdempotencyRecord, LedgerEntry, OutboxEvent, Payment
+
+from .balances import apply_ledger_entries
+from .idempotency import IdempotencyClaimLost, StoredResponse, get_idempotency_store
+from .idempotency import request_hash as hash_request_body
+from .ids import get_payment_id_generator
+from .metrics import stage
+from .sharding import current_shard, tag_payment_id
+from .split_types import QuoteResult, cents_to_decimal
+
+
+PAYMENT_CAPTURED = "payment_captured"
+
+
+def new_payment_id() -> str:
+    """A time-ordered id (see `PAYMENT_ID_GENERATOR`) naming the shard it is created for."""
+    return tag_payment_id(get_payment_id_generator().new_id(), current_shard())
+
+
+@dataclass
+class PendingPayment:
+    """A validated and calculated payment waiting to be persisted."""
+
+    idempotency_key: str
+    request_body: Any
+    payment_method: str
+    installments: int
+    result: QuoteResult
+    payment_id: str = field(default_factory=new_payment_id)
+    request_hash: str = ""
+    # token of the in-progress IdempotencyRecord claimed for this key
+    claim_token: str = ""
+
+    def __post_init__(self):
+        if not self.request_hash:
+            self.request_hash = hash_request_body(self.request_body)
+
+
+def build_payment_response(payment: Payment, receivables: List[Dict], outbox: Optional[OutboxEvent]) -> Dict:
+    """Serialize a persisted payment the way `/payments` returns it."""
+    return {
+        "payment_id": payment.payment_id,
+        "status": payment.status,
+        "gross_amount": f"{payment.gross_amount:.2f}",
+        "platform_fee_amount": f"{payment.platform_fee_amount:.2f}",
+        "net_amount": f"{payment.net_amount:.2f}",
+        "receivables": [
+            {"recipient_id": r["recipient_id"], "role": r["role"], "amount": f"{Decimal(r['amount']):.2f}"}
+            for r in receivables
+        ],
+        "outbox_event": {"type": outbox.type, "status": outbox.status} if outbox else None,
+    }
+
+
+def _build_rows(pending: PendingPayment) -> Tuple[Payment, List[LedgerEntry], OutboxEvent]:
+    result = pending.result
+    payment = Payment(
+        payment_id=pending.payment_id,
+        status="captured",
+        gross_amount=cents_to_decimal(result.gross_cents),
+        platform_fee_amount=cents_to_decimal(result.fee_cents),
+        net_amount=cents_to_decimal(result.net_cents),
+        payment_method=pending.payment_method,
+        installments=pending.installments,
+        idempotency_key=pending.idempotency_key,
+        request_body=pending.request_body,
+    )
+    entries = [
+        LedgerEntry(
+            payment=payment,
+            recipient_id=r.recipient_id,
+            role=r.role,
+            amount=cents_to_decimal(r.amount_cents),
+            # same instant as the payment, so payment queries can range over the entries' index
+            created_at=payment.created_at,
+        )
+        for r in result.receivables
+    ]
+    outbox = OutboxEvent(
+        type=PAYMENT_CAPTURED, payment=payment, payload={"payment_id": payment.payment_id, "status": "captured"}, status="pending"
+    )
+    return payment, entries, outbox
+
+
+def _created_response(pending: PendingPayment, outbox: OutboxEvent) -> Dict:
+    """`/payments` response of a new payment, rendered from its `QuoteResult`."""
+    return {
+        "payment_id": pending.payment_id,
+        "status": "captured",
+        **pending.result.as_dict(),
+        "outbox_event": {"type": outbox.type, "status": outbox.status},
+    }
+
+
+def record_payments(pending: List[PendingPayment], batch_size: int = 500) -> List[Dict]:
+    """Persist many payments with one `bulk_create` per table.
+
+    All rows, including the `IdempotencyRecord` holding each response
+    (which replaces the in-progress claim of the key) and the recipients'
+    `RecipientBalance` increments, are written inside a single transaction,
+    so the number of round trips depends on `batch_size` and not on the
+    number of payments or receivables. Returns the `/payments` response body
+    of each item, in the same order as `pending`.
+    """
+    rows = [_build_rows(p) for p in pending]
+    if not rows:
+        return []
+    responses = [_created_response(p, outbox) for p, (_, _, outbox) in zip(pending, rows)]
+    stored = [StoredResponse(p.request_hash, 201, resp) for p, resp in zip(pending, responses)]
+
+    db = router.db_for_write(Payment)
+    with stage("db"), transaction.atomic(using=db):
+        claimed = [p for p in pending if p.claim_token]
+        if claimed:
+            deleted, _ = IdempotencyRecord.objects.filter(
+                key__in=[p.idempotency_key for p in claimed],
+                claim_token__in={p.claim_token for p in claimed},
+                state=IdempotencyRecord.IN_PROGRESS,
+            ).delete()
+            if deleted != len(claimed):
+                raise IdempotencyClaimLost("idempotency claim expired before the payment was recorded")
+        Payment.objects.bulk_create([payment for payment, _, _ in rows], batch_size=batch_size)
+        # payments now carry their primary keys; rebind so the FK ids are set
+        entries: List[LedgerEntry] = []
+        for payment, payment_entries, outbox in rows:
+            for entry in payment_entries:
+                entry.payment = payment
+                entries.append(entry)
+            outbox.payment = payment
+        LedgerEntry.objects.bulk_create(entries, batch_size=batch_size)
+        apply_ledger_entries(entries)
+        OutboxEvent.objects.bulk_create([outbox for _, _, outbox in rows], batch_size=batch_size)
+        IdempotencyRecord.objects.bulk_create(
+            [
+                IdempotencyRecord(key=p.idempotency_key, request_hash=s.request_hash, status_code=s.status_code, response_body=s.body)
+                for p, s in zip(pending, stored)
+            ],
+            batch_size=batch_size,
+        )
+
+        def remember():
+            store = get_idempotency_store()
+            for p, s in zip(pending, stored):
+                store.remember(p.idempotency_key, s)
+
+        transaction.on_commit(remember, using=db)
+
+    return responses
+
+
+def record_payment(pending: PendingPayment) -> Dict:
+    """Persist a single payment; if any write fails, everything is rolled back."""
+    return record_payments([pending])[0]
+
+
+def replay_responses(payments: List[Payment]) -> Dict[str, Dict]:
+    """Rebuild the stored response of already persisted payments.
+
+    Ledger entries and outbox events are fetched with one query each,
+    whatever the number of payments. Returns a dict keyed by idempotency key.
+    """
+    if not payments:
+        return {}
+    ledger: Dict[int, List[Dict]] = {p.pk: [] for p in payments}
+    for entry in LedgerEntry.objects.filter(payment__in=payments).order_by("id").values("payment_id", "recipient_id", "role", "amount"):
+        ledger[entry["payment_id"]].append(entry)
+    outboxes: Dict[int, OutboxEvent] = {}
+    for event in OutboxEvent.objects.filter(payment__in=payments).order_by("id"):
+        outboxes.setdefault(event.payment_id, event)
+    return {
+        p.idempotency_key: build_payment_response(p, ledger[p.pk], outboxes.get(p.pk))
+        for p in payments
+    }
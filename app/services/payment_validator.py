@@ -33,9 +33,12 @@ def validate_installments(payment_method: str, installments: int) -> None:
 
 
 def validate_splits(splits: List[dict]) -> None:
-    if not (1 <= len(splits) <= 5):
+    validate_split_totals(len(splits), sum(s.get("percent", 0) for s in splits))
+
+
+def validate_split_totals(count: int, total_pct: int) -> None:
+    if not (1 <= count <= 5):
         raise PaymentValidationError("splits must be between 1 and 5", status.HTTP_400_BAD_REQUEST)
-    total_pct = sum(s.get("percent", 0) for s in splits)
     if total_pct != 100:
         raise PaymentValidationError("sum of percents must be 100", status.HTTP_400_BAD_REQUEST)
 
@@ -47,4 +50,17 @@ def validate_payment_request_data(data: dict) -> None:
     validate_payment_method(pm)
     installments = data.get("installments") or 1
     validate_installments(pm, installments)
-    validate_splits(data.get("splits", []))
\ No newline at end of file
+    validate_splits(data.get("splits", []))
+
+
+def validate_payment_request_fields(currency: str, payment_method: str, installments: int, split_count: int, total_pct: int) -> None:
+    """`validate_payment_request_data` on values already extracted by a parser."""
+    validate_payment_fields(currency, payment_method, installments)
+    validate_split_totals(split_count, total_pct)
+
+
+def validate_payment_fields(currency: str, payment_method: str, installments: int) -> None:
+    """Every validation but the splits', for splits validated in advance (split templates)."""
+    validate_currency({"currency": currency})
+    validate_payment_method(payment_method)
+    validate_installments(payment_method, installments)
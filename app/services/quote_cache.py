@@ -0,0 +1,102 @@
+import hashlib
+import json
+from decimal import Decimal
+from typing import Callable, Dict, Optional, Sequence
+
+from .cache import LRUCache
+from .fee_strategy import get_fee_table
+from .split_types import CompiledSplits, Split
+
+
+def quote_cache_key(*, amount: Decimal, payment_method: str, installments: int, splits: Sequence[Split], calculator: str = "") -> str:
+    """Canonical hash of a validated quote payload.
+
+    Only the fields that affect the calculation are hashed, normalized so
+    equivalent payloads ("100", "100.00") share a key. The fee table version
+    is part of the key, so a fee change invalidates every cached quote.
+    """
+    canonical = json.dumps(
+        [
+            calculator,
+            get_fee_table().version,
+            f"{Decimal(amount).normalize():f}",
+            payment_method.lower(),
+            installments,
+            # a compiled template's id already identifies its splits
+            splits.template_id if isinstance(splits, CompiledSplits) else [[s.recipient_id, s.role, s.percent] for s in splits],
+        ],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class QuoteCache:
+    """Bounded LRU/TTL cache in front of the split calculator.
+
+    An in-process `LRUCache` is always checked first. When `shared` is a
+    Django cache (see the `QUOTE_CACHE` setting), misses fall through to it,
+    so quotes computed by one worker are reused by the others.
+    """
+
+    key_prefix = "quote:"
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300, shared=None):
+        self.local = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.ttl = ttl
+        self.shared = shared
+        self.shared_hits = 0
+
+    def get_or_compute(self, key: str, compute: Callable[[], Dict]) -> Dict:
+        result = self.local.get(key)
+        if result is not None:
+            return result
+        if self.shared is not None:
+            result = self.shared.get(self.key_prefix + key)
+            if result is not None:
+                self.shared_hits += 1
+                self.local.set(key, result)
+                return result
+        result = compute()
+        self.local.set(key, result)
+        if self.shared is not None:
+            self.shared.set(self.key_prefix + key, result, self.ttl)
+        return result
+
+    def clear(self) -> None:
+        self.local.clear()
+
+    def stats(self) -> Dict:
+        return {**self.local.stats(), "shared_hits": self.shared_hits, "shared": self.shared is not None}
+
+
+_quote_cache: Optional[QuoteCache] = None
+_quote_cache_config = object()  # sentinel: not configured yet
+
+
+def get_quote_cache() -> Optional[QuoteCache]:
+    """Return the cache configured by the `QUOTE_CACHE` setting, or None when disabled.
+
+    ``QUOTE_CACHE = {"ENABLED": True, "MAX_ENTRIES": 10000, "TTL": 300,
+    "DJANGO_CACHE": None}``; set ``DJANGO_CACHE`` to a cache alias to share
+    entries across workers.
+    """
+    global _quote_cache, _quote_cache_config
+    from django.conf import settings
+
+    config = getattr(settings, "QUOTE_CACHE", None)
+    if config is not _quote_cache_config:
+        _quote_cache_config = config
+        config = config or {}
+        _quote_cache = None
+        if config.get("ENABLED", True):
+            shared = None
+            if config.get("DJANGO_CACHE"):
+                from django.core.cache import caches
+
+                shared = caches[config["DJANGO_CACHE"]]
+            _quote_cache = QuoteCache(
+                max_entries=config.get("MAX_ENTRIES", 10000),
+                ttl=config.get("TTL", 300),
+                shared=shared,
+            )
+    return _quote_cache
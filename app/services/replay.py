@@ -0,0 +1,188 @@
+"""Replay stored payment requests through a calculator and fee table.
+
+Every `Payment` keeps its original `request_body`. `run_replay` re-parses
+those bodies, prices them with any `SplitCalculatorInterface`
+implementation and fee table version, and diffs the result with the
+persisted gross, fee, net and ledger amounts. It is the safety net for
+rolling out a faster calculator or new fees: an empty diff means the
+change reproduces history.
+
+The payment id range of every database in ``DATABASE_SHARDS`` is cut into
+shards handed to a pool of worker processes; each worker reads its shard in
+chunks of ids (one query for the payments and one for their ledger entries
+per chunk) and returns the differences, tagged with the database, which the
+caller streams out as shards complete.
+"""
+import json
+import multiprocessing
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.db import connections
+from django.db.models import Max, Min
+from django.utils.module_loading import import_string
+
+from app.api.payment_request import PaymentRequestError, parse_payment_request
+from app.models import LedgerEntry, Payment
+
+from .fee_strategy import compile_fee_table, pin_fee_table, reload_fee_table
+from .sharding import shard_aliases, use_shard
+from .split_calculator import SplitCalculationError, SplitCalculatorInterface, get_split_calculator
+from .split_types import format_cents
+
+PAYMENT_FIELDS = ("id", "payment_id", "request_body", "gross_amount", "platform_fee_amount", "net_amount")
+
+
+@dataclass
+class ReplayStats:
+    replayed: int = 0
+    matched: int = 0
+    # differing payments by their first differing field; "rejected" counts bodies
+    # that no longer parse or validate, "request_body" payments stored without one
+    mismatched: Counter = field(default_factory=Counter)
+
+    def add(self, other: "ReplayStats") -> None:
+        self.replayed += other.replayed
+        self.matched += other.matched
+        self.mismatched.update(other.mismatched)
+
+
+def _cents(value) -> int:
+    return int(value.scaleb(2))
+
+
+def replay_payment(calc: SplitCalculatorInterface, row: Tuple, ledger: List[int]) -> Optional[Dict]:
+    """The difference between a persisted payment and its replay, or None when they match."""
+    pk, payment_id, body, gross, fee, net = row
+    base = {"id": pk, "payment_id": payment_id}
+    if body is None:
+        # stored before request bodies were kept
+        return {**base, "field": "request_body", "persisted": None, "replayed": None}
+    try:
+        req = parse_payment_request(body)
+        if req.error is not None:
+            raise SplitCalculationError(str(req.error))
+        result = calc.quote(amount=req.amount, payment_method=req.payment_method, installments=req.installments, splits=req.splits)
+    except (PaymentRequestError, SplitCalculationError) as e:
+        detail = e.detail if isinstance(e, PaymentRequestError) else str(e)
+        return {**base, "field": "rejected", "persisted": None, "replayed": detail}
+
+    persisted = {"gross_amount": _cents(gross), "platform_fee_amount": _cents(fee), "net_amount": _cents(net)}
+    replayed = {"gross_amount": result.gross_cents, "platform_fee_amount": result.fee_cents, "net_amount": result.net_cents}
+    for name, value in persisted.items():
+        if value != replayed[name]:
+            return {**base, "field": name, "persisted": format_cents(value), "replayed": format_cents(replayed[name])}
+    amounts = [r.amount_cents for r in result.receivables]
+    if amounts != ledger:
+        return {
+            **base,
+            "field": "receivables",
+            "persisted": [format_cents(c) for c in ledger],
+            "replayed": [format_cents(c) for c in amounts],
+        }
+    return None
+
+
+def replay_chunk(calc: SplitCalculatorInterface, lo: int, hi: int) -> Tuple[ReplayStats, List[Dict]]:
+    """Replay the payments with ``lo <= id < hi``."""
+    rows = list(Payment.objects.filter(id__gte=lo, id__lt=hi).order_by("id").values_list(*PAYMENT_FIELDS))
+    stats, diffs = ReplayStats(), []
+    if not rows:
+        return stats, diffs
+    ledger: Dict[int, List[int]] = {}
+    for payment_id, amount in (
+        LedgerEntry.objects.filter(payment_id__gte=lo, payment_id__lt=hi).order_by("payment_id", "id").values_list("payment_id", "amount")
+    ):
+        ledger.setdefault(payment_id, []).append(_cents(amount))
+    for row in rows:
+        diff = replay_payment(calc, row, ledger.get(row[0], []))
+        stats.replayed += 1
+        if diff is None:
+            stats.matched += 1
+        else:
+            stats.mismatched[diff["field"]] += 1
+            diffs.append(diff)
+    return stats, diffs
+
+
+# per-process replay setup, filled by `_init_worker` (or `run_replay` when inline)
+_worker: Dict = {}
+
+
+def _setup(calculator: Optional[str], fee_overrides: Optional[Dict]) -> None:
+    if fee_overrides is not None:
+        pin_fee_table(compile_fee_table(fee_overrides))
+    _worker["calc"] = import_string(calculator)() if calculator else get_split_calculator()
+
+
+def _init_worker(calculator, fee_overrides):
+    # forked workers must not share the parent's DB connections
+    connections.close_all()
+    _setup(calculator, fee_overrides)
+
+
+def replay_shard(shard: Tuple[str, int, int, int]) -> Tuple[ReplayStats, List[Dict]]:
+    """Replay ids ``[lo, hi)`` of database `alias` (passed along: `use_shard` does not reach pool workers)."""
+    alias, lo, hi, chunk_size = shard
+    stats, diffs = ReplayStats(), []
+    with use_shard(alias):
+        for start in range(lo, hi, chunk_size):
+            chunk_stats, chunk_diffs = replay_chunk(_worker["calc"], start, min(start + chunk_size, hi))
+            stats.add(chunk_stats)
+            diffs.extend({**diff, "shard": alias} for diff in chunk_diffs)
+    return stats, diffs
+
+
+def run_replay(
+    calculator: Optional[str] = None,
+    fee_overrides: Optional[Dict] = None,
+    workers: int = 4,
+    shard_size: int = 50_000,
+    chunk_size: int = 2_000,
+    on_diffs: Optional[Callable[[List[Dict]], None]] = None,
+    progress: Optional[Callable[[int, int, ReplayStats], None]] = None,
+) -> ReplayStats:
+    """Replay every payment, on every database shard, with `calculator` (dotted
+    path, default: the configured one) and the fee table compiled from
+    `fee_overrides` (default: the current one).
+
+    `on_diffs` receives the differences of each finished shard;
+    `progress(done, total, stats)` is called after each shard.
+    """
+    total = ReplayStats()
+    shards = []
+    for alias in shard_aliases():
+        bounds = Payment.objects.using(alias).aggregate(lo=Min("id"), hi=Max("id"))
+        if bounds["lo"] is not None:
+            shards += [(alias, lo, lo + shard_size, chunk_size) for lo in range(bounds["lo"], bounds["hi"] + 1, shard_size)]
+    if not shards:
+        return total
+
+    def collect(results: Iterator[Tuple[ReplayStats, List[Dict]]]):
+        for done, (stats, diffs) in enumerate(results, 1):
+            total.add(stats)
+            if diffs and on_diffs:
+                on_diffs(diffs)
+            if progress:
+                progress(done, len(shards), total)
+
+    if workers <= 1 or len(shards) <= 1:
+        _setup(calculator, fee_overrides)
+        try:
+            collect(map(replay_shard, shards))
+        finally:
+            if fee_overrides is not None:
+                reload_fee_table()
+    else:
+        connections.close_all()
+        ctx = multiprocessing.get_context("fork")
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(calculator, fee_overrides)) as pool:
+            collect(pool.imap_unordered(replay_shard, shards))
+    return total
+
+
+def load_fee_overrides(path: str) -> Dict:
+    """A fee table file, in the `FEE_TABLE_FILE` format (``{method: {installments: percentage}}``)."""
+    with open(path) as fh:
+        return json.load(fh)
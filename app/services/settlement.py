@@ -0,0 +1,155 @@
+"""Settlement of ledger entries into per-recipient payout batches.
+
+A settlement run streams the unsettled `LedgerEntry` rows in
+``(created_at, id)`` order (an index on ``(settlement, created_at, id)``
+serves them without sorting)
+and assigns them to one `Settlement` per ``(recipient_id, role)``. Each
+chunk of entries is settled in one short transaction with a fixed number of
+statements, whatever the number of entries or recipients in it:
+
+- the chunk is read (and locked) in one query;
+- settlements for recipients the run has not met yet are inserted and
+  their ids fetched;
+- one ``UPDATE`` points every entry of the chunk at its settlement.
+
+Closing the run then computes every settlement's totals in one aggregate
+pass over its entries (batches of settlements, each a single ``UPDATE``
+with correlated aggregates on the settlement index). The run keeps only
+the ``(recipient_id, role) -> settlement id`` map, so memory is bounded by
+the number of recipients, not entries. An interrupted run leaves open
+settlements whose entries are already assigned; calling `settle` again
+with its `run_id` carries on and closes them.
+
+Entries are settled on the shard holding them (see `app.services.sharding`):
+a run settles and closes each shard in turn, under the same run id.
+"""
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.db import router, transaction
+from django.db.models import Count, Max, Min, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from app.models import LedgerEntry, Settlement
+
+from .sharding import shard_aliases, use_shard
+
+Key = Tuple[str, str]
+ENTRY_FIELDS = ("created_at", "id", "recipient_id", "role")
+
+
+@dataclass
+class SettlementRun:
+    run_id: str
+    cutoff: datetime
+    entries: int = 0
+    total: Decimal = Decimal("0")
+    settlements: int = 0
+
+
+def _settlement_ids(run_id: str, keys: List[Key], known: Dict[Key, int]) -> None:
+    """Add the ids of the run's settlements for `keys` to `known`, creating the missing ones."""
+    Settlement.objects.bulk_create(
+        [Settlement(run_id=run_id, recipient_id=r, role=role) for r, role in keys], ignore_conflicts=True, batch_size=500
+    )
+    wanted = set(keys)
+    for pk, recipient_id, role in Settlement.objects.filter(
+        run_id=run_id, recipient_id__in={r for r, _ in keys}
+    ).values_list("id", "recipient_id", "role"):
+        if (recipient_id, role) in wanted:
+            known[(recipient_id, role)] = pk
+
+
+def settle_chunk(run: SettlementRun, known: Dict[Key, int], after: Optional[Tuple], chunk_size: int) -> Optional[Tuple]:
+    """Settle the next `chunk_size` unsettled entries after the ``(created_at, id)`` cursor
+    `after`; returns the new cursor, or None when no entry is left."""
+    with transaction.atomic(using=router.db_for_write(LedgerEntry)):
+        qs = LedgerEntry.objects.select_for_update().filter(settlement__isnull=True, created_at__lte=run.cutoff)
+        if after is not None:
+            # the redundant lower bound keeps the index range scan
+            qs = qs.filter(created_at__gte=after[0]).filter(Q(created_at__gt=after[0]) | Q(id__gt=after[1]))
+        rows = list(qs.order_by("created_at", "id").values_list(*ENTRY_FIELDS)[:chunk_size])
+        if not rows:
+            return None
+
+        missing = sorted({(r[2], r[3]) for r in rows} - known.keys())
+        if missing:
+            _settlement_ids(run.run_id, missing, known)
+        LedgerEntry.objects.filter(id__in=[r[1] for r in rows]).update(
+            settlement_id=Subquery(
+                Settlement.objects.filter(run_id=run.run_id, recipient_id=OuterRef("recipient_id"), role=OuterRef("role")).values("id")[:1]
+            )
+        )
+    run.entries += len(rows)
+    return rows[-1][:2]
+
+
+def settle(
+    cutoff: Optional[datetime] = None,
+    chunk_size: int = 2000,
+    run_id: Optional[str] = None,
+    close_batch_size: int = 500,
+    progress: Optional[Callable[[SettlementRun], None]] = None,
+) -> SettlementRun:
+    """Settle every entry created up to `cutoff` (default: now) into the run's settlements, then close them.
+
+    Pass the `run_id` (and `cutoff`) of an interrupted run to finish it;
+    shards it already closed are skipped.
+    """
+    shards = shard_aliases()
+    if run_id:
+        closed = {shard for shard in shards if Settlement.objects.using(shard).filter(run_id=run_id, status=Settlement.CLOSED).exists()}
+        if closed == set(shards):
+            raise ValueError(f"settlement run {run_id} is already closed")
+        shards = [shard for shard in shards if shard not in closed]
+    run = SettlementRun(run_id=run_id or uuid.uuid4().hex, cutoff=cutoff or timezone.now())
+    for shard in shards:
+        with use_shard(shard):
+            _settle_shard(run, chunk_size, close_batch_size, progress)
+    return run
+
+
+def _settle_shard(run: SettlementRun, chunk_size: int, close_batch_size: int, progress) -> None:
+    known: Dict[Key, int] = {
+        (r, role): pk for pk, r, role in Settlement.objects.filter(run_id=run.run_id).values_list("id", "recipient_id", "role")
+    }
+    cursor = None
+    while True:
+        cursor = settle_chunk(run, known, cursor, chunk_size)
+        if cursor is None:
+            break
+        if progress:
+            progress(run)
+    close_run(run.run_id, batch_size=close_batch_size)
+    totals = Settlement.objects.filter(run_id=run.run_id).aggregate(total=Sum("total"), n=Count("id"))
+    run.total += totals["total"] or Decimal("0")
+    run.settlements += totals["n"]
+
+
+def close_run(run_id: str, batch_size: int = 500) -> int:
+    """Compute the totals of the run's open settlements from their entries and close them."""
+    entries = LedgerEntry.objects.filter(settlement=OuterRef("pk")).order_by().values("settlement")
+
+    def aggregate(expression):
+        return Subquery(entries.annotate(value=expression).values("value"))
+
+    closed = 0
+    after = 0
+    while True:
+        ids = list(
+            Settlement.objects.filter(run_id=run_id, status=Settlement.OPEN, id__gt=after).order_by("id").values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return closed
+        closed += Settlement.objects.filter(id__in=ids).update(
+            total=aggregate(Sum("amount")),
+            entry_count=aggregate(Count("id")),
+            first_entry_at=aggregate(Min("created_at")),
+            last_entry_at=aggregate(Max("created_at")),
+            status=Settlement.CLOSED,
+            closed_at=timezone.now(),
+        )
+        after = ids[-1]
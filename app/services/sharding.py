@@ -0,0 +1,139 @@
+"""Routing of the payment tables across database shards.
+
+``DATABASE_SHARDS`` lists the database aliases holding payments (default:
+``["default"]``, i.e. no sharding). Everything written for one payment (the
+idempotency claim and record, the payment, its ledger entries, outbox
+event and balance increments) must share a transaction, so it all lives on
+the shard of the request's idempotency key:
+
+- `shard_for_key` maps a key to an alias with jump consistent hashing:
+  appending a shard moves only ~1/n of the keys, all of them to the new one;
+- `use_shard` selects that alias for the current request (a context
+  variable, so it follows async code and ``sync_to_async``);
+- `ShardRouter` (in ``DATABASE_ROUTERS``) sends queries on the app's
+  models (but `GLOBAL_MODELS`) to the selected alias, and to ``default``
+  outside of `use_shard`; ``migrate --database <shard>`` creates the
+  sharded tables, and the global ones only on ``default``;
+- payment ids made inside `use_shard` end with the shard index
+  (``pmt_<id>-2``; none for the first shard), so `shard_for_payment_id`
+  finds a payment without asking every shard;
+- background jobs (outbox relay, settlement, archival, balance
+  reconciliation) run once per shard with `on_every_shard`; the accounting
+  check and the replay split every shard's id range among their workers,
+  and exports merge the shards' rows.
+
+Shards may only be appended to ``DATABASE_SHARDS``: ids and keys refer to
+shards by position.
+"""
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, TypeVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# app models shared by every shard; the others follow their payments
+GLOBAL_MODELS = frozenset({"app.SplitTemplate"})
+SHARD_SEPARATOR = "-"
+
+T = TypeVar("T")
+
+_current: ContextVar[Optional[str]] = ContextVar("database_shard", default=None)
+
+
+def shard_aliases() -> List[str]:
+    return list(getattr(settings, "DATABASE_SHARDS", None) or [DEFAULT_DB_ALIAS])
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash (Lamping & Veach) of a 64-bit key into `buckets` buckets."""
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+def shard_index_for_key(key: str) -> int:
+    shards = shard_aliases()
+    if len(shards) == 1:
+        return 0
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return jump_hash(int.from_bytes(digest, "big"), len(shards))
+
+
+def shard_for_key(key: str) -> str:
+    """Alias of the shard holding idempotency key `key` and its payment."""
+    return shard_aliases()[shard_index_for_key(key)]
+
+
+def tag_payment_id(payment_id: str, alias: Optional[str]) -> str:
+    """`payment_id` with the index of shard `alias` appended (none for the first shard)."""
+    index = shard_aliases().index(alias) if alias else 0
+    return f"{payment_id}{SHARD_SEPARATOR}{index}" if index else payment_id
+
+
+def shard_for_payment_id(payment_id: str) -> str:
+    _, sep, suffix = payment_id.rpartition(SHARD_SEPARATOR)
+    index = int(suffix) if sep and suffix.isdigit() else 0
+    return shard_aliases()[index]
+
+
+def current_shard() -> Optional[str]:
+    return _current.get()
+
+
+@contextmanager
+def use_shard(alias: str):
+    """Send queries on the sharded models to `alias` inside the block."""
+    token = _current.set(alias)
+    try:
+        yield alias
+    finally:
+        _current.reset(token)
+
+
+def on_every_shard(fn: Callable[[], T]) -> Dict[str, T]:
+    """Results of `fn()` run inside `use_shard` on each shard in turn, by alias."""
+    results = {}
+    for alias in shard_aliases():
+        with use_shard(alias):
+            results[alias] = fn()
+    return results
+
+
+class ShardRouter:
+    """Database router for the sharded tables; other models are left to the default."""
+
+    def _route(self, model, hints) -> Optional[str]:
+        if model._meta.app_label != "app" or model._meta.label in GLOBAL_MODELS:
+            return None
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return _current.get() or DEFAULT_DB_ALIAS
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if obj1._state.db and obj2._state.db:
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Global models only on ``default``, sharded ones on every shard.
+
+        Other aliases are left to Django, so databases that only become
+        shards through ``override_settings`` (the tests) still get the tables.
+        """
+        if app_label != "app" or model_name is None:
+            return None
+        if f"{app_label}.{model_name}".lower() in {label.lower() for label in GLOBAL_MODELS}:
+            return db == DEFAULT_DB_ALIAS
+        return True if db in shard_aliases() else None
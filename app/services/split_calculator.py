@@ -1,85 +1,197 @@
 from abc import ABC, abstractmethod
 from decimal import ROUND_DOWN, ROUND_HALF_UP, Decimal
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Sequence, Tuple
 
-from .fee_strategy import get_fee_percentage
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .fee_strategy import get_fee_table
+from .split_types import (  # noqa: F401  (format_cents and remainder_target_index re-exported)
+    CompiledSplits,
+    QuoteResult,
+    Receivable,
+    Split,
+    as_splits,
+    format_cents,
+    remainder_target_index,
+)
 
 
 class SplitCalculatorInterface(ABC):
+    """Extension point for split calculators: implement `calculate`.
+
+    The views call `quote`, which by default reads the `QuoteResult` back
+    from the `calculate` body. Calculators that build `QuoteResult`s
+    natively extend `QuoteCalculator` instead.
+    """
+
     @abstractmethod
     def calculate(self, *, amount: Decimal, payment_method: str, installments: int, splits: List[Dict]) -> Dict:
         pass
 
+    def quote(self, *, amount: Decimal, payment_method: str, installments: int, splits: Sequence[Split]) -> QuoteResult:
+        body = self.calculate(
+            amount=amount,
+            payment_method=payment_method,
+            installments=installments,
+            splits=[{"recipient_id": s.recipient_id, "role": s.role, "percent": s.percent} for s in splits],
+        )
+        return QuoteResult(
+            gross_cents=_to_cents(Decimal(body["gross_amount"])),
+            fee_cents=_to_cents(Decimal(body["platform_fee_amount"])),
+            net_cents=_to_cents(Decimal(body["net_amount"])),
+            receivables=tuple(Receivable(r["recipient_id"], r.get("role"), _to_cents(Decimal(r["amount"]))) for r in body["receivables"]),
+        )
+
+
+class QuoteCalculator(SplitCalculatorInterface):
+    """A calculator implementing `quote`; `calculate` renders its result."""
+
+    @abstractmethod
+    def quote(self, *, amount: Decimal, payment_method: str, installments: int, splits: Sequence[Split]) -> QuoteResult:
+        pass
+
+    def calculate(self, *, amount: Decimal, payment_method: str, installments: int, splits: Iterable) -> Dict:
+        """`quote` rendered as the JSON quote body; `splits` may be dicts."""
+        return self.quote(amount=amount, payment_method=payment_method, installments=installments, splits=as_splits(splits)).as_dict()
+
 
 class SplitCalculationError(Exception):
     pass
 
 
+def _to_cents(value: Decimal) -> int:
+    return int(value.scaleb(2))
 
 
-class SimpleSplitCalculator(SplitCalculatorInterface):
+class SimpleSplitCalculator(QuoteCalculator):
     """Calculates platform fee, net amount and receivables following the rules.
 
     The calculator is open for extension: support for new payment methods
     is achieved by registering a `FeeStrategy` in `app.services.fee_strategy`.
     """
 
-    def calculate(self, *, amount: Decimal, payment_method: str, installments: int, splits: List[Dict]) -> Dict:
+    def quote(self, *, amount: Decimal, payment_method: str, installments: int, splits: Sequence[Split]) -> QuoteResult:
         if amount <= 0:
             raise SplitCalculationError("amount must be > 0")
 
         try:
-            pct = get_fee_percentage(payment_method, installments)
+            pct = get_fee_table().percentage(payment_method, installments)
         except ValueError as e:
             raise SplitCalculationError(str(e))
         platform_fee = (pct / Decimal("100")) * amount
         platform_fee = platform_fee.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
         net = (amount - platform_fee).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        
+
         # compute receivables
-        receivables, total = self._compute_receivables(net, splits)
+        shares, total = self._compute_shares(net, splits)
 
         # distribute remainder cents (if any)
-        self._distribute_remainder(receivables, total, net, splits)
-
-        # convert amounts to strings for JSON safety
-        out_receivables = [
-            {"recipient_id": r["recipient_id"], "role": r.get("role"), "amount": f"{r['amount']:.2f}"}
-            for r in receivables
-        ]
-
-        return {
-            "gross_amount": f"{amount.quantize(Decimal('0.01')):.2f}",
-            "platform_fee_amount": f"{platform_fee:.2f}",
-            "net_amount": f"{net:.2f}",
-            "receivables": out_receivables,
-        }
-
-    def _compute_receivables(self, net: Decimal, splits: List[Dict]) -> Tuple[List[Dict], Decimal]:
-        receivables: List[Dict] = []
+        self._distribute_remainder(shares, total, net, splits)
+
+        return QuoteResult(
+            gross_cents=_to_cents(amount.quantize(Decimal("0.01"))),
+            fee_cents=_to_cents(platform_fee),
+            net_cents=_to_cents(net),
+            receivables=tuple(Receivable(s.recipient_id, s.role, _to_cents(share)) for s, share in zip(splits, shares)),
+        )
+
+    def _compute_shares(self, net: Decimal, splits: Sequence[Split]) -> Tuple[List[Decimal], Decimal]:
+        if isinstance(splits, CompiledSplits):
+            fractions = splits.fractions
+        else:
+            fractions = [Decimal(s.percent) / Decimal("100") for s in splits]
+        shares: List[Decimal] = []
         total = Decimal("0.00")
-        for s in splits:
-            share = (net * (Decimal(s["percent"]) / Decimal("100"))).quantize(Decimal("0.01"), rounding=ROUND_DOWN)
-            receivables.append({"recipient_id": s["recipient_id"], "role": s.get("role"), "amount": share})
+        for fraction in fractions:
+            share = (net * fraction).quantize(Decimal("0.01"), rounding=ROUND_DOWN)
+            shares.append(share)
             total += share
-        return receivables, total
+        return shares, total
 
-    def _distribute_remainder(self, receivables: List[Dict], total: Decimal, net: Decimal, splits: List[Dict]) -> None:
+    def _distribute_remainder(self, shares: List[Decimal], total: Decimal, net: Decimal, splits: Sequence[Split]) -> None:
         diff = net - total
         if diff == Decimal("0.00"):
             return
 
-        producer_idx = None
-        max_pct = None
-        max_idx = 0
-        for idx, s in enumerate(splits):
-            if s.get("role") == "producer":
-                producer_idx = idx
-                break
-            if max_pct is None or s["percent"] > max_pct:
-                max_pct = s["percent"]
-                max_idx = idx
-
-        target_idx = producer_idx if producer_idx is not None else max_idx
-        receivables[target_idx]["amount"] = (receivables[target_idx]["amount"] + diff).quantize(Decimal("0.01"))
+        target_idx = splits.remainder_index if isinstance(splits, CompiledSplits) else remainder_target_index(splits)
+        shares[target_idx] = (shares[target_idx] + diff).quantize(Decimal("0.01"))
+
+
+def _div_half_up(n: int, d: int) -> int:
+    """Integer division rounding half away from zero (`ROUND_HALF_UP`)."""
+    q, r = divmod(abs(n), d)
+    if 2 * r >= d:
+        q += 1
+    return q if n >= 0 else -q
+
+
+def _div_down(n: int, d: int) -> int:
+    """Integer division truncating toward zero (`ROUND_DOWN`)."""
+    q = abs(n) // d
+    return q if n >= 0 else -q
+
+
+class CentsSplitCalculator(QuoteCalculator):
+    """Integer-cent implementation of the `SimpleSplitCalculator` rules.
+
+    Amounts are handled as integer cents and fee rates as basis points, so
+    no `Decimal` is built per split. Rounding matches the Decimal path: fee
+    is `ROUND_HALF_UP`, shares are `ROUND_DOWN` and the leftover cents go to
+    `remainder_target_index`. Inputs the integer path cannot represent
+    exactly (sub-cent amounts, fractional or negative percents, fractional
+    basis points) are delegated to `SimpleSplitCalculator`, so output is always identical.
+    """
+
+    _fallback = SimpleSplitCalculator()
+
+    def quote(self, *, amount: Decimal, payment_method: str, installments: int, splits: Sequence[Split]) -> QuoteResult:
+        if amount <= 0:
+            raise SplitCalculationError("amount must be > 0")
+
+        try:
+            bps = get_fee_table().basis_points(payment_method, installments)
+        except ValueError as e:
+            raise SplitCalculationError(str(e))
+
+        compiled = isinstance(splits, CompiledSplits)
+        scaled = amount * 100
+        if (
+            bps is None
+            or not 0 <= bps <= 10000
+            or scaled != scaled.to_integral_value()
+            or not (splits.integral if compiled else all(type(s.percent) is int and s.percent >= 0 for s in splits))
+        ):
+            return self._fallback.quote(amount=amount, payment_method=payment_method, installments=installments, splits=splits)
+
+        amount_cents = int(scaled)
+        fee_cents = _div_half_up(amount_cents * bps, 10000)
+        net_cents = amount_cents - fee_cents
+
+        if compiled:
+            shares = [_div_down(net_cents * p, 100) for p in splits.percents]
+        else:
+            shares = [_div_down(net_cents * s.percent, 100) for s in splits]
+        diff = net_cents - sum(shares)
+        if diff:
+            shares[splits.remainder_index if compiled else remainder_target_index(splits)] += diff
+
+        return QuoteResult(
+            gross_cents=amount_cents,
+            fee_cents=fee_cents,
+            net_cents=net_cents,
+            receivables=tuple(Receivable(s.recipient_id, s.role, share) for s, share in zip(splits, shares)),
+        )
+
+
+_calculators: Dict[str, SplitCalculatorInterface] = {}
+
+
+def get_split_calculator() -> SplitCalculatorInterface:
+    """Return the calculator selected by the `SPLIT_CALCULATOR` setting (a dotted path)."""
+    path = getattr(settings, "SPLIT_CALCULATOR", "app.services.split_calculator.SimpleSplitCalculator")
+    calc = _calculators.get(path)
+    if calc is None:
+        calc = _calculators[path] = import_string(path)()
+    return calc
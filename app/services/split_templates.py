@@ -0,0 +1,141 @@
+"""Split templates: split configurations compiled once and reused.
+
+The same splits (producer_1 70 / affiliate_9 30) arrive on thousands of
+payments per product. `compile_splits` turns them into `CompiledSplits`,
+with the percent vector, the remainder recipient and the validation outcome
+precomputed, so a calculation only multiplies and rounds.
+
+- Registered templates (`register_split_template`) are stored in
+  `SplitTemplate` and referenced by requests as ``"split_template": "<id>"``
+  instead of ``"splits"``. Each process compiles a template the first time
+  it is referenced and keeps it in an LRU cache.
+- Inline splits are interned by content (`intern_splits`): equal splits
+  share one compiled instance, identified by the hash of their content.
+
+Both caches are bounded by the ``SPLIT_TEMPLATES`` setting.
+"""
+import hashlib
+import json
+import re
+from typing import Iterable, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError
+
+from app.models import SplitTemplate
+
+from .cache import LRUCache
+from .payment_validator import PaymentValidationError, validate_split_totals
+from .split_types import CompiledSplits, Split, as_splits
+
+TEMPLATE_ID = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+class SplitTemplateError(ValueError):
+    pass
+
+
+class SplitTemplateConflict(SplitTemplateError):
+    """The id is already registered with different splits."""
+
+
+def content_id(splits: Sequence[Split]) -> str:
+    """Id of a split configuration derived from its content; equal splits get equal ids."""
+    canonical = json.dumps([[s.recipient_id, s.role, s.percent] for s in splits], separators=(",", ":"))
+    return "st_" + hashlib.sha256(canonical.encode()).hexdigest()[:24]
+
+
+def compile_splits(splits: Iterable, template_id: Optional[str] = None) -> CompiledSplits:
+    splits = tuple(as_splits(splits))
+    try:
+        validate_split_totals(len(splits), sum(s.percent for s in splits))
+        error = None
+    except PaymentValidationError as e:
+        error = e
+    return CompiledSplits(splits, template_id or content_id(splits), error)
+
+
+def splits_as_json(splits: Iterable[Split]) -> list:
+    return [{"recipient_id": s.recipient_id, "role": s.role, "percent": s.percent} for s in splits]
+
+
+_interned: Optional[LRUCache] = None
+_registered: Optional[LRUCache] = None
+_config = object()  # sentinel: not configured yet
+
+
+def _caches() -> Tuple[Optional[LRUCache], LRUCache]:
+    """The interned and registered template caches configured by `SPLIT_TEMPLATES`.
+
+    ``SPLIT_TEMPLATES = {"INTERN": True, "MAX_INTERNED": 10000, "MAX_REGISTERED": 10000}``;
+    the interned cache is None when ``INTERN`` is off.
+    """
+    global _interned, _registered, _config
+    config = getattr(settings, "SPLIT_TEMPLATES", None)
+    if config is not _config:
+        _config = config
+        config = config or {}
+        _interned = LRUCache(max_entries=config.get("MAX_INTERNED", 10000)) if config.get("INTERN", True) else None
+        _registered = LRUCache(max_entries=config.get("MAX_REGISTERED", 10000))
+    return _interned, _registered
+
+
+def intern_splits(splits: Tuple[Split, ...]) -> Optional[CompiledSplits]:
+    """The shared compiled instance of `splits`, or None when interning is disabled."""
+    cache = _caches()[0]
+    if cache is None:
+        return None
+    compiled = cache.get(splits)
+    if compiled is None:
+        compiled = compile_splits(splits)
+        cache.set(splits, compiled)
+    return compiled
+
+
+def get_split_template(template_id: str) -> Optional[CompiledSplits]:
+    """The compiled registered template `template_id`, or None if there is none."""
+    cache = _caches()[1]
+    compiled = cache.get(template_id)
+    if compiled is None:
+        row = SplitTemplate.objects.filter(template_id=template_id).values_list("splits", flat=True).first()
+        if row is None:
+            return None
+        compiled = compile_splits(row, template_id)
+        cache.set(template_id, compiled)
+    return compiled
+
+
+async def aget_split_template(template_id: str) -> Optional[CompiledSplits]:
+    """`get_split_template` for async views: a miss is read with the async ORM."""
+    cache = _caches()[1]
+    compiled = cache.get(template_id)
+    if compiled is None:
+        row = await SplitTemplate.objects.filter(template_id=template_id).values_list("splits", flat=True).afirst()
+        if row is None:
+            return None
+        compiled = compile_splits(row, template_id)
+        cache.set(template_id, compiled)
+    return compiled
+
+
+def register_split_template(splits: Iterable, template_id: Optional[str] = None) -> Tuple[CompiledSplits, bool]:
+    """Store a template (id: `template_id` or the content hash); returns it and whether it is new.
+
+    Registering the same splits again is a no-op; an id already taken by
+    other splits raises `SplitTemplateConflict`.
+    """
+    if template_id is not None and not TEMPLATE_ID.match(template_id):
+        raise SplitTemplateError("template id must be 1-64 letters, digits, '_', '.' or '-'")
+    compiled = compile_splits(splits, template_id)
+    if compiled.error is not None:
+        raise SplitTemplateError(str(compiled.error))
+    try:
+        row, created = SplitTemplate.objects.get_or_create(
+            template_id=compiled.template_id, defaults={"splits": splits_as_json(compiled)}
+        )
+    except IntegrityError:
+        row, created = SplitTemplate.objects.get(template_id=compiled.template_id), False
+    if not created and as_splits(row.splits) != compiled.splits:
+        raise SplitTemplateConflict(f"split template {compiled.template_id} already exists with different splits")
+    _caches()[1].set(compiled.template_id, compiled)
+    return compiled, created
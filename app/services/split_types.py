@@ -0,0 +1,131 @@
+"""Value types passed between the request parser, split calculators and persistence.
+
+Money is carried as integer cents; `QuoteResult.as_dict` is the only place
+amounts become strings, when the JSON response is built.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+
+def format_cents(cents: int) -> str:
+    """Format integer cents exactly like `f"{Decimal:.2f}"` does."""
+    sign = "-" if cents < 0 else ""
+    whole, frac = divmod(abs(cents), 100)
+    return f"{sign}{whole}.{frac:02d}"
+
+
+def cents_to_decimal(cents: int) -> Decimal:
+    """Exact `Decimal` with two places, for `DecimalField`s."""
+    return Decimal(cents).scaleb(-2)
+
+
+@dataclass(frozen=True, slots=True)
+class Split:
+    recipient_id: str
+    role: Optional[str]
+    percent: int
+
+
+@dataclass(frozen=True, slots=True)
+class Receivable:
+    recipient_id: str
+    role: Optional[str]
+    amount_cents: int
+
+    def as_dict(self) -> Dict:
+        return {"recipient_id": self.recipient_id, "role": self.role, "amount": format_cents(self.amount_cents)}
+
+
+@dataclass(frozen=True, slots=True)
+class QuoteResult:
+    gross_cents: int
+    fee_cents: int
+    net_cents: int
+    receivables: Tuple[Receivable, ...]
+
+    def as_dict(self) -> Dict:
+        """The quote response body."""
+        return {
+            "gross_amount": format_cents(self.gross_cents),
+            "platform_fee_amount": format_cents(self.fee_cents),
+            "net_amount": format_cents(self.net_cents),
+            "receivables": [r.as_dict() for r in self.receivables],
+        }
+
+
+def remainder_target_index(splits: Sequence[Split]) -> int:
+    """Index of the split that receives the leftover cents.
+
+    The first `producer` wins; without one, the largest percent seen so far.
+    """
+    producer_idx = None
+    max_pct = None
+    max_idx = 0
+    for idx, s in enumerate(splits):
+        if s.role == "producer":
+            producer_idx = idx
+            break
+        if max_pct is None or s.percent > max_pct:
+            max_pct = s.percent
+            max_idx = idx
+
+    return producer_idx if producer_idx is not None else max_idx
+
+
+_HUNDRED = Decimal("100")
+
+
+class CompiledSplits:
+    """A split configuration with everything that does not depend on the amount precomputed.
+
+    Behaves as the tuple of its `Split`s (and compares equal to it), so it
+    can be passed wherever splits are expected; the calculators recognize it
+    and skip straight to the multiply and round steps. Built by
+    `app.services.split_templates`, which also sets the validation `error`.
+    """
+
+    __slots__ = ("template_id", "splits", "percents", "fractions", "remainder_index", "integral", "error")
+
+    def __init__(self, splits: Iterable[Split], template_id: str, error: Optional[Exception] = None):
+        self.template_id = template_id
+        self.splits = tuple(splits)
+        self.percents = tuple(s.percent for s in self.splits)
+        # the Decimal path's `Decimal(percent) / 100`, computed once
+        self.fractions = tuple(Decimal(p) / _HUNDRED for p in self.percents)
+        self.remainder_index = remainder_target_index(self.splits)
+        # whether the integer-cent path applies
+        self.integral = all(type(p) is int and p >= 0 for p in self.percents)
+        self.error = error
+
+    def __len__(self) -> int:
+        return len(self.splits)
+
+    def __iter__(self) -> Iterator[Split]:
+        return iter(self.splits)
+
+    def __getitem__(self, index):
+        return self.splits[index]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CompiledSplits):
+            return self.splits == other.splits
+        if isinstance(other, tuple):
+            return self.splits == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.splits)
+
+    def __repr__(self) -> str:
+        return f"CompiledSplits({self.template_id!r}, {self.splits!r})"
+
+
+def as_splits(splits: Iterable) -> Tuple[Split, ...]:
+    """`Split`s from `Split`s or split dicts (serializer data, JSON bodies)."""
+    if isinstance(splits, CompiledSplits):
+        return splits
+    return tuple(
+        s if isinstance(s, Split) else Split(recipient_id=s["recipient_id"], role=s.get("role"), percent=s["percent"])
+        for s in splits
+    )
@@ -0,0 +1,78 @@
+"""Startup-time measurement of a fresh worker process.
+
+`measure_startup` starts ``python -m app.services.startup`` in a new
+interpreter, which times ``django.setup()`` (the imports, app loading and
+the `app.services.warmup` routine), the first request and a second one,
+and prints the figures as JSON. The parent adds the wall time of the whole
+process. Used by ``python manage.py startup_time``.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+QUOTE_PATH = "/api/v1/checkout/quote"
+
+
+def _ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+def measure_startup(path: str = QUOTE_PATH, env: Optional[Mapping[str, str]] = None) -> Dict:
+    """Timings (ms) of one fresh process serving `path`; `env` overlays the environment."""
+    child_env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "cakto_engine.settings"), **(env or {})}
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-m", "app.services.startup", path],
+        cwd=BASE_DIR,
+        env=child_env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_ms"] = _ms(start)
+    return result
+
+
+def _child(path: str) -> None:
+    start = time.perf_counter()
+    import django
+
+    django.setup()
+    setup_ms = _ms(start)
+
+    from django.test import Client
+
+    from app.services.warmup import SAMPLE_BODY, last_warmup
+
+    client = Client()
+    first = time.perf_counter()
+    response = client.post(path, SAMPLE_BODY, content_type="application/json")
+    first_ms = _ms(first)
+    if response.status_code >= 400:
+        raise SystemExit(f"{path} returned {response.status_code}: {response.content[:200]!r}")
+    second = time.perf_counter()
+    client.post(path, SAMPLE_BODY, content_type="application/json")
+    print(
+        json.dumps(
+            {
+                "setup_ms": setup_ms,
+                "first_request_ms": first_ms,
+                "second_request_ms": _ms(second),
+                "ready_ms": round(setup_ms + first_ms, 3),
+                "warmup_ms": {name: round(ms, 3) for name, ms in last_warmup.items()},
+                "modules": len(sys.modules),
+                "spectacular_loaded": "drf_spectacular.views" in sys.modules,
+                "spectacular_modules": sum(name.partition(".")[0] == "drf_spectacular" for name in sys.modules),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    _child(sys.argv[1] if len(sys.argv) > 1 else QUOTE_PATH)
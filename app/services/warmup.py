@@ -0,0 +1,93 @@
+"""Process warm-up, run once from `app.apps.PaymentsConfig.ready`.
+
+A freshly started worker otherwise pays on its first request for compiling
+the fee table, resolving the calculator and parser, importing the URLconf
+(views, DRF) and DRF's JSON renderer. `warm_up` does all of that up front,
+without touching the database, so the first quote costs about as much as
+any other. It is switched by ``WARMUP["ENABLED"]`` (the ``WARMUP``
+environment variable); ``WARMUP["URLCONF"]`` controls the URLconf import.
+"""
+import time
+from typing import Callable, Dict
+
+from django.conf import settings
+
+SAMPLE_BODY = {
+    "amount": "297.00",
+    "currency": "BRL",
+    "payment_method": "card",
+    "installments": 3,
+    "splits": [
+        {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+        {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 30},
+    ],
+}
+
+# step name -> milliseconds of the last warm-up of this process
+last_warmup: Dict[str, float] = {}
+
+
+def warmup_enabled() -> bool:
+    return bool(getattr(settings, "WARMUP", {}).get("ENABLED", False))
+
+
+def _fee_table():
+    from app.services.fee_strategy import get_fee_table
+
+    get_fee_table()
+
+
+def _quote():
+    from app.api.payment_request import get_payment_request_parser
+    from app.services.fee_strategy import supported_payment_methods
+    from app.services.split_calculator import get_split_calculator
+
+    req = get_payment_request_parser()(SAMPLE_BODY)
+    calc = get_split_calculator()
+    for method in sorted(supported_payment_methods()):
+        calc.quote(amount=req.amount, payment_method=method, installments=1, splits=req.splits)
+    return calc.quote(amount=req.amount, payment_method=req.payment_method, installments=req.installments, splits=req.splits)
+
+
+def _render():
+    from rest_framework.renderers import JSONRenderer
+
+    JSONRenderer().render(_quote().as_dict())
+
+
+def _caches():
+    from app.services.ids import get_payment_id_generator
+    from app.services.quote_cache import get_quote_cache
+
+    get_quote_cache()
+    get_payment_id_generator()
+
+
+def _urlconf():
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+
+
+STEPS: Dict[str, Callable[[], object]] = {
+    "fee_table": _fee_table,
+    "quote": _quote,
+    "render": _render,
+    "caches": _caches,
+    "urlconf": _urlconf,
+}
+
+
+def warm_up() -> Dict[str, float]:
+    """Run the warm-up steps; returns (and keeps in `last_warmup`) their durations in ms."""
+    config = getattr(settings, "WARMUP", {})
+    timings = {}
+    for name, step in STEPS.items():
+        if name == "urlconf" and not config.get("URLCONF", True):
+            continue
+        start = time.perf_counter()
+        step()
+        timings[name] = (time.perf_counter() - start) * 1000
+    last_warmup.clear()
+    last_warmup.update(timings)
+    return timings
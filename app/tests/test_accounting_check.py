@@ -0,0 +1,62 @@
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+
+from app.models import LedgerEntry, OutboxEvent, Payment
+from app.services.accounting_check import GROSS_MISMATCH, LEDGER_MISMATCH, OUTBOX_MISMATCH, run_check
+from app.services.idempotency import get_idempotency_store
+
+
+def pix(amount):
+    return {
+        "amount": amount,
+        "currency": "BRL",
+        "payment_method": "pix",
+        "splits": [
+            {"recipient_id": "producer_1", "role": "producer", "percent": 60},
+            {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 40},
+        ],
+    }
+
+
+class AccountingCheckTests(APITestCase):
+    def setUp(self):
+        get_idempotency_store().local.clear()
+        for i in range(6):
+            r = self.client.post("/api/v1/payments", pix(f"{10 + i}.00"), format="json", HTTP_IDEMPOTENCY_KEY=f"acc-{i}")
+            self.assertEqual(r.status_code, 201)
+        self.ids = list(Payment.objects.order_by("id").values_list("id", flat=True))
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def corrupt(self):
+        Payment.objects.filter(id=self.ids[0]).update(gross_amount=Decimal("99.00"))
+        LedgerEntry.objects.filter(payment_id=self.ids[2], recipient_id="affiliate_9").delete()
+        OutboxEvent.objects.create(type="payment_captured", payment_id=self.ids[5], payload={})
+
+    def test_reports_each_kind_of_mismatch(self):
+        self.assertEqual(list(run_check(workers=1, shard_size=2, chunk_size=1).mismatches()), [])
+        self.corrupt()
+        found = {(m["id"], m["check"]) for m in run_check(workers=1, shard_size=2, chunk_size=1).mismatches()}
+        self.assertEqual(found, {(self.ids[0], GROSS_MISMATCH), (self.ids[2], LEDGER_MISMATCH), (self.ids[5], OUTBOX_MISMATCH)})
+
+    def test_resumes_from_checkpoint(self):
+        path = os.path.join(self.tmp.name, "checkpoint.json")
+        run_check(workers=1, shard_size=2, checkpoint_path=path)
+        self.corrupt()
+        # every shard is already done: nothing is re-checked
+        self.assertEqual(list(run_check(workers=1, shard_size=2, checkpoint_path=path).mismatches()), [])
+        with self.assertRaises(ValueError):
+            run_check(workers=1, shard_size=3, checkpoint_path=path)
+
+        report = os.path.join(self.tmp.name, "report.jsonl")
+        out = io.StringIO()
+        call_command("check_accounting", "--workers", "1", "--shard-size", "2", "--checkpoint", path, "--restart", "--report", report, stdout=out, stderr=io.StringIO())
+        self.assertIn("3 mismatches", out.getvalue())
+        with open(report) as fh:
+            self.assertEqual(len([json.loads(line) for line in fh]), 3)
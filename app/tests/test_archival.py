@@ -0,0 +1,106 @@
+import gzip
+import io
+import json
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from app.models import ArchivedOutboxEvent, ArchivedPayment, IdempotencyRecord, LedgerEntry, OutboxEvent, Payment
+from app.services.accounting_check import run_check
+from app.services.archival import Archiver, TableSink
+from app.services.balances import reconcile_balances
+from app.services.idempotency import get_idempotency_store
+from app.services.settlement import settle
+
+CARD_3X = {
+    "amount": "297.00",
+    "currency": "BRL",
+    "payment_method": "card",
+    "installments": 3,
+    "splits": [
+        {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+        {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 30},
+    ],
+}
+
+
+class ArchivalTests(APITestCase):
+    def setUp(self):
+        get_idempotency_store().local.clear()
+        for i in range(5):
+            r = self.client.post("/api/v1/payments", CARD_3X, format="json", HTTP_IDEMPOTENCY_KEY=f"arch-{i}")
+            self.assertEqual(r.status_code, 201)
+        old = timezone.now() - timedelta(days=100)
+        # the first three are old; the third still has an unpublished event
+        ids = list(Payment.objects.order_by("id").values_list("id", flat=True))
+        Payment.objects.filter(id__in=ids[:3]).update(created_at=old)
+        OutboxEvent.objects.filter(payment_id__in=ids[:2]).update(status="published", published_at=old)
+        OutboxEvent.objects.filter(payment_id=ids[3]).update(status="published", published_at=timezone.now())
+        settle()
+        self.ids = ids
+
+    def test_archives_to_tables_in_batches(self):
+        archiver = Archiver(TableSink(), batch_size=1)
+        self.assertEqual(archiver.archive_outbox(days=7), 2)
+        self.assertEqual(ArchivedOutboxEvent.objects.count(), 2)
+        self.assertEqual(OutboxEvent.objects.filter(status="published").count(), 1)  # recent one stays
+
+        self.assertEqual(archiver.archive_payments(days=90), 2)
+        self.assertEqual(sorted(Payment.objects.values_list("id", flat=True)), self.ids[2:])
+        archived = ArchivedPayment.objects.get(original_id=self.ids[0])
+        self.assertEqual([e["amount"] for e in archived.ledger_entries], ["189.21", "81.09"])
+        self.assertFalse(LedgerEntry.objects.filter(payment_id__in=self.ids[:2]).exists())
+
+        # balances still cover archived entries and reconcile cleanly
+        r = self.client.get("/api/v1/recipients/producer_1/balance")
+        self.assertEqual(r.data["balance"], "946.05")
+        self.assertEqual([d for _, ds in reconcile_balances() for d in ds], [])
+        self.assertEqual(list(run_check(workers=1).mismatches()), [])
+
+        # replay of an archived payment is still answered inside the retention window
+        r = self.client.post("/api/v1/payments", CARD_3X, format="json", HTTP_IDEMPOTENCY_KEY="arch-0")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data["payment_id"], archived.payment_id)
+
+    def test_payments_with_unsettled_entries_stay(self):
+        LedgerEntry.objects.filter(payment_id=self.ids[1]).update(settlement=None)
+        self.assertEqual(Archiver(TableSink()).archive_payments(days=90), 1)
+        self.assertEqual(sorted(Payment.objects.values_list("id", flat=True)), self.ids[1:])
+        self.assertEqual(LedgerEntry.objects.filter(payment_id=self.ids[1], settlement__isnull=True).count(), 2)
+
+    def test_records_of_live_payments_are_kept(self):
+        # arch-2 is old but not archivable (its event is still pending)
+        IdempotencyRecord.objects.update(created_at=timezone.now() - timedelta(days=200))
+        archiver = Archiver(TableSink())
+        self.assertEqual(archiver.prune_idempotency(days=90), 0)
+        self.assertEqual(archiver.archive_payments(days=90), 2)
+        self.assertEqual(archiver.prune_idempotency(days=90), 2)
+
+        get_idempotency_store().local.clear()
+        r = self.client.post("/api/v1/payments", CARD_3X, format="json", HTTP_IDEMPOTENCY_KEY="arch-2")
+        self.assertEqual(r.status_code, 200)
+
+    def test_jsonl_segments_and_idempotency_retention(self):
+        IdempotencyRecord.objects.filter(key="arch-0").update(created_at=timezone.now() - timedelta(days=200))
+        with tempfile.TemporaryDirectory() as tmp:
+            out = io.StringIO()
+            call_command("archive", "--jsonl", tmp, "--batch-size", "10", stdout=out)
+            self.assertIn("payments: 2 rows archived", out.getvalue())
+            self.assertIn("idempotency: 1 rows deleted", out.getvalue())
+            segments = sorted(Path(tmp, "payments").glob("*.jsonl.gz"))
+            self.assertEqual(len(segments), 1)
+            with gzip.open(segments[0], "rt") as fh:
+                rows = [json.loads(line) for line in fh]
+        self.assertEqual([r["id"] for r in rows], self.ids[:2])
+        self.assertEqual(ArchivedPayment.objects.count(), 0)
+        self.assertFalse(IdempotencyRecord.objects.filter(key="arch-0").exists())
+        self.assertTrue(IdempotencyRecord.objects.filter(key="arch-1").exists())
+
+    def test_rejects_retention_shorter_than_payment_age(self):
+        with self.assertRaises(CommandError):
+            call_command("archive", "--payment-days", "90", "--idempotency-days", "30", stdout=io.StringIO())
@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+from django.test import TestCase
+
+from app.models import LedgerEntry, OutboxEvent, Payment
+from app.services.idempotency import get_idempotency_store
+from app.services.split_templates import _caches
+
+PAYLOAD = {
+    "amount": "297.00",
+    "currency": "BRL",
+    "payment_method": "card",
+    "installments": 3,
+    "splits": [
+        {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+        {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 30},
+    ],
+}
+
+
+class AsyncViewsTests(TestCase):
+    def setUp(self):
+        get_idempotency_store().local.clear()
+
+    async def post(self, url, payload, **headers):
+        return await self.async_client.post(url, json.dumps(payload), content_type="application/json", headers=headers)
+
+    async def test_quote_matches_sync_view(self):
+        sync = await self.post("/api/v1/checkout/quote", PAYLOAD)
+        r = await self.post("/api/v1/async/checkout/quote", PAYLOAD)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json(), sync.json())
+
+    async def test_quote_errors_match_sync_view(self):
+        bad = [
+            {**PAYLOAD, "payment_method": "boleto"},  # 422
+            {**PAYLOAD, "currency": "USD"},
+            {**PAYLOAD, "amount": "abc"},
+        ]
+        for payload in bad:
+            sync = await self.post("/api/v1/checkout/quote", payload)
+            r = await self.post("/api/v1/async/checkout/quote", payload)
+            self.assertEqual((r.status_code, r.json()), (sync.status_code, sync.json()))
+
+    async def test_payment_is_recorded_and_replayed(self):
+        r = await self.post("/api/v1/async/payments", PAYLOAD, idempotency_key="async-1")
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(r.json()["net_amount"], "270.30")
+        self.assertEqual(await Payment.objects.acount(), 1)
+        self.assertEqual(await LedgerEntry.objects.acount(), 2)
+        self.assertEqual(await OutboxEvent.objects.acount(), 1)
+
+        # replays are interchangeable between the sync and async endpoints
+        replay = await self.post("/api/v1/payments", PAYLOAD, idempotency_key="async-1")
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay.json(), r.json())
+        conflict = await self.post("/api/v1/async/payments", {**PAYLOAD, "amount": "1.00"}, idempotency_key="async-1")
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(await Payment.objects.acount(), 1)
+
+    async def test_templated_bodies_are_resolved_with_the_async_orm(self):
+        await self.post("/api/v1/split-templates", {"id": "tpl1", "splits": PAYLOAD["splits"]})
+        templated = {k: v for k, v in PAYLOAD.items() if k != "splits"}
+        templated["split_template"] = "tpl1"
+
+        _caches()[1].clear()
+        r = await self.post("/api/v1/async/checkout/quote", templated)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["net_amount"], "270.30")
+        _caches()[1].clear()
+        r = await self.post("/api/v1/async/payments", templated, idempotency_key="async-tpl")
+        self.assertEqual(r.status_code, 201)
+
+        r = await self.post("/api/v1/async/checkout/quote", {**templated, "split_template": "missing"})
+        self.assertEqual(r.status_code, 400)
+        self.assertIn("split_template", r.json())
+
+    async def test_payment_requires_idempotency_key(self):
+        r = await self.post("/api/v1/async/payments", PAYLOAD)
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json()["detail"], "Idempotency-Key header required")
+        r = await self.post("/api/v1/async/payments", PAYLOAD, **{"Idempotency-Key": "k" * 129})
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json()["detail"], "Idempotency-Key header must be at most 128 characters")
+
+
+class AsyncAPIRoutingTests(TestCase):
+    """`cakto_engine.asgi` serves the async prefix without the browser middleware."""
+
+    async def call(self, path):
+        from cakto_engine.asgi import application
+
+        body = json.dumps(PAYLOAD).encode()
+        scope = {
+            "type": "http",
+            "method": "POST",
+            "path": path,
+            "query_string": b"",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+        messages = [{"type": "http.request", "body": body}]
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait()  # the client never disconnects
+
+        async def send(message):
+            sent.append(message)
+
+        await application(scope, receive, send)
+        return sent[0]["status"], dict(sent[0]["headers"])
+
+    async def test_async_prefix_skips_middleware(self):
+        status_code, headers = await self.call("/api/v1/async/checkout/quote")
+        self.assertEqual(status_code, 200)
+        self.assertNotIn(b"X-Frame-Options", headers)
+        # the security headers are kept
+        self.assertEqual(headers[b"X-Content-Type-Options"], b"nosniff")
+
+        status_code, headers = await self.call("/api/v1/checkout/quote")
+        self.assertEqual(status_code, 200)
+        self.assertIn(b"X-Frame-Options", headers)
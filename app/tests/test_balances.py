@@ -0,0 +1,59 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+
+from app.models import RecipientBalance
+from app.services.balances import reconcile_balances
+from app.services.idempotency import get_idempotency_store
+
+CARD_3X = {
+    "amount": "297.00",
+    "currency": "BRL",
+    "payment_method": "card",
+    "installments": 3,
+    "splits": [
+        {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+        {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 30},
+    ],
+}
+
+
+class RecipientBalanceTests(APITestCase):
+    def setUp(self):
+        get_idempotency_store().local.clear()
+
+    def pay(self, key):
+        r = self.client.post("/api/v1/payments", CARD_3X, format="json", HTTP_IDEMPOTENCY_KEY=key)
+        self.assertIn(r.status_code, (200, 201))
+
+    def test_balance_follows_payments_and_replays(self):
+        self.pay("bal-1")
+        self.pay("bal-2")
+        self.pay("bal-2")  # replay: no new entries
+        r = self.client.get("/api/v1/recipients/producer_1/balance")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data["balance"], "378.42")
+        self.assertEqual(r.data["entry_count"], 2)
+        self.assertEqual(self.client.get("/api/v1/recipients/affiliate_9/balance").data["balance"], "162.18")
+        self.assertEqual(self.client.get("/api/v1/recipients/nobody/balance").status_code, 404)
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        for i in range(3):
+            self.pay(f"rec-{i}")
+        RecipientBalance.objects.filter(recipient_id="affiliate_9").update(balance=Decimal("1.00"))
+        RecipientBalance.objects.create(recipient_id="ghost", balance=Decimal("5.00"), entry_count=1)
+
+        chunks = list(reconcile_balances(chunk_size=1))
+        self.assertEqual(sum(n for n, _ in chunks), 3)
+        drifts = {d.recipient_id: d for _, ds in chunks for d in ds}
+        self.assertEqual(set(drifts), {"affiliate_9", "ghost"})
+        self.assertEqual(drifts["affiliate_9"].ledger_balance, Decimal("243.27"))
+        self.assertEqual(drifts["ghost"].difference, Decimal("5.00"))
+
+        out = StringIO()
+        call_command("reconcile_balances", "--fix", stdout=out)
+        self.assertIn("3 recipients checked, drift fixed in 2", out.getvalue())
+        self.assertEqual(RecipientBalance.objects.get(recipient_id="affiliate_9").balance, Decimal("243.27"))
+        self.assertEqual([d for _, ds in reconcile_balances() for d in ds], [])
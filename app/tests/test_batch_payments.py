@@ -0,0 +1,104 @@
+from unittest import mock
+
+from rest_framework.test import APITestCase
+
+from app.models import IdempotencyRecord, LedgerEntry, OutboxEvent, Payment
+from app.services.idempotency import IdempotencyClaimLost
+
+
+def pix(amount):
+    return {
+        "amount": amount,
+        "currency": "BRL",
+        "payment_method": "pix",
+        "splits": [{"recipient_id": "producer_1", "role": "producer", "percent": 100}],
+    }
+
+
+CARD_3X = {
+    "amount": "297.00",
+    "currency": "BRL",
+    "payment_method": "card",
+    "installments": 3,
+    "splits": [
+        {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+        {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 30},
+    ],
+}
+
+
+class PaymentBatchTests(APITestCase):
+    base_url = "/api/v1/payments/batch"
+
+    def test_batch_persists_all_items_with_constant_queries(self):
+        items = [{"idempotency_key": f"batch-{i}", "payload": CARD_3X} for i in range(20)]
+        # store lookup, claim insert + read back, savepoint/release,
+        # claim swap, one bulk insert per table and the balance upsert
+        with self.assertNumQueries(12):
+            r = self.client.post(self.base_url, {"payments": items}, format="json")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([x["status_code"] for x in r.data["results"]], [201] * 20)
+        body = r.data["results"][0]["body"]
+        self.assertEqual(body["platform_fee_amount"], "26.70")
+        self.assertEqual([x["amount"] for x in body["receivables"]], ["189.21", "81.09"])
+        self.assertEqual(Payment.objects.count(), 20)
+        self.assertEqual(LedgerEntry.objects.count(), 40)
+        self.assertEqual(OutboxEvent.objects.count(), 20)
+
+    def test_batch_reports_each_item(self):
+        existing = self.client.post("/api/v1/payments", pix("10.00"), format="json", HTTP_IDEMPOTENCY_KEY="old")
+        items = [
+            {"idempotency_key": "old", "payload": pix("10.00")},
+            {"idempotency_key": "old", "payload": pix("11.00")},
+            {"idempotency_key": "new", "payload": pix("12.00")},
+            {"idempotency_key": "new", "payload": pix("12.00")},
+            {"idempotency_key": "bad", "payload": {**pix("12.00"), "payment_method": "boleto"}},
+            {"payload": pix("13.00")},
+        ]
+        r = self.client.post(self.base_url, {"payments": items}, format="json")
+        results = r.data["results"]
+        self.assertEqual([x["status_code"] for x in results], [200, 409, 201, 200, 422, 400])
+        self.assertEqual(results[0]["body"]["payment_id"], existing.data["payment_id"])
+        self.assertEqual(results[3]["body"]["payment_id"], results[2]["body"]["payment_id"])
+        self.assertEqual(Payment.objects.count(), 2)
+
+        single = self.client.post("/api/v1/payments", pix("12.00"), format="json", HTTP_IDEMPOTENCY_KEY="new")
+        self.assertEqual(single.status_code, 200)
+        self.assertEqual(single.data, results[2]["body"])
+
+    def test_unusable_keys_are_reported_per_item(self):
+        items = [
+            {"idempotency_key": 7, "payload": pix("10.00")},
+            {"idempotency_key": ["a"], "payload": pix("10.00")},
+            {"idempotency_key": "k" * 129, "payload": pix("10.00")},
+            {"idempotency_key": " ", "payload": pix("10.00")},
+            {"idempotency_key": "fine", "payload": pix("10.00")},
+        ]
+        r = self.client.post(self.base_url, {"payments": items}, format="json")
+        self.assertEqual(r.status_code, 200)
+        results = r.data["results"]
+        self.assertEqual([x["status_code"] for x in results], [400, 400, 400, 400, 201])
+        self.assertEqual(
+            [x["body"]["detail"] for x in results[:4]],
+            [
+                "idempotency_key must be a string",
+                "idempotency_key must be a string",
+                "idempotency_key must be at most 128 characters",
+                "idempotency_key required",
+            ],
+        )
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_lost_claims_are_reported_per_item(self):
+        items = [{"idempotency_key": "lost-1", "payload": pix("10.00")}, {"idempotency_key": "lost-2", "payload": pix("11.00")}]
+        with mock.patch("app.api.views.record_payments", side_effect=IdempotencyClaimLost("taken over")):
+            r = self.client.post(self.base_url, {"payments": items}, format="json")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([x["status_code"] for x in r.data["results"]], [409, 409])
+        self.assertEqual(r.data["results"][0]["body"]["detail"], "Idempotency key in progress")
+        self.assertFalse(IdempotencyRecord.objects.exists())
+        self.assertFalse(Payment.objects.exists())
+
+    def test_batch_requires_payments_list(self):
+        r = self.client.post(self.base_url, {"payments": []}, format="json")
+        self.assertEqual(r.status_code, 400)
@@ -0,0 +1,36 @@
+import json
+
+from django.test import SimpleTestCase, TestCase
+
+from app.models import OutboxEvent
+from app.services.benchmarks import compare_results, default_cases, run_suite, seed_published_outbox
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_runs_every_default_case(self):
+        results = run_suite(default_cases(outbox_sizes=(0, 50)), iterations=3, warmup=1)
+        names = set(results["results"])
+        self.assertIn("calculator.SimpleSplitCalculator.5_splits", names)
+        self.assertIn("payment_view.replay.db", names)
+        self.assertIn("outbox_growth.50.payment_and_relay", names)
+        for result in results["results"].values():
+            self.assertLessEqual(result["min_us"], result["p50_us"])
+            self.assertLessEqual(result["p50_us"], result["p99_us"])
+        # results are stored as JSON
+        self.assertEqual(json.loads(json.dumps(results)), results)
+
+    def test_seeding_tops_the_outbox_up(self):
+        seed_published_outbox(30)
+        seed_published_outbox(20)
+        self.assertEqual(OutboxEvent.objects.count(), 30)
+
+
+class CompareResultsTests(SimpleTestCase):
+    def test_flags_slowdowns_over_threshold(self):
+        baseline = {"results": {"a": {"p50_us": 100.0}, "b": {"p50_us": 100.0}, "gone": {"p50_us": 1.0}}}
+        current = {"results": {"a": {"p50_us": 105.0}, "b": {"p50_us": 130.0}, "new": {"p50_us": 1.0}}}
+        rows = {r["case"]: r for r in compare_results(baseline, current, threshold=0.10)}
+        self.assertEqual(set(rows), {"a", "b"})
+        self.assertFalse(rows["a"]["regression"])
+        self.assertTrue(rows["b"]["regression"])
+        self.assertAlmostEqual(rows["b"]["change"], 0.30)
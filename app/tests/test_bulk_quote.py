@@ -0,0 +1,79 @@
+import csv
+import io
+import json
+import random
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from app.services.bulk_quote import bulk_quote, fee_table_from_percentages, remainder_indexes
+from app.services.split_calculator import CentsSplitCalculator, format_cents
+from app.tests.test_split_calculator import random_payload
+
+
+def columns(payloads):
+    width = max(len(p["splits"]) for p in payloads)
+    percents = np.zeros((len(payloads), width), dtype=np.int64)
+    producers = np.zeros((len(payloads), width), dtype=bool)
+    for row, p in enumerate(payloads):
+        for col, s in enumerate(p["splits"]):
+            percents[row, col] = s["percent"]
+            producers[row, col] = s["role"] == "producer"
+    return (
+        [int(p["amount"] * 100) for p in payloads],
+        [p["payment_method"] for p in payloads],
+        [p["installments"] for p in payloads],
+        percents,
+        remainder_indexes(percents, producers),
+    )
+
+
+class BulkQuoteTests(SimpleTestCase):
+    def test_matches_single_order_calculator(self):
+        rng = random.Random(7)
+        payloads = [random_payload(rng) for _ in range(3000)]
+        result = bulk_quote(*columns(payloads))
+        calc = CentsSplitCalculator()
+        for row, payload in enumerate(payloads):
+            expected = calc.calculate(**payload)
+            self.assertEqual(format_cents(int(result.fee_cents[row])), expected["platform_fee_amount"])
+            self.assertEqual(format_cents(int(result.net_cents[row])), expected["net_amount"])
+            amounts = [format_cents(int(c)) for c in result.receivable_cents[row, : len(payload["splits"])]]
+            self.assertEqual(amounts, [r["amount"] for r in expected["receivables"]])
+
+    def test_what_if_fee_table(self):
+        table = fee_table_from_percentages({"card": {1: "10.00"}})
+        result = bulk_quote([10000], ["card"], [1], [[70, 30]], [0], fee_table=table)
+        self.assertEqual(result.fee_cents.tolist(), [1000])
+        self.assertEqual(result.receivable_cents.tolist(), [[6300, 2700]])
+
+    def test_command_over_jsonl_and_csv(self):
+        order = {
+            "id": "o1",
+            "amount": "297.00",
+            "payment_method": "card",
+            "installments": 3,
+            "splits": [
+                {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+                {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 30},
+            ],
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            src, dst = Path(tmp) / "orders.jsonl", Path(tmp) / "quotes.jsonl"
+            src.write_text(json.dumps(order) + "\n")
+            call_command("bulk_quote", str(src), output=str(dst), stdout=io.StringIO())
+            quote = json.loads(dst.read_text())
+            self.assertEqual(quote["id"], "o1")
+            self.assertEqual(quote["platform_fee_amount"], "26.70")
+            self.assertEqual([r["amount"] for r in quote["receivables"]], ["189.21", "81.09"])
+
+            csv_src, csv_dst = Path(tmp) / "orders.csv", Path(tmp) / "quotes.csv"
+            with csv_src.open("w", newline="") as fh:
+                writer = csv.writer(fh)
+                writer.writerow(["id", "amount", "payment_method", "installments", "splits"])
+                writer.writerow(["o1", "297.00", "card", 3, json.dumps(order["splits"])])
+            call_command("bulk_quote", str(csv_src), output=str(csv_dst), stdout=io.StringIO())
+            self.assertIn("o1,297.00,26.70,270.30", csv_dst.read_text())
@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from cakto_engine.database import database_config, shard_databases
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    base_dir = Path("/srv/app")
+
+    def test_sqlite_defaults_to_wal(self):
+        config = database_config({}, self.base_dir)
+        self.assertEqual(config["NAME"], self.base_dir / "db.sqlite3")
+        self.assertIn("PRAGMA journal_mode=WAL;", config["OPTIONS"]["init_command"])
+        self.assertIn("PRAGMA synchronous=NORMAL;", config["OPTIONS"]["init_command"])
+        self.assertEqual(config["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+        self.assertEqual(config["CONN_MAX_AGE"], 60)
+
+    def test_sqlite_without_wal_is_the_plain_setup(self):
+        config = database_config({"SQLITE_WAL": "0", "SQLITE_PATH": "/tmp/x.sqlite3"}, self.base_dir)
+        self.assertEqual(config, {"ENGINE": "django.db.backends.sqlite3", "NAME": "/tmp/x.sqlite3"})
+
+    def test_postgres_persistent_connections_or_pool(self):
+        env = {"DATABASE_ENGINE": "postgres", "POSTGRES_HOST": "db", "DB_CONN_MAX_AGE": "120"}
+        config = database_config(env, self.base_dir)
+        self.assertEqual((config["ENGINE"], config["HOST"], config["CONN_MAX_AGE"]), ("django.db.backends.postgresql", "db", 120))
+        self.assertNotIn("pool", config["OPTIONS"])
+
+        pooled = database_config({**env, "DB_POOL": "1", "DB_POOL_MAX_SIZE": "8"}, self.base_dir)
+        self.assertEqual(pooled["CONN_MAX_AGE"], 0)
+        self.assertEqual(pooled["OPTIONS"]["pool"]["max_size"], 8)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            database_config({"DATABASE_ENGINE": "oracle"}, self.base_dir)
+
+    def test_shards_reuse_the_default_settings_on_other_databases(self):
+        default = database_config({"SQLITE_PATH": "/tmp/x.sqlite3"}, self.base_dir)
+        shards = shard_databases({"DB_SHARDS": "3", "SQLITE_PATH_SHARD2": "/data/s2.sqlite3"}, default)
+        self.assertEqual(list(shards), ["shard1", "shard2"])
+        self.assertEqual((shards["shard1"]["NAME"], shards["shard2"]["NAME"]), ("/tmp/x.sqlite3.shard1", "/data/s2.sqlite3"))
+        self.assertEqual(shards["shard1"]["OPTIONS"], default["OPTIONS"])
+        self.assertEqual(shard_databases({}, default), {})
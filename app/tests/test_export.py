@@ -0,0 +1,80 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+
+from app.models import LedgerEntry, Payment
+from app.services.export import iter_rows
+
+DAY = datetime(2026, 3, 10, tzinfo=timezone.utc)
+
+
+def make_payment(i, created_at):
+    payment = Payment.objects.create(
+        payment_id=f"pmt_{i:04d}",
+        status="captured",
+        gross_amount=Decimal("100.00"),
+        platform_fee_amount=Decimal("0.00"),
+        net_amount=Decimal("100.00"),
+        payment_method="pix",
+        installments=1,
+        idempotency_key=f"exp-{i}",
+        created_at=created_at,
+    )
+    LedgerEntry.objects.create(payment=payment, recipient_id=f"r{i}", role="producer", amount=Decimal("100.00"), created_at=created_at)
+    return payment
+
+
+@override_settings(SUPPORT_API_TOKENS=["support-token"])
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # several rows share a timestamp so pages must tie-break on id
+        for i in range(7):
+            make_payment(i, DAY + timedelta(hours=i // 3))
+        make_payment(99, DAY + timedelta(days=1))
+
+    def setUp(self):
+        self.client = Client(headers={"Authorization": "Bearer support-token"})
+
+    def test_keyset_pages_cover_every_row_once(self):
+        with self.assertNumQueries(5):  # 8 rows, pages of 2, plus the empty last page
+            rows = list(iter_rows(Payment, ("payment_id",), chunk_size=2))
+        expected = list(Payment.objects.order_by("created_at", "id").values_list("payment_id"))
+        self.assertEqual(rows, expected)
+
+    def test_endpoint_streams_csv_for_a_day(self):
+        r = self.client.get("/api/v1/exports/payments", {"format": "csv", "date": "2026-03-10", "chunk_size": 3})
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.streaming)
+        rows = list(csv.DictReader(io.StringIO(b"".join(r.streaming_content).decode())))
+        self.assertEqual([row["payment_id"] for row in rows], [f"pmt_{i:04d}" for i in range(7)])
+        self.assertEqual(rows[0]["gross_amount"], "100.00")
+
+    def test_endpoint_rejects_unknown_format(self):
+        self.assertEqual(self.client.get("/api/v1/exports/payments", {"format": "xml"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/exports/refunds").status_code, 400)
+        r = self.client.get("/api/v1/exports/payments", {"chunk_size": "big"})
+        self.assertEqual((r.status_code, r.json()), (400, {"chunk_size": ["A valid integer is required."]}))
+        r = self.client.get("/api/v1/exports/payments", {"chunk_size": 0})
+        self.assertEqual(r.json(), {"chunk_size": ["Ensure this value is greater than or equal to 1."]})
+
+    def test_endpoint_requires_support_access(self):
+        self.assertEqual(Client().get("/api/v1/exports/payments").status_code, 403)
+        self.assertEqual(Client(headers={"Authorization": "Bearer nope"}).get("/api/v1/exports/ledger").status_code, 403)
+
+    def test_command_writes_ledger_jsonl(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ledger.jsonl")
+            call_command("export_ledger", "ledger", "--output", path, "--since", "2026-03-11", "--chunk-size", "1", stderr=io.StringIO())
+            with open(path) as fh:
+                lines = [json.loads(line) for line in fh]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]["payment_id"], "pmt_0099")
+        self.assertEqual(lines[0]["amount"], "100.00")
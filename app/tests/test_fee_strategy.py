@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+from decimal import Decimal
+
+from django.test import SimpleTestCase, override_settings
+
+from app.services.fee_strategy import (
+    compile_fee_table,
+    get_fee_percentage,
+    get_fee_table,
+    reload_fee_table,
+    supported_payment_methods,
+)
+
+
+class FeeTableTests(SimpleTestCase):
+    def tearDown(self):
+        reload_fee_table()
+
+    def test_compiled_rates_match_strategies(self):
+        table = compile_fee_table()
+        self.assertEqual(table.percentage("card", 1), Decimal("3.99"))
+        self.assertEqual(table.percentage("CARD", 3), Decimal("8.99"))
+        self.assertEqual(table.basis_points("card", 12), 2699)
+        self.assertEqual(table.percentage("pix", 1), Decimal("0.00"))
+        self.assertEqual(table.methods, frozenset({"pix", "card"}))
+        with self.assertRaises(ValueError):
+            table.percentage("boleto", 1)
+
+    def test_version_is_a_fingerprint_of_the_rates(self):
+        self.assertEqual(compile_fee_table().version, compile_fee_table().version)
+        changed = compile_fee_table({"card": {1: "2.99"}})
+        self.assertNotEqual(changed.version, compile_fee_table().version)
+
+    def test_only_compiled_installments_are_priced(self):
+        table = compile_fee_table({"card": {18: "30.00"}})
+        self.assertEqual(table.percentage("card", 18), Decimal("30.00"))
+        # not in the table: never priced by the live strategy behind its version
+        with self.assertRaisesMessage(ValueError, "unsupported installments for card: 13"):
+            table.percentage("card", 13)
+        with self.assertRaises(ValueError):
+            table.basis_points("pix", 0)
+
+    def test_hot_reload_from_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "fees.json")
+            with open(path, "w") as fh:
+                json.dump({"card": {"1": "2.50"}}, fh)
+            with override_settings(FEE_TABLE_FILE=path, FEE_TABLE_RELOAD_INTERVAL=0):
+                first = reload_fee_table()
+                self.assertEqual(get_fee_percentage("card", 1), Decimal("2.50"))
+
+                with open(path, "w") as fh:
+                    json.dump({"card": {"1": "2.75"}, "boleto": {"1": "1.00"}}, fh)
+                # make sure the mtime changes even on filesystems with coarse timestamps
+                mtime = os.stat(path).st_mtime + 10
+                os.utime(path, (mtime, mtime))
+                self.assertEqual(get_fee_percentage("card", 1), Decimal("2.75"))
+                self.assertIn("boleto", supported_payment_methods())
+                self.assertNotEqual(get_fee_table().version, first.version)
+
+
+    def test_invalid_file_keeps_the_last_good_table(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "fees.json")
+            with open(path, "w") as fh:
+                json.dump({"card": {"1": "2.50"}}, fh)
+            with override_settings(FEE_TABLE_FILE=path, FEE_TABLE_RELOAD_INTERVAL=0):
+                good = reload_fee_table()
+                for content in ('{"card": {"1": "2.', '{"card": {"1": "abc"}}'):
+                    with open(path, "w") as fh:
+                        fh.write(content)
+                    mtime = os.stat(path).st_mtime + 10
+                    os.utime(path, (mtime, mtime))
+                    with self.assertLogs("app.services.fee_strategy", "ERROR"):
+                        self.assertIs(get_fee_table(), good)
+                    # the bad file is not re-read until it changes
+                    with self.assertNoLogs("app.services.fee_strategy", "ERROR"):
+                        self.assertEqual(get_fee_percentage("card", 1), Decimal("2.50"))
@@ -0,0 +1,123 @@
+import threading
+from collections import Counter
+from unittest import mock
+
+from django.core.cache import cache as default_cache
+from django.db import connections
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient, APITestCase
+
+from app.models import IdempotencyRecord, Payment
+from app.services.idempotency import IdempotencyStore, StoredResponse, get_idempotency_store, request_hash
+
+PAYLOAD = {
+    "amount": "80.00",
+    "currency": "BRL",
+    "payment_method": "pix",
+    "splits": [{"recipient_id": "producer_1", "role": "producer", "percent": 100}],
+}
+
+
+class RequestHashTests(SimpleTestCase):
+    def test_key_order_does_not_matter(self):
+        reordered = dict(reversed(list(PAYLOAD.items())))
+        self.assertEqual(request_hash(PAYLOAD), request_hash(reordered))
+        self.assertNotEqual(request_hash(PAYLOAD), request_hash({**PAYLOAD, "amount": "80.01"}))
+
+    def test_shared_tier(self):
+        default_cache.clear()
+        stored = StoredResponse("h", 201, {"payment_id": "pmt_1"})
+        IdempotencyStore(shared=default_cache).remember("k", stored)
+        # SimpleTestCase forbids queries: the shared tier must answer
+        self.assertEqual(IdempotencyStore(shared=default_cache).get("k"), stored)
+
+
+class IdempotencyReplayTests(APITestCase):
+    url = "/api/v1/payments"
+
+    def setUp(self):
+        get_idempotency_store().local.clear()
+
+    def test_replays_and_conflicts_skip_payment_tables(self):
+        r1 = self.client.post(self.url, PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY="replay-1")
+        self.assertEqual(r1.status_code, 201)
+
+        # only the idempotency record is read; the cache tiers answer afterwards
+        with self.assertNumQueries(1):
+            r2 = self.client.post(self.url, PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY="replay-1")
+        with self.assertNumQueries(0):
+            r3 = self.client.post(self.url, PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY="replay-1")
+            conflict = self.client.post(self.url, {**PAYLOAD, "amount": "81.00"}, format="json", HTTP_IDEMPOTENCY_KEY="replay-1")
+        self.assertEqual((r2.status_code, r3.status_code, conflict.status_code), (200, 200, 409))
+        self.assertEqual(r2.data, r1.data)
+        self.assertEqual(r3.data, r1.data)
+
+
+class IdempotencyClaimTests(APITestCase):
+    url = "/api/v1/payments"
+
+    def setUp(self):
+        get_idempotency_store().local.clear()
+
+    def claim_elsewhere(self, key, payload, lock_seconds=30):
+        claim = get_idempotency_store().claim({key: request_hash(payload)}, lock_seconds=lock_seconds)
+        self.assertIn(key, claim.owned)
+        return claim
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_in_flight_duplicate_gets_409(self):
+        self.claim_elsewhere("inflight-1", PAYLOAD)
+        r = self.client.post(self.url, PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY="inflight-1")
+        self.assertEqual(r.status_code, 409)
+        self.assertEqual(r.data["detail"], "Idempotency key in progress")
+        other = self.client.post(self.url, {**PAYLOAD, "amount": "1.00"}, format="json", HTTP_IDEMPOTENCY_KEY="inflight-1")
+        self.assertEqual(other.data["detail"], "Idempotency key conflict: different payload")
+        self.assertFalse(Payment.objects.exists())
+
+    def test_abandoned_claim_is_taken_over(self):
+        self.claim_elsewhere("crashed-1", PAYLOAD, lock_seconds=-1)
+        r = self.client.post(self.url, PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY="crashed-1")
+        self.assertEqual(r.status_code, 201)
+        record = IdempotencyRecord.objects.get(key="crashed-1")
+        self.assertEqual((record.state, record.status_code), (IdempotencyRecord.COMPLETED, 201))
+
+    def test_failed_write_releases_the_claim(self):
+        with mock.patch("app.api.views.record_payment", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                self.client.post(self.url, PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY="release-1")
+        self.assertFalse(IdempotencyRecord.objects.filter(key="release-1").exists())
+
+
+
+@override_settings(DATABASE_SHARDS=["concurrent"])
+class ConcurrentDuplicateTests(TransactionTestCase):
+    url = "/api/v1/payments"
+    # a file database, declared in the test settings
+    databases = {"default", "concurrent"}
+
+    def setUp(self):
+        get_idempotency_store().local.clear()
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_concurrent_duplicates_create_one_payment(self):
+        start = threading.Barrier(6)
+        codes = []
+
+        def post():
+            try:
+                start.wait()
+                r = APIClient().post(self.url, PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY="race-1")
+                codes.append(r.status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=post) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        counts = Counter(codes)
+        self.assertEqual(counts[201], 1)
+        self.assertEqual(counts[200] + counts[409], 5)
+        self.assertEqual(Payment.objects.using("concurrent").count(), 1)
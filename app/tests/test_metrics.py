@@ -0,0 +1,82 @@
+import re
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from app.services import metrics
+from app.services.idempotency import get_idempotency_store
+
+PAYLOAD = {
+    "amount": "297.00",
+    "currency": "BRL",
+    "payment_method": "card",
+    "installments": 3,
+    "splits": [
+        {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+        {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 30},
+    ],
+}
+
+
+class HistogramTests(SimpleTestCase):
+    def test_percentiles_within_relative_error(self):
+        hist = metrics.Histogram()
+        for value in range(1, 100_001):
+            hist.record(value)
+        self.assertEqual(hist.count, 100_000)
+        self.assertEqual(hist.max, 100_000)
+        for p in (50, 90, 99, 99.9):
+            exact = p * 1000
+            self.assertLessEqual(abs(hist.percentile(p) - exact) / exact, 1 / 64, p)
+        self.assertEqual(hist.percentile(100), 100_000)
+
+    def test_nested_stages_record_their_own_time(self):
+        timings, token = metrics.begin_request()
+        try:
+            with metrics.stage("parse"):
+                with metrics.stage("validate"):
+                    sum(range(10_000))
+        finally:
+            metrics.end_request(token)
+        self.assertEqual(set(timings.stages), {"parse", "validate"})
+        self.assertGreater(timings.stages["validate"], 0)
+        self.assertIs(metrics.stage("parse"), metrics.stage("db"))  # no request: shared no-op
+
+
+@override_settings(REQUEST_METRICS={"ENABLED": True})
+class RequestMetricsTests(APITestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        get_idempotency_store().local.clear()
+
+    def sample(self, text, name, **labels):
+        wanted = ",".join(f'{k}="{v}"' for k, v in labels.items())
+        match = re.search(rf"^{name}\{{{re.escape(wanted)}\}} (\S+)$", text, re.M)
+        self.assertIsNotNone(match, f"{name}{{{wanted}}} missing")
+        return float(match.group(1))
+
+    def test_payment_stages_and_queries_exposed(self):
+        r = self.client.post("/api/v1/payments", PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY="metrics-1")
+        self.assertEqual(r.status_code, 201)
+
+        r = self.client.get("/metrics")
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r["Content-Type"].startswith("text/plain"))
+        text = r.content.decode()
+        for stage in ("parse", "validate", "calculate", "idempotency", "db", "render"):
+            self.assertEqual(self.sample(text, "cakto_request_stage_seconds_count", view="payments", stage=stage), 1)
+        self.assertEqual(self.sample(text, "cakto_request_duration_seconds_count", view="payments", method="POST", status="201"), 1)
+        self.assertGreater(self.sample(text, "cakto_request_queries_sum", view="payments"), 0)
+
+    def test_async_view_measured(self):
+        r = self.client.post("/api/v1/async/checkout/quote", PAYLOAD, format="json")
+        self.assertEqual(r.status_code, 200)
+        text = metrics.registry.render()
+        for stage in ("parse", "validate", "calculate", "render"):
+            self.assertEqual(self.sample(text, "cakto_request_stage_seconds_count", view="quote-async", stage=stage), 1)
+
+    @override_settings(REQUEST_METRICS={"ENABLED": False})
+    def test_disabled(self):
+        self.client.post("/api/v1/checkout/quote", PAYLOAD, format="json")
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+        self.assertEqual(metrics.registry.render().strip(), "")
@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from app.models import Payment
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Migrates back to `migrate_from`, lets the test add rows, then forward to `migrate_to`."""
+
+    migrate_from = None
+    migrate_to = None
+    alias = "default"
+
+    def setUp(self):
+        executor = MigrationExecutor(connections[self.alias])
+        self.latest = executor.loader.graph.leaf_nodes("app")
+        executor.migrate([("app", self.migrate_from)])
+        self.old_apps = executor.loader.project_state([("app", self.migrate_from)]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connections[self.alias])
+        executor.loader.build_graph()
+        executor.migrate(self.latest)
+
+    def migrate(self):
+        executor = MigrationExecutor(connections[self.alias])
+        executor.loader.build_graph()
+        executor.migrate([("app", self.migrate_to)])
+        return executor.loader.project_state([("app", self.migrate_to)]).apps
+
+
+class OutboxPaymentMigrationTests(MigrationTestCase):
+    migrate_from = "0002_outbox_relay_fields"
+    migrate_to = "0003_outbox_payment_fk_and_indexes"
+
+    def payment(self, payment_id, key):
+        Payment = self.old_apps.get_model("app", "Payment")
+        return Payment.objects.using(self.alias).create(
+            payment_id=payment_id,
+            status="captured",
+            gross_amount="10.00",
+            platform_fee_amount="0.50",
+            net_amount="9.50",
+            payment_method="pix",
+            idempotency_key=key,
+        )
+
+    def test_outbox_events_are_linked_to_their_payments(self):
+        events = self.old_apps.get_model("app", "OutboxEvent").objects.using(self.alias)
+        self.payment("pmt_1", "k1")
+        events.create(type="payment_captured", payload={"payment_id": "pmt_1"})
+        events.create(type="payment_captured", payload={"payment_id": "pmt_gone"})
+        events.create(type="other", payload={})
+
+        apps = self.migrate()
+        events = apps.get_model("app", "OutboxEvent").objects.using(self.alias).order_by("id")
+        self.assertEqual([e.payment and e.payment.payment_id for e in events], ["pmt_1", None, None])
+
+    def test_duplicate_idempotency_keys_stay_on_the_first_payment(self):
+        self.payment("pmt_1", "dup")
+        self.payment("pmt_2", "dup")
+        self.payment("pmt_3", "dup")
+        self.payment("pmt_4", "single")
+        self.payment("pmt_5", None)
+
+        apps = self.migrate()
+        keys = apps.get_model("app", "Payment").objects.using(self.alias).order_by("id").values_list("payment_id", "idempotency_key")
+        self.assertEqual(list(keys), [("pmt_1", "dup"), ("pmt_2", None), ("pmt_3", None), ("pmt_4", "single"), ("pmt_5", None)])
+
+
+class ShardOutboxPaymentMigrationTests(OutboxPaymentMigrationTests):
+    """The same data migrations, run by ``migrate --database shard1``."""
+
+    alias = "shard1"
+    databases = {"default", "shard1"}
+
+
+class LedgerDatesMigrationTests(MigrationTestCase):
+    migrate_from = "0011_ledger_recipient_index"
+    migrate_to = "0012_ledger_created_at_backfill"
+
+    def test_entries_get_the_date_of_their_payment(self):
+        Payment = self.old_apps.get_model("app", "Payment")
+        LedgerEntry = self.old_apps.get_model("app", "LedgerEntry")
+        created = timezone.now() - timedelta(days=3)
+        payment = Payment.objects.create(
+            payment_id="pmt_1", status="captured", gross_amount=10, platform_fee_amount=0, net_amount=10, payment_method="pix", created_at=created
+        )
+        for delay in (0, 1, 90000):
+            LedgerEntry.objects.create(
+                payment=payment, recipient_id="r", role="producer", amount=5, created_at=created + timedelta(microseconds=delay)
+            )
+
+        apps = self.migrate()
+        dates = apps.get_model("app", "LedgerEntry").objects.values_list("created_at", flat=True)
+        self.assertEqual(set(dates), {created})
+
+
+class PaymentConstraintTests(TestCase):
+    def test_idempotency_key_is_unique(self):
+        fields = {"status": "captured", "gross_amount": 10, "platform_fee_amount": 0, "net_amount": 10, "payment_method": "pix"}
+        Payment.objects.create(payment_id="pmt_1", idempotency_key="k", **fields)
+        Payment.objects.create(payment_id="pmt_2", idempotency_key=None, **fields)
+        Payment.objects.create(payment_id="pmt_3", idempotency_key=None, **fields)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Payment.objects.create(payment_id="pmt_4", idempotency_key="k", **fields)
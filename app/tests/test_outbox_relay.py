@@ -0,0 +1,84 @@
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from app.models import OutboxEvent
+from app.services.outbox_relay import InMemoryPublisher, OutboxPublisher, OutboxRelay, outbox_lag_metrics
+
+
+class FlakyPublisher(OutboxPublisher):
+    def publish(self, events):
+        raise ConnectionError("broker down")
+
+
+class OutboxRelayTests(TestCase):
+    def make_events(self, n):
+        base = timezone.now() - timedelta(minutes=10)
+        OutboxEvent.objects.bulk_create(
+            OutboxEvent(type="payment_captured", payload={"payment_id": f"pmt_{i}"}, created_at=base + timedelta(seconds=i))
+            for i in range(n)
+        )
+
+    def test_drains_backlog_in_created_at_order(self):
+        self.make_events(5)
+        publisher = InMemoryPublisher()
+        relay = OutboxRelay(publisher, batch_size=2)
+        self.assertEqual(relay.run(once=True), 5)
+        self.assertEqual([m["payload"]["payment_id"] for m in publisher.messages], [f"pmt_{i}" for i in range(5)])
+        self.assertFalse(OutboxEvent.objects.exclude(status="published").exists())
+        self.assertFalse(OutboxEvent.objects.filter(published_at__isnull=True).exists())
+        self.assertGreater(relay.stats()["max_lag_seconds"], 0)
+
+    def test_claims_do_not_overlap(self):
+        self.make_events(4)
+        first = OutboxRelay(InMemoryPublisher(), batch_size=3).claim()
+        second = OutboxRelay(InMemoryPublisher(), batch_size=3).claim()
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({e.id for e in first} & {e.id for e in second})
+
+    def test_failed_publish_backs_off_then_dead_letters(self):
+        self.make_events(1)
+        relay = OutboxRelay(FlakyPublisher(), max_attempts=2, backoff_base=60)
+        self.assertEqual(relay.relay_once(), 0)
+        event = OutboxEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), ("pending", 1))
+        self.assertGreater(event.available_at, timezone.now())
+        # not claimable again until the backoff has passed
+        self.assertEqual(relay.claim(), [])
+
+        OutboxEvent.objects.update(available_at=timezone.now() - timedelta(seconds=1))
+        relay.relay_once()
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts, event.last_error), ("failed", 2, "broker down"))
+
+    def test_expired_lease_is_reclaimed(self):
+        self.make_events(1)
+        OutboxRelay(InMemoryPublisher(), lease_seconds=-1).claim()  # worker died after claiming
+        publisher = InMemoryPublisher()
+        self.assertEqual(OutboxRelay(publisher).relay_once(), 1)
+        self.assertEqual(len(publisher.messages), 1)
+
+    def test_lag_metrics(self):
+        self.make_events(2)
+        metrics = outbox_lag_metrics()
+        self.assertEqual(metrics["pending"], 2)
+        self.assertGreaterEqual(metrics["oldest_pending_age_seconds"], 600)
+
+    def test_command_publishes_to_configured_file(self):
+        self.make_events(3)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "events.jsonl")
+            publisher = {"CLASS": "app.services.outbox_relay.FilePublisher", "OPTIONS": {"path": path}}
+            out = io.StringIO()
+            with override_settings(OUTBOX_PUBLISHER=publisher):
+                call_command("relay_outbox", "--once", stdout=out)
+            with open(path) as fh:
+                self.assertEqual(len([json.loads(line) for line in fh]), 3)
+        self.assertIn("published=3", out.getvalue())
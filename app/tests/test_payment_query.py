@@ -0,0 +1,84 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from app.models import LedgerEntry, Payment
+
+
+@override_settings(SUPPORT_API_TOKENS=["support-token"])
+class PaymentQueryTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        start = timezone.now() - timedelta(days=1)
+        for i in range(11):
+            # pairs of payments share a created_at: the id breaks the tie
+            created_at = start + timedelta(minutes=i // 2)
+            p = Payment.objects.create(
+                payment_id=f"pmt_{i:02d}",
+                status="captured",
+                gross_amount=Decimal("100.00"),
+                platform_fee_amount=Decimal("3.99"),
+                net_amount=Decimal("96.01"),
+                payment_method="card" if i % 3 else "pix",
+                installments=1,
+                created_at=created_at,
+            )
+            recipients = [("producer_1", "producer", "76.01"), (f"affiliate_{i % 2}", "affiliate", "20.00")]
+            LedgerEntry.objects.bulk_create(
+                LedgerEntry(payment=p, recipient_id=r, role=role, amount=Decimal(a), created_at=created_at) for r, role, a in recipients
+            )
+        cls.start = start
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer support-token")
+
+    def pages(self, **params):
+        seen, cursor = [], None
+        while True:
+            query = {**params, **({"cursor": cursor} if cursor else {})}
+            with self.assertNumQueries(2):
+                body = self.client.get("/api/v1/payments", query).json()
+            seen.append([p["payment_id"] for p in body["results"]])
+            cursor = body["next_cursor"]
+            if cursor is None:
+                return seen
+
+    def test_pages_walk_every_payment_newest_first_with_constant_queries(self):
+        pages = self.pages(limit=3)
+        self.assertEqual([len(p) for p in pages], [3, 3, 3, 2])
+        self.assertEqual(sum(pages, []), [f"pmt_{i:02d}" for i in range(10, -1, -1)])
+
+        first = self.client.get("/api/v1/payments", {"limit": 1}).json()["results"][0]
+        self.assertEqual(first["ledger_entries"][1], {"recipient_id": "affiliate_0", "role": "affiliate", "amount": "20.00", "settlement_id": None})
+
+    def test_filters(self):
+        self.assertEqual(sum(self.pages(recipient_id="affiliate_1", limit=2), []), [f"pmt_{i:02d}" for i in (9, 7, 5, 3, 1)])
+        self.assertEqual(sum(self.pages(payment_method="pix", recipient_id="producer_1"), []), ["pmt_09", "pmt_06", "pmt_03", "pmt_00"])
+        since = (self.start + timedelta(minutes=4)).isoformat()
+        self.assertEqual(sum(self.pages(since=since, limit=1), []), ["pmt_10", "pmt_09", "pmt_08"])
+
+    def test_detail_and_bad_requests(self):
+        body = self.client.get("/api/v1/payments/pmt_04").json()
+        self.assertEqual((body["payment_id"], len(body["ledger_entries"])), ("pmt_04", 2))
+        self.assertEqual(self.client.get("/api/v1/payments/pmt_99").status_code, 404)
+        self.assertEqual(self.client.get("/api/v1/payments/pmt_04-7").status_code, 404)
+        self.assertEqual(self.client.get("/api/v1/payments", {"cursor": "nope"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/payments", {"limit": 0}).status_code, 400)
+        r = self.client.get("/api/v1/payments", {"limit": "ten"})
+        self.assertEqual((r.status_code, r.json()), (400, {"limit": ["A valid integer is required."]}))
+        self.assertEqual(self.client.get("/api/v1/payments", {"since": "yesterday"}).status_code, 400)
+
+    def test_only_support_clients_read_payments(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get("/api/v1/payments").status_code, 403)
+        self.assertEqual(self.client.get("/api/v1/payments/pmt_04").status_code, 403)
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(self.client.get("/api/v1/payments").status_code, 403)
+
+        self.client.credentials()
+        self.client.force_login(User.objects.create_user("support", is_staff=True))
+        self.assertEqual(self.client.get("/api/v1/payments/pmt_04").status_code, 200)
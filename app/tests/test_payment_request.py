@@ -0,0 +1,83 @@
+import json
+import random
+from decimal import Decimal
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from app.api.payment_request import PaymentRequestError, parse_payment_request, parse_with_serializer
+
+from .test_split_calculator import random_payload
+
+BASE = {
+    "amount": "297.00",
+    "currency": "BRL",
+    "payment_method": "card",
+    "installments": 3,
+    "splits": [
+        {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+        {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 30},
+    ],
+}
+
+FIELD_VALUES = {
+    "amount": [None, "", "  ", True, [1], {}, 1e20, "1e3", "NaN", "-Infinity", "10.005", "12345678901.5", "-5", 0.1, 7, "x" * 1001],
+    "currency": [None, "", " ", True, 5, 1.5, [], "brl", " BRL ", "a\x00b", "USD"],
+    "payment_method": [None, "", "CARD", "pix", "boleto", 3, {}],
+    "installments": [None, "", "3.0", 3.5, True, [1], 0, -2, 13, "12", "9" * 1001],
+    "splits": [None, {}, "x", [], [None], ["x"], [{}], [{"recipient_id": "a", "role": "r", "percent": "100"}],
+               [{"recipient_id": "a", "role": "r", "percent": 101}, {"recipient_id": " ", "role": None, "percent": "x"}],
+               [{"recipient_id": "a", "role": "r", "percent": 20}] * 5, [{"recipient_id": "a", "role": "r", "percent": 10}] * 10],
+}
+
+
+def outcome(parse, body):
+    """JSON-comparable result of a parser: the error body or the parsed fields."""
+    try:
+        req = parse(body)
+    except PaymentRequestError as e:
+        return ("invalid", e.status_code, json.loads(json.dumps(e.detail)))
+    error = (req.error.status_code, str(req.error)) if req.error else None
+    return ("parsed", req.amount, req.currency, req.payment_method, req.installments, req.splits, error)
+
+
+class ParserParityTests(SimpleTestCase):
+    def assertSameOutcome(self, body):
+        self.assertEqual(outcome(parse_payment_request, body), outcome(parse_with_serializer, body), body)
+
+    def test_malformed_bodies(self):
+        for body in [None, [], "x", 5, {}, {"amount": "1.00"}]:
+            self.assertSameOutcome(body)
+
+    def test_each_field_variant(self):
+        for field, values in FIELD_VALUES.items():
+            for value in values:
+                self.assertSameOutcome({**BASE, field: value})
+            self.assertSameOutcome({k: v for k, v in BASE.items() if k != field})
+
+    def test_random_combinations(self):
+        rng = random.Random(20260211)
+        for _ in range(2000):
+            body = random_payload(rng)
+            body["amount"] = str(body["amount"])
+            body["currency"] = "BRL"
+            for field in rng.sample(list(FIELD_VALUES), rng.randint(0, 2)):
+                body[field] = rng.choice(FIELD_VALUES[field])
+            self.assertSameOutcome(body)
+
+    def test_parses_valid_body(self):
+        req = parse_payment_request({**BASE, "amount": "1e3", "installments": None})
+        self.assertEqual(req.amount, Decimal("1000.00"))
+        self.assertEqual(req.installments, 1)
+        self.assertIsNone(req.error)
+        self.assertFalse(hasattr(req, "__dict__"))
+
+
+class ParserSettingTests(APITestCase):
+    def test_views_answer_the_same_with_either_parser(self):
+        bodies = [BASE, {**BASE, "payment_method": "boleto"}, {**BASE, "amount": "abc"}, {**BASE, "splits": [{}]}]
+        for path in ["app.api.payment_request.parse_payment_request", "app.api.payment_request.parse_with_serializer"]:
+            with self.subTest(path), override_settings(PAYMENT_REQUEST_PARSER=path):
+                responses = [self.client.post("/api/v1/checkout/quote", b, format="json") for b in bodies]
+                self.assertEqual([r.status_code for r in responses], [200, 422, 400, 400])
+                self.assertEqual(responses[2].json(), {"amount": ["A valid number is required."]})
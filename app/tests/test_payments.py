@@ -87,3 +87,18 @@ class PaymentsTests(APITestCase):
         self.assertEqual(r1.status_code, 201)
         r2 = self.client.post(self.base_url, payload2, format="json", HTTP_IDEMPOTENCY_KEY="key-2")
         self.assertEqual(r2.status_code, 409)
+
+    def test_idempotency_key_must_fit_the_column(self):
+        payload = {
+            "amount": "62.00",
+            "currency": "BRL",
+            "payment_method": "pix",
+            "splits": [{"recipient_id": "producer_1", "role": "producer", "percent": 100}],
+        }
+        r = self.client.post(self.base_url, payload, format="json", HTTP_IDEMPOTENCY_KEY="k" * 129)
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.data["detail"], "Idempotency-Key header must be at most 128 characters")
+        r = self.client.post(self.base_url, payload, format="json", HTTP_IDEMPOTENCY_KEY="  ")
+        self.assertEqual(r.status_code, 400)
+        r = self.client.post(self.base_url, payload, format="json", HTTP_IDEMPOTENCY_KEY="k" * 128)
+        self.assertEqual(r.status_code, 201)
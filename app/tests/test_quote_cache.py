@@ -0,0 +1,85 @@
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache as default_cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from app.services import fee_strategy
+from app.services.cache import LRUCache
+from app.services.quote_cache import QuoteCache, get_quote_cache, quote_cache_key
+from app.services.split_types import as_splits
+
+SPLITS = [
+    {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+    {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 30},
+]
+PAYLOAD = {"amount": "297.00", "currency": "BRL", "payment_method": "card", "installments": 3, "splits": SPLITS}
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_entries_expire(self):
+        cache = LRUCache(ttl=0.01)
+        cache.set("a", 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+
+class QuoteCacheKeyTests(SimpleTestCase):
+    def tearDown(self):
+        fee_strategy.reload_fee_table()
+
+    def test_equivalent_amounts_share_a_key(self):
+        a = quote_cache_key(amount=Decimal("100"), payment_method="card", installments=1, splits=as_splits(SPLITS))
+        b = quote_cache_key(amount=Decimal("100.00"), payment_method="CARD", installments=1, splits=as_splits(SPLITS))
+        self.assertEqual(a, b)
+        c = quote_cache_key(amount=Decimal("100.01"), payment_method="card", installments=1, splits=as_splits(SPLITS))
+        self.assertNotEqual(a, c)
+
+    def test_fee_table_version_change_invalidates(self):
+        before = quote_cache_key(amount=Decimal("100"), payment_method="card", installments=1, splits=as_splits(SPLITS))
+        changed = fee_strategy.compile_fee_table({"card": {1: "1.00"}})
+        with mock.patch.object(fee_strategy, "_fee_table", changed), mock.patch.object(fee_strategy, "_overrides_path", None):
+            after = quote_cache_key(amount=Decimal("100"), payment_method="card", installments=1, splits=as_splits(SPLITS))
+        self.assertNotEqual(before, after)
+
+    def test_shared_tier_is_used_on_local_miss(self):
+        default_cache.clear()
+        compute = mock.Mock(return_value={"net_amount": "1.00"})
+        worker_a = QuoteCache(shared=default_cache)
+        worker_b = QuoteCache(shared=default_cache)
+        worker_a.get_or_compute("k", compute)
+        self.assertEqual(worker_b.get_or_compute("k", compute), {"net_amount": "1.00"})
+        self.assertEqual(compute.call_count, 1)
+        self.assertEqual(worker_b.stats()["shared_hits"], 1)
+
+
+@override_settings(QUOTE_CACHE={"ENABLED": True, "MAX_ENTRIES": 100, "TTL": 60})
+class QuoteViewCacheTests(APITestCase):
+    def test_repeated_quotes_hit_the_cache(self):
+        get_quote_cache().clear()
+        before = get_quote_cache().stats()
+        r1 = self.client.post("/api/v1/checkout/quote", PAYLOAD, format="json")
+        r2 = self.client.post("/api/v1/checkout/quote", PAYLOAD, format="json")
+        self.assertEqual(r1.data, r2.data)
+        self.assertEqual(r2.data["platform_fee_amount"], "26.70")
+        stats = self.client.get("/api/v1/checkout/quote/cache").data
+        self.assertEqual((stats["hits"] - before["hits"], stats["misses"] - before["misses"]), (1, 1))
+
+    def test_errors_are_not_cached(self):
+        get_quote_cache().clear()
+        bad = {**PAYLOAD, "amount": "0.00"}
+        self.assertEqual(self.client.post("/api/v1/checkout/quote", bad, format="json").status_code, 400)
+        self.assertEqual(get_quote_cache().stats()["entries"], 0)
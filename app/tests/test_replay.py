@@ -0,0 +1,71 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+
+from app.models import LedgerEntry, Payment
+from app.services.fee_strategy import get_fee_table
+from app.services.idempotency import get_idempotency_store
+from app.services.replay import run_replay
+
+
+def card(amount, installments=3):
+    return {
+        "amount": amount,
+        "currency": "BRL",
+        "payment_method": "card",
+        "installments": installments,
+        "splits": [
+            {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+            {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 30},
+        ],
+    }
+
+
+class ReplayTests(APITestCase):
+    def setUp(self):
+        get_idempotency_store().local.clear()
+        for i in range(5):
+            r = self.client.post("/api/v1/payments", card(f"{100 + i}.00", installments=1 + i), format="json", HTTP_IDEMPOTENCY_KEY=f"replay-{i}")
+            self.assertEqual(r.status_code, 201)
+        self.ids = list(Payment.objects.order_by("id").values_list("id", flat=True))
+
+    def replay(self, **kwargs):
+        diffs = []
+        stats = run_replay(workers=1, shard_size=2, chunk_size=1, on_diffs=diffs.extend, **kwargs)
+        return stats, {(d["id"], d["field"]) for d in diffs}
+
+    def test_both_calculators_reproduce_stored_payments(self):
+        for path in ("app.services.split_calculator.SimpleSplitCalculator", "app.services.split_calculator.CentsSplitCalculator"):
+            stats, diffs = self.replay(calculator=path)
+            self.assertEqual((stats.replayed, stats.matched, diffs), (5, 5, set()))
+
+    def test_reports_the_first_differing_amount(self):
+        Payment.objects.filter(id=self.ids[1]).update(net_amount="1.00")
+        entry = LedgerEntry.objects.filter(payment_id=self.ids[3]).order_by("id").first()
+        LedgerEntry.objects.filter(id=entry.id).update(amount=entry.amount + 1)
+        Payment.objects.filter(id=self.ids[4]).update(request_body={"amount": "1.00"})
+        stats, diffs = self.replay()
+        self.assertEqual(diffs, {(self.ids[1], "net_amount"), (self.ids[3], "receivables"), (self.ids[4], "rejected")})
+        self.assertEqual(stats.matched, 2)
+
+    def test_new_fee_table_version(self):
+        version = get_fee_table().version
+        # only one-installment card payments get cheaper
+        stats, diffs = self.replay(fee_overrides={"card": {"1": "1.00"}})
+        self.assertEqual(diffs, {(self.ids[0], "platform_fee_amount")})
+        # the pinned table does not outlive the replay
+        self.assertEqual(get_fee_table().version, version)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            fee_file, report = os.path.join(tmp, "fees.json"), os.path.join(tmp, "diffs.jsonl")
+            with open(fee_file, "w") as fh:
+                json.dump({"card": {"1": "1.00"}}, fh)
+            out = io.StringIO()
+            call_command("replay_payments", "--workers", "1", "--fee-table", fee_file, "--report", report, stdout=out, stderr=io.StringIO())
+            self.assertIn("1 differing", out.getvalue())
+            with open(report) as fh:
+                self.assertEqual(json.loads(fh.readline())["payment_id"], Payment.objects.get(id=self.ids[0]).payment_id)
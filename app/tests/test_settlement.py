@@ -0,0 +1,71 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from app.models import LedgerEntry, Settlement
+from app.services.idempotency import get_idempotency_store
+from app.services.settlement import SettlementRun, settle, settle_chunk
+
+
+def pix(amount, affiliate="affiliate_9"):
+    return {
+        "amount": amount,
+        "currency": "BRL",
+        "payment_method": "pix",
+        "splits": [
+            {"recipient_id": "producer_1", "role": "producer", "percent": 60},
+            {"recipient_id": affiliate, "role": "affiliate", "percent": 40},
+        ],
+    }
+
+
+class SettlementTests(APITestCase):
+    def setUp(self):
+        get_idempotency_store().local.clear()
+        for i in range(6):
+            body = pix(f"{10 + i}.00", affiliate=f"affiliate_{i % 3}")
+            r = self.client.post("/api/v1/payments", body, format="json", HTTP_IDEMPOTENCY_KEY=f"settle-{i}")
+            self.assertEqual(r.status_code, 201)
+
+    def test_groups_entries_per_recipient_and_role(self):
+        run = settle(chunk_size=4)
+        self.assertEqual(run.entries, 12)
+        self.assertEqual(run.total, Decimal("75.00"))
+        self.assertFalse(LedgerEntry.objects.filter(settlement__isnull=True).exists())
+
+        settlements = Settlement.objects.filter(run_id=run.run_id)
+        self.assertEqual(run.settlements, 4)
+        self.assertEqual(set(settlements.values_list("status", flat=True)), {Settlement.CLOSED})
+        for s in settlements:
+            entries = LedgerEntry.objects.filter(settlement=s)
+            self.assertEqual((s.total, s.entry_count), (entries.aggregate(t=Sum("amount"))["t"], entries.count()))
+            self.assertEqual({(e.recipient_id, e.role) for e in entries}, {(s.recipient_id, s.role)})
+        producer = settlements.get(recipient_id="producer_1")
+        self.assertEqual((producer.total, producer.entry_count), (Decimal("45.00"), 6))
+
+        # nothing left: a new run settles nothing
+        self.assertEqual(settle().entries, 0)
+
+    def test_cutoff_and_resuming_an_interrupted_run(self):
+        late = LedgerEntry.objects.order_by("id").last()
+        LedgerEntry.objects.filter(id=late.id).update(created_at=timezone.now() + timedelta(days=1))
+        cutoff = timezone.now()
+
+        # one chunk, then the run "crashes": its settlements stay open
+        run = SettlementRun(run_id="interrupted", cutoff=cutoff)
+        self.assertIsNotNone(settle_chunk(run, {}, None, chunk_size=5))
+        self.assertEqual(LedgerEntry.objects.filter(settlement__status=Settlement.OPEN).count(), 5)
+
+        out = StringIO()
+        call_command("settle_ledger", "--run-id", "interrupted", "--cutoff", cutoff.isoformat(), "--chunk-size", "3", stdout=out, stderr=StringIO())
+        self.assertIn("6 entries settled", out.getvalue())
+        self.assertFalse(Settlement.objects.filter(status=Settlement.OPEN).exists())
+        self.assertEqual(list(LedgerEntry.objects.filter(settlement__isnull=True).values_list("id", flat=True)), [late.id])
+        self.assertEqual(Settlement.objects.filter(run_id="interrupted").aggregate(n=Sum("entry_count"))["n"], 11)
+        with self.assertRaises(ValueError):
+            settle(run_id="interrupted")
@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.db import router
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from app.models import LedgerEntry, OutboxEvent, Payment, RecipientBalance, SplitTemplate
+from app.services.accounting_check import GROSS_MISMATCH, run_check
+from app.services.balances import reconcile_balances
+from app.services.export import export_lines
+from app.services.idempotency import get_idempotency_store
+from app.services.ids import SnowflakeGenerator, UlidGenerator, decode_base32
+from app.services.outbox_relay import InMemoryPublisher, OutboxRelay, outbox_lag_metrics
+from app.services.replay import run_replay
+from app.services.settlement import settle
+from app.services.sharding import shard_for_key, shard_for_payment_id, shard_index_for_key, tag_payment_id, use_shard
+
+SHARDS = ["default", "shard1", "shard2"]
+
+
+class IdGeneratorTests(SimpleTestCase):
+    def test_ids_are_unique_and_time_ordered(self):
+        for gen in (UlidGenerator(prefix="pmt_"), SnowflakeGenerator(node_id=7, prefix="pmt_")):
+            ids = []
+
+            def make():
+                for _ in range(2000):
+                    ids.append(gen.new_id())
+
+            threads = [threading.Thread(target=make) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertEqual(len(set(ids)), len(ids))
+            first, later = gen.new_id(), (time.sleep(0.002), gen.new_id())[1]
+            self.assertLess(first, later)
+            self.assertAlmostEqual(gen.timestamp_ms(later) / 1000, time.time(), delta=1)
+
+    def test_snowflake_node_id(self):
+        gen = SnowflakeGenerator(node_id=1023)
+        self.assertEqual(len(gen.new_id()), 13)
+        with self.assertRaises(ValueError):
+            SnowflakeGenerator(node_id=1024)
+
+    def test_snowflake_forked_children_get_their_own_node_id(self):
+        def node(id_):
+            return (decode_base32(id_[:13]) >> SnowflakeGenerator.SEQUENCE_BITS) & 1023
+
+        gen = SnowflakeGenerator()
+        self.assertEqual(node(gen.new_id()), os.getpid() % 1024)
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.write(write, gen.new_id().encode())
+            os._exit(0)
+        os.close(write)
+        child_id = os.read(read, 64).decode()
+        os.close(read)
+        os.waitpid(pid, 0)
+        self.assertEqual(node(child_id), pid % 1024)
+        self.assertEqual(node(SnowflakeGenerator(node_id=7).new_id()), 7)
+
+
+@override_settings(DATABASE_SHARDS=SHARDS)
+class ShardRoutingTests(SimpleTestCase):
+    def test_keys_spread_and_appending_a_shard_only_moves_keys_to_it(self):
+        keys = [f"key-{i}" for i in range(3000)]
+        before = {k: shard_index_for_key(k) for k in keys}
+        self.assertTrue(all(n > 800 for n in Counter(before.values()).values()))
+        with override_settings(DATABASE_SHARDS=SHARDS + ["shard3"]):
+            moved = [k for k in keys if shard_index_for_key(k) != before[k]]
+            self.assertEqual({shard_for_key(k) for k in moved}, {"shard3"})
+        self.assertLess(len(moved), len(keys) / 3)
+
+    def test_payment_ids_name_their_shard(self):
+        self.assertEqual(tag_payment_id("pmt_01ABC", "default"), "pmt_01ABC")
+        self.assertEqual(shard_for_payment_id(tag_payment_id("pmt_01ABC", "shard2")), "shard2")
+        self.assertEqual(shard_for_payment_id("pmt_3fa2b1c0"), "default")
+
+    def test_router_follows_the_selected_shard(self):
+        self.assertEqual(router.db_for_write(Payment), "default")
+        with use_shard("shard1"):
+            self.assertEqual(router.db_for_write(Payment), "shard1")
+            self.assertEqual(router.db_for_read(SplitTemplate), "default")
+
+    def test_router_migrates_global_models_on_default_only(self):
+        self.assertTrue(router.allow_migrate_model("shard1", Payment))
+        self.assertTrue(router.allow_migrate_model("default", SplitTemplate))
+        self.assertFalse(router.allow_migrate_model("shard1", SplitTemplate))
+        self.assertTrue(router.allow_migrate("shard1", "auth", model_name="user"))
+
+
+class PaymentIdTests(APITestCase):
+    def test_payments_get_time_ordered_ids(self):
+        body = {
+            "amount": "10.00",
+            "currency": "BRL",
+            "payment_method": "pix",
+            "splits": [{"recipient_id": "producer_1", "role": "producer", "percent": 100}],
+        }
+        for i in range(3):
+            r = self.client.post("/api/v1/payments", body, format="json", HTTP_IDEMPOTENCY_KEY=f"ids-{i}")
+            self.assertEqual(r.status_code, 201)
+            self.assertRegex(r.json()["payment_id"], r"^pmt_[0-9A-Z]{26}$")
+        ids = list(Payment.objects.order_by("id").values_list("payment_id", flat=True))
+        self.assertEqual(ids, sorted(ids))
+
+
+@override_settings(DATABASE_SHARDS=["default", "shard1"])
+class TwoShardJobsTests(APITestCase):
+    databases = {"default", "shard1"}
+
+    def setUp(self):
+        get_idempotency_store().local.clear()
+        body = {
+            "amount": "10.00",
+            "currency": "BRL",
+            "payment_method": "pix",
+            "splits": [{"recipient_id": "producer_1", "role": "producer", "percent": 100}],
+        }
+        keys = [f"jobs-{i}" for i in range(20)]
+        self.keys = {shard: next(k for k in keys if shard_for_key(k) == shard) for shard in ("default", "shard1")}
+        for key in self.keys.values():
+            r = self.client.post("/api/v1/payments", body, format="json", HTTP_IDEMPOTENCY_KEY=key)
+            self.assertEqual(r.status_code, 201)
+
+    def test_relay_publishes_the_outbox_of_every_shard(self):
+        self.assertEqual(OutboxEvent.objects.using("shard1").filter(status="pending").count(), 1)
+        self.assertEqual(outbox_lag_metrics()["pending"], 2)
+        publisher = InMemoryPublisher()
+        self.assertEqual(OutboxRelay(publisher).relay_once(), 2)
+        self.assertEqual(
+            sorted(m["payload"]["payment_id"] for m in publisher.messages),
+            sorted(Payment.objects.using(db).get().payment_id for db in ("default", "shard1")),
+        )
+        self.assertEqual(OutboxEvent.objects.using("shard1").get().status, "published")
+
+    def test_settlement_and_reconciliation_cover_every_shard(self):
+        run = settle()
+        self.assertEqual((run.entries, run.settlements, run.total), (2, 2, Decimal("20.00")))
+        self.assertFalse(LedgerEntry.objects.using("shard1").filter(settlement__isnull=True).exists())
+
+        RecipientBalance.objects.using("shard1").update(balance=Decimal("1.00"))
+        drifts = [d for _, ds in reconcile_balances(fix=True) for d in ds]
+        self.assertEqual([(d.shard, d.recipient_id, d.ledger_balance) for d in drifts], [("shard1", "producer_1", Decimal("10.00"))])
+        self.assertEqual(RecipientBalance.objects.using("shard1").get().balance, Decimal("10.00"))
+
+    def test_accounting_check_covers_every_shard(self):
+        self.assertEqual(list(run_check(workers=1).mismatches()), [])
+        Payment.objects.using("shard1").update(gross_amount=Decimal("99.00"))
+        found = [(m["shard"], m["check"]) for m in run_check(workers=1).mismatches()]
+        self.assertEqual(found, [("shard1", GROSS_MISMATCH)])
+
+    def test_replay_covers_every_shard(self):
+        Payment.objects.using("shard1").update(net_amount=Decimal("1.00"))
+        diffs = []
+        stats = run_replay(workers=1, on_diffs=diffs.extend)
+        self.assertEqual((stats.replayed, stats.matched), (2, 1))
+        self.assertEqual([(d["shard"], d["field"]) for d in diffs], [("shard1", "net_amount")])
+
+    def test_exports_cover_every_shard(self):
+        payment_ids = [Payment.objects.using(db).get().payment_id for db in ("default", "shard1")]
+        for dataset in ("payments", "ledger"):
+            rows = [json.loads(line) for line in export_lines(dataset, "jsonl", chunk_size=1)]
+            self.assertEqual(sorted(r["payment_id"] for r in rows), sorted(payment_ids))
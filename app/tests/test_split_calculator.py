@@ -0,0 +1,104 @@
+import random
+from dataclasses import FrozenInstanceError
+from decimal import Decimal
+
+from django.test import SimpleTestCase, override_settings
+
+from app.services.split_calculator import (
+    CentsSplitCalculator,
+    SimpleSplitCalculator,
+    SplitCalculationError,
+    SplitCalculatorInterface,
+    get_split_calculator,
+)
+from app.services.split_types import QuoteResult, Receivable, as_splits
+
+ROLES = ["producer", "affiliate", "coproducer"]
+
+
+def random_payload(rng: random.Random) -> dict:
+    method = rng.choice(["pix", "card"])
+    installments = 1 if method == "pix" else rng.randint(1, 12)
+    n = rng.randint(1, 5)
+    cuts = sorted(rng.sample(range(1, 100), n - 1))
+    percents = [b - a for a, b in zip([0] + cuts, cuts + [100])]
+    splits = [
+        {"recipient_id": f"r{i}", "role": rng.choice(ROLES), "percent": p}
+        for i, p in enumerate(percents)
+    ]
+    cents = rng.choice([rng.randint(1, 999), rng.randint(1, 10**6), rng.randint(1, 10**11)])
+    return {
+        "amount": Decimal(cents).scaleb(-2),
+        "payment_method": method,
+        "installments": installments,
+        "splits": splits,
+    }
+
+
+class CentsSplitCalculatorTests(SimpleTestCase):
+    def test_matches_decimal_path_on_random_payloads(self):
+        rng = random.Random(20260204)
+        decimal_calc, cents_calc = SimpleSplitCalculator(), CentsSplitCalculator()
+        for _ in range(5000):
+            payload = random_payload(rng)
+            self.assertEqual(cents_calc.calculate(**payload), decimal_calc.calculate(**payload), payload)
+
+    def test_falls_back_for_sub_cent_amounts(self):
+        payload = {
+            "amount": Decimal("10.005"),
+            "payment_method": "card",
+            "installments": 2,
+            "splits": [{"recipient_id": "p", "role": "producer", "percent": 100}],
+        }
+        self.assertEqual(CentsSplitCalculator().calculate(**payload), SimpleSplitCalculator().calculate(**payload))
+
+    def test_rejects_non_positive_amount_and_unknown_method(self):
+        splits = [{"recipient_id": "p", "role": "producer", "percent": 100}]
+        with self.assertRaises(SplitCalculationError):
+            CentsSplitCalculator().calculate(amount=Decimal("0"), payment_method="pix", installments=1, splits=splits)
+        with self.assertRaises(SplitCalculationError):
+            CentsSplitCalculator().calculate(amount=Decimal("1"), payment_method="boleto", installments=1, splits=splits)
+
+    @override_settings(SPLIT_CALCULATOR="app.services.split_calculator.CentsSplitCalculator")
+    def test_calculator_selected_through_settings(self):
+        self.assertIsInstance(get_split_calculator(), CentsSplitCalculator)
+
+
+class CalculateOnlyCalculator(SplitCalculatorInterface):
+    """A calculator written against the original contract: `calculate` with split dicts."""
+
+    def calculate(self, *, amount, payment_method, installments, splits):
+        assert all(isinstance(s, dict) for s in splits)
+        return SimpleSplitCalculator().calculate(amount=amount, payment_method=payment_method, installments=installments, splits=splits)
+
+
+class QuoteResultTests(SimpleTestCase):
+    splits = as_splits(
+        [
+            {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+            {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 30},
+        ]
+    )
+
+    def test_both_calculators_return_integer_cents(self):
+        expected = QuoteResult(
+            gross_cents=29700,
+            fee_cents=2670,
+            net_cents=27030,
+            receivables=(Receivable("producer_1", "producer", 18921), Receivable("affiliate_9", "affiliate", 8109)),
+        )
+        for calc in (SimpleSplitCalculator(), CentsSplitCalculator()):
+            result = calc.quote(amount=Decimal("297.00"), payment_method="card", installments=3, splits=self.splits)
+            self.assertEqual(result, expected)
+        self.assertEqual(expected.as_dict()["receivables"][0], {"recipient_id": "producer_1", "role": "producer", "amount": "189.21"})
+
+    def test_results_are_frozen_and_slotted(self):
+        result = CentsSplitCalculator().quote(amount=Decimal("10.00"), payment_method="pix", installments=1, splits=self.splits)
+        with self.assertRaises(FrozenInstanceError):
+            result.net_cents = 0
+        self.assertFalse(hasattr(result.receivables[0], "__dict__"))
+
+    def test_calculate_only_calculators_still_quote(self):
+        calc = CalculateOnlyCalculator()
+        kwargs = {"amount": Decimal("297.00"), "payment_method": "card", "installments": 3, "splits": self.splits}
+        self.assertEqual(calc.quote(**kwargs), SimpleSplitCalculator().quote(**kwargs))
@@ -0,0 +1,79 @@
+import random
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from app.api.payment_request import PaymentRequestError, parse_payment_request, parse_with_serializer
+from app.models import Payment
+from app.services.split_calculator import CentsSplitCalculator, SimpleSplitCalculator
+from app.services.split_templates import compile_splits
+from app.services.split_types import as_splits
+
+from .test_split_calculator import random_payload
+
+SPLITS = [
+    {"recipient_id": "affiliate_9", "role": "affiliate", "percent": 30},
+    {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+]
+BODY = {"amount": "297.00", "currency": "BRL", "payment_method": "card", "installments": 3}
+
+
+class CompiledSplitsTests(SimpleTestCase):
+    def test_precomputes_percents_remainder_and_validation(self):
+        compiled = compile_splits(SPLITS)
+        self.assertEqual(compiled, as_splits(SPLITS))
+        self.assertEqual((compiled.percents, compiled.remainder_index, compiled.error), ((30, 70), 1, None))
+        self.assertEqual(compiled.template_id, compile_splits([dict(s) for s in SPLITS]).template_id)
+        self.assertEqual(str(compile_splits(SPLITS[:1]).error), "sum of percents must be 100")
+
+    def test_calculators_give_identical_results(self):
+        rng = random.Random(20260301)
+        for _ in range(2000):
+            payload = random_payload(rng)
+            compiled = {**payload, "splits": compile_splits(payload["splits"])}
+            for calc in (SimpleSplitCalculator(), CentsSplitCalculator()):
+                self.assertEqual(calc.calculate(**compiled), calc.calculate(**payload), payload)
+
+    def test_inline_splits_are_interned(self):
+        first = parse_payment_request({**BODY, "splits": SPLITS}).splits
+        self.assertIs(parse_payment_request({**BODY, "splits": [dict(s) for s in SPLITS]}).splits, first)
+        with override_settings(SPLIT_TEMPLATES={"INTERN": False}):
+            self.assertEqual(type(parse_payment_request({**BODY, "splits": SPLITS}).splits), tuple)
+
+
+class SplitTemplateApiTests(APITestCase):
+    def test_register_and_reference(self):
+        r = self.client.post("/api/v1/split-templates", {"splits": SPLITS}, format="json")
+        self.assertEqual(r.status_code, 201)
+        template_id = r.json()["id"]
+        r = self.client.post("/api/v1/split-templates", {"splits": SPLITS}, format="json")
+        self.assertEqual((r.status_code, r.json()["id"]), (200, template_id))
+        self.assertEqual(self.client.get(f"/api/v1/split-templates/{template_id}").json()["splits"], SPLITS)
+
+        inline = self.client.post("/api/v1/checkout/quote", {**BODY, "splits": SPLITS}, format="json").json()
+        templated = self.client.post("/api/v1/checkout/quote", {**BODY, "split_template": template_id}, format="json")
+        self.assertEqual((templated.status_code, templated.json()), (200, inline))
+
+        r = self.client.post("/api/v1/payments", {**BODY, "split_template": template_id}, format="json", HTTP_IDEMPOTENCY_KEY="tpl-1")
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(Payment.objects.get().ledger_entries.count(), 2)
+        for parse in (parse_payment_request, parse_with_serializer):
+            self.assertEqual(parse({**BODY, "split_template": template_id}).splits, as_splits(SPLITS))
+
+    def test_named_templates_and_errors(self):
+        r = self.client.post("/api/v1/split-templates", {"id": "course-42", "splits": SPLITS}, format="json")
+        self.assertEqual((r.status_code, r.json()["id"]), (201, "course-42"))
+        r = self.client.post("/api/v1/split-templates", {"id": "course-42", "splits": [{**SPLITS[1], "percent": 100}]}, format="json")
+        self.assertEqual(r.status_code, 409)
+        r = self.client.post("/api/v1/split-templates", {"splits": SPLITS[:1]}, format="json")
+        self.assertEqual(r.status_code, 400)
+        r = self.client.post("/api/v1/split-templates", {"id": "no spaces", "splits": SPLITS}, format="json")
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/split-templates/missing").status_code, 404)
+
+        for parse in (parse_payment_request, parse_with_serializer):
+            with self.assertRaises(PaymentRequestError) as ctx:
+                parse({**BODY, "split_template": "missing"})
+            self.assertEqual(ctx.exception.detail, {"split_template": ['Unknown split template "missing".']})
+            with self.assertRaises(PaymentRequestError):
+                parse({**BODY, "split_template": "course-42", "splits": SPLITS})
@@ -0,0 +1,28 @@
+from django.test import SimpleTestCase
+
+from app.services import fee_strategy
+from app.services.startup import measure_startup
+from app.services.warmup import STEPS, warm_up
+
+
+class WarmupTests(SimpleTestCase):
+    def test_warm_up_compiles_the_fee_table_without_the_database(self):
+        fee_strategy._invalidate_fee_table()
+        timings = warm_up()
+        self.assertEqual(list(timings), list(STEPS))
+        self.assertIsNotNone(fee_strategy._fee_table)
+
+    def test_lazy_views_are_served(self):
+        response = self.client.get("/api/playground/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Playground", response.content)
+
+    def test_fresh_process_serves_without_importing_spectacular(self):
+        warm = measure_startup()
+        self.assertEqual(list(warm["warmup_ms"]), list(STEPS))
+        self.assertFalse(warm["spectacular_loaded"])
+        self.assertEqual(measure_startup(env={"WARMUP": "0"})["warmup_ms"], {})
+
+    def test_docs_disabled_imports_no_spectacular(self):
+        self.assertGreater(measure_startup(env={"API_DOCS": "1"})["spectacular_modules"], 0)
+        self.assertEqual(measure_startup(env={"API_DOCS": "0"})["spectacular_modules"], 0)
@@ -3,6 +3,12 @@ ASGI config for projectcfg project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Requests under ``ASYNC_API_PREFIX`` (the native async API views) are served
+by a handler that only runs ``ASYNC_API_MIDDLEWARE``. Django's built-in
+middleware is sync under the hood, and each one costs two thread hops per
+request on an async view; the JSON API needs none of the session, auth,
+message or CSRF middleware, but keeps the security headers.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +19,65 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cakto_engine.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed  # noqa: E402
+from django.core.handlers.asgi import ASGIHandler  # noqa: E402
+from django.core.handlers.exception import convert_exception_to_response  # noqa: E402
+from django.utils.module_loading import import_string  # noqa: E402
+
+
+class AsyncAPIHandler(ASGIHandler):
+    """`ASGIHandler` whose middleware chain is ``ASYNC_API_MIDDLEWARE``.
+
+    `load_middleware` follows `BaseHandler.load_middleware` but reads its
+    own list, so the global ``settings.MIDDLEWARE`` is never touched (other
+    handlers may be loading theirs concurrently).
+    """
+
+    def load_middleware(self, is_async=False):
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._exception_middleware = []
+
+        handler = convert_exception_to_response(self._get_response_async if is_async else self._get_response)
+        handler_is_async = is_async
+        for middleware_path in reversed(settings.ASYNC_API_MIDDLEWARE):
+            middleware = import_string(middleware_path)
+            can_sync = getattr(middleware, "sync_capable", True)
+            can_async = getattr(middleware, "async_capable", False)
+            if not can_sync and not can_async:
+                raise RuntimeError(f"Middleware {middleware_path} must have at least one of sync_capable/async_capable set to True.")
+            middleware_is_async = can_async if handler_is_async or not can_sync else False
+            try:
+                adapted_handler = self.adapt_method_mode(
+                    middleware_is_async, handler, handler_is_async, debug=settings.DEBUG, name=f"middleware {middleware_path}"
+                )
+                mw_instance = middleware(adapted_handler)
+            except MiddlewareNotUsed:
+                continue
+            if mw_instance is None:
+                raise ImproperlyConfigured(f"Middleware factory {middleware_path} returned None.")
+
+            if hasattr(mw_instance, "process_view"):
+                self._view_middleware.insert(0, self.adapt_method_mode(is_async, mw_instance.process_view))
+            if hasattr(mw_instance, "process_template_response"):
+                self._template_response_middleware.append(self.adapt_method_mode(is_async, mw_instance.process_template_response))
+            if hasattr(mw_instance, "process_exception"):
+                # exception middleware always runs sync, as in Django
+                self._exception_middleware.append(self.adapt_method_mode(False, mw_instance.process_exception))
+
+            handler = convert_exception_to_response(mw_instance)
+            handler_is_async = middleware_is_async
+
+        self._middleware_chain = self.adapt_method_mode(is_async, handler, handler_is_async)
+
+
+async_api_application = AsyncAPIHandler()
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "http" and scope["path"].startswith(settings.ASYNC_API_PREFIX):
+        return await async_api_application(scope, receive, send)
+    return await django_application(scope, receive, send)
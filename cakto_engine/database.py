@@ -0,0 +1,110 @@
+"""Environment-driven ``DATABASES['default']``.
+
+``DATABASE_ENGINE=sqlite`` (default) is the single-node profile: one file
+(``SQLITE_PATH``) in WAL mode, so readers never block the writer, with
+``synchronous=NORMAL``, a busy timeout instead of immediate "database is
+locked" errors, and ``BEGIN IMMEDIATE`` transactions so a transaction that
+starts reading never fails upgrading to a write. Connections are kept
+between requests (``DB_CONN_MAX_AGE``). ``SQLITE_WAL=0`` restores the plain
+rollback-journal setup.
+
+``DATABASE_ENGINE=postgres`` reads the usual ``POSTGRES_*`` variables and
+keeps connections open between requests (``DB_CONN_MAX_AGE`` seconds, with
+health checks). ``DB_POOL=1`` uses psycopg's connection pool instead
+(Django >= 5.1, ``pip install "psycopg[pool]"``); Django requires
+``CONN_MAX_AGE=0`` with a pool.
+
+``DB_SHARDS=N`` adds the aliases ``shard1`` .. ``shard<N-1>`` next to
+``default`` (see `shard_databases` and `app.services.sharding`).
+"""
+from pathlib import Path
+from typing import Dict, Mapping
+
+
+def _flag(env: Mapping[str, str], name: str, default: bool) -> bool:
+    value = env.get(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def sqlite_config(env: Mapping[str, str], base_dir: Path) -> Dict:
+    config = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": env.get("SQLITE_PATH") or base_dir / "db.sqlite3",
+    }
+    if not _flag(env, "SQLITE_WAL", True):
+        return config
+    # reconnecting re-runs the pragmas below; keep connections instead
+    config["CONN_MAX_AGE"] = int(env.get("DB_CONN_MAX_AGE", 60))
+    pragmas = {
+        "journal_mode": "WAL",
+        "synchronous": env.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": int(env.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+        # negative: KiB
+        "cache_size": int(env.get("SQLITE_CACHE_SIZE", -20000)),
+        "temp_store": "MEMORY",
+        "mmap_size": int(env.get("SQLITE_MMAP_SIZE", 128 * 1024 * 1024)),
+    }
+    config["OPTIONS"] = {
+        "init_command": "".join(f"PRAGMA {name}={value};" for name, value in pragmas.items()),
+        "transaction_mode": env.get("SQLITE_TRANSACTION_MODE", "IMMEDIATE"),
+        "timeout": pragmas["busy_timeout"] / 1000,
+    }
+    return config
+
+
+def postgres_config(env: Mapping[str, str]) -> Dict:
+    config = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": env.get("POSTGRES_DB", "cakto"),
+        "USER": env.get("POSTGRES_USER", "postgres"),
+        "PASSWORD": env.get("POSTGRES_PASSWORD", ""),
+        "HOST": env.get("POSTGRES_HOST", "localhost"),
+        "PORT": env.get("POSTGRES_PORT", "5432"),
+        "CONN_MAX_AGE": int(env.get("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": _flag(env, "DB_CONN_HEALTH_CHECKS", True),
+        "OPTIONS": {},
+    }
+    if _flag(env, "DB_POOL", False):
+        config["CONN_MAX_AGE"] = 0
+        config["OPTIONS"]["pool"] = {
+            "min_size": int(env.get("DB_POOL_MIN_SIZE", 2)),
+            "max_size": int(env.get("DB_POOL_MAX_SIZE", 20)),
+            "timeout": float(env.get("DB_POOL_TIMEOUT", 10)),
+        }
+    return config
+
+
+def database_config(env: Mapping[str, str], base_dir: Path) -> Dict:
+    engine = env.get("DATABASE_ENGINE", "sqlite").strip().lower()
+    if engine in ("postgres", "postgresql"):
+        return postgres_config(env)
+    if engine == "sqlite":
+        return sqlite_config(env, base_dir)
+    raise ValueError(f"unsupported DATABASE_ENGINE {engine!r} (expected sqlite or postgres)")
+
+
+def shard_databases(env: Mapping[str, str], default: Dict) -> Dict[str, Dict]:
+    """Aliases of the extra payment shards: `default`'s settings on another
+    database, ``<SQLITE_PATH>.shard<k>`` or ``<POSTGRES_DB>_shard<k>``
+    (``SQLITE_PATH_SHARD<k>``/``POSTGRES_DB_SHARD<k>`` override them)."""
+    shards = {}
+    for k in range(1, int(env.get("DB_SHARDS", 1))):
+        config = {**default, "OPTIONS": dict(default.get("OPTIONS", {}))}
+        if config["ENGINE"].endswith("sqlite3"):
+            config["NAME"] = env.get(f"SQLITE_PATH_SHARD{k}") or f"{default['NAME']}.shard{k}"
+        else:
+            config["NAME"] = env.get(f"POSTGRES_DB_SHARD{k}") or f"{default['NAME']}_shard{k}"
+        shards[f"shard{k}"] = config
+    return shards
+
+
+# overlays of the environment compared by `loadtest_payments --profiles`
+PROFILES: Dict[str, Dict[str, str]] = {
+    "sqlite": {"DATABASE_ENGINE": "sqlite", "SQLITE_WAL": "0"},
+    "sqlite-wal": {"DATABASE_ENGINE": "sqlite", "SQLITE_WAL": "1"},
+    "postgres": {"DATABASE_ENGINE": "postgres", "DB_CONN_MAX_AGE": "0", "DB_POOL": "0"},
+    "postgres-persistent": {"DATABASE_ENGINE": "postgres", "DB_CONN_MAX_AGE": "60", "DB_POOL": "0"},
+    "postgres-pool": {"DATABASE_ENGINE": "postgres", "DB_POOL": "1"},
+}
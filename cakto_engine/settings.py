@@ -10,8 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import sys
+import tempfile
 from pathlib import Path
 
+from .database import database_config, shard_databases, sqlite_config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -39,10 +44,16 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'app',
-    'drf_spectacular',
 ]
 
+# OpenAPI schema and Swagger UI (/api/schema/, /api/docs/). With API_DOCS=0
+# drf-spectacular is neither installed nor routed, so none of it is imported.
+API_DOCS = os.environ.get('API_DOCS', '1') != '0'
+if API_DOCS:
+    INSTALLED_APPS.append('drf_spectacular')
+
 MIDDLEWARE = [
+    'app.api.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +63,14 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# The ASGI application serves this prefix (the native async API views) with
+# only ASYNC_API_MIDDLEWARE; see cakto_engine/asgi.py.
+ASYNC_API_PREFIX = '/api/v1/async/'
+ASYNC_API_MIDDLEWARE = [
+    'app.api.instrumentation.RequestMetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+]
+
 ROOT_URLCONF = 'cakto_engine.urls'
 
 TEMPLATES = [
@@ -75,12 +94,29 @@ WSGI_APPLICATION = 'cakto_engine.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite in WAL mode by default, PostgreSQL with DATABASE_ENGINE=postgres;
+# see cakto_engine/database.py for the environment variables.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(os.environ, BASE_DIR),
 }
+DATABASES.update(shard_databases(os.environ, DATABASES['default']))
+
+# Databases holding payments, in order (append only: keys and payment ids
+# refer to shards by position); ShardRouter routes the payment tables.
+DATABASE_SHARDS = list(DATABASES)
+DATABASE_ROUTERS = ['app.services.sharding.ShardRouter']
+
+# Extra databases for `manage.py test`, left out of DATABASE_SHARDS: test
+# classes opt in through `databases` and `override_settings`.
+# - shard1: a second shard for the multi-shard tests;
+# - concurrent: a file database for the threaded tests (threads sharing an
+#   in-memory one fail with "table is locked" instead of waiting).
+if sys.argv[1:2] == ['test']:
+    DATABASES.setdefault('shard1', {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'})
+    DATABASES.setdefault('concurrent', {
+        **sqlite_config({}, Path(tempfile.gettempdir())),
+        'TEST': {'NAME': str(Path(tempfile.gettempdir()) / 'cakto_test_concurrent.sqlite3')},
+    })
 
 
 # Password validation
@@ -118,14 +154,104 @@ REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': (
         'rest_framework.renderers.JSONRenderer',
     ),
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
+if API_DOCS:
+    REST_FRAMEWORK['DEFAULT_SCHEMA_CLASS'] = 'drf_spectacular.openapi.AutoSchema'
 
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Cakto Mini Split Engine',
     'VERSION': '1.0.0',
 }
 
+# Parser for quote/payment bodies. `parse_with_serializer` is the DRF
+# PaymentRequestSerializer path; the default is a single-pass equivalent.
+PAYMENT_REQUEST_PARSER = 'app.api.payment_request.parse_payment_request'
+
+# Split calculator used by the API views. `CentsSplitCalculator` is an
+# integer-cent implementation with identical output.
+SPLIT_CALCULATOR = 'app.services.split_calculator.SimpleSplitCalculator'
+
+# Optional JSON file with fee overrides ({"card": {"1": "3.99"}, ...}). The
+# compiled fee table is rebuilt when the file changes, checked at most every
+# FEE_TABLE_RELOAD_INTERVAL seconds.
+FEE_TABLE_FILE = None
+FEE_TABLE_RELOAD_INTERVAL = 5.0
+
+# Generator of payment ids (time-ordered). SnowflakeGenerator takes a
+# "node_id" option (or the NODE_ID environment variable), unique per process.
+PAYMENT_ID_GENERATOR = {
+    'CLASS': 'app.services.ids.UlidGenerator',
+    'OPTIONS': {},
+}
+
+# Compiled split templates (per process): registered templates referenced by
+# id, and inline splits interned by content (INTERN).
+SPLIT_TEMPLATES = {
+    'INTERN': True,
+    'MAX_INTERNED': 10000,
+    'MAX_REGISTERED': 10000,
+}
+
+# Quote results cache (per process). Set DJANGO_CACHE to a CACHES alias to
+# share cached quotes across workers.
+QUOTE_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 10000,
+    'TTL': 300,
+    'DJANGO_CACHE': None,
+}
+
+# Cache tiers in front of the IdempotencyRecord table. Set DJANGO_CACHE to a
+# CACHES alias to share replayed responses across workers.
+IDEMPOTENCY_STORE = {
+    'MAX_ENTRIES': 10000,
+    'TTL': 3600,
+    'DJANGO_CACHE': None,
+}
+# A duplicate request waits up to IDEMPOTENCY_WAIT_SECONDS for the request
+# holding its key, then gets a 409. Claims older than IDEMPOTENCY_LOCK_SECONDS
+# (crashed requests) can be taken over.
+IDEMPOTENCY_WAIT_SECONDS = 2.0
+IDEMPOTENCY_LOCK_SECONDS = 30
+
+# Payment lookups and exports answer staff users and requests with
+# "Authorization: Bearer <token>" for one of these tokens
+# (SUPPORT_API_TOKENS in the environment, comma-separated).
+SUPPORT_API_TOKENS = [t for t in os.environ.get('SUPPORT_API_TOKENS', '').split(',') if t]
+
+# Where `manage.py relay_outbox` publishes outbox events.
+OUTBOX_PUBLISHER = {
+    'CLASS': 'app.services.outbox_relay.LoggingPublisher',
+    'OPTIONS': {},
+}
+
+# Warm-up run from AppConfig.ready: fee table, calculator, parser, renderer
+# and (URLCONF) the URL configuration, so a new worker's first request is not
+# slower than the rest. WARMUP=0 in the environment disables it.
+WARMUP = {
+    'ENABLED': os.environ.get('WARMUP', '1') != '0',
+    'URLCONF': True,
+}
+
+# Per-stage timings, query counts and latency histograms of each request,
+# exposed at /metrics. Disabled, RequestMetricsMiddleware drops out of the
+# middleware chain and the stage hooks are no-ops.
+REQUEST_METRICS = {
+    'ENABLED': False,
+}
+
+# `python manage.py archive`: published outbox events and old payments move
+# to archive tables (TableSink) or gzip JSONL segments (JsonlSink with
+# OPTIONS {'directory': ...}). Idempotency records are kept for
+# IDEMPOTENCY_RETENTION_DAYS, which may not be shorter than PAYMENTS_AFTER_DAYS.
+ARCHIVE = {
+    'SINK': {'CLASS': 'app.services.archival.TableSink', 'OPTIONS': {}},
+    'OUTBOX_AFTER_DAYS': 7,
+    'PAYMENTS_AFTER_DAYS': 90,
+    'IDEMPOTENCY_RETENTION_DAYS': 90,
+    'BATCH_SIZE': 500,
+}
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
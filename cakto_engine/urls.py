@@ -14,15 +14,39 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
-from .playground import api_playground
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+from app.api.instrumentation import metrics_view
+
+
+def lazy_view(dotted_path, **initkwargs):
+    """View imported on its first request: the schema, docs and playground
+    modules (drf-spectacular's generator, mostly) stay out of the startup."""
+    view = None
+
+    @csrf_exempt
+    def dispatch(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            target = import_string(dotted_path)
+            view = target.as_view(**initkwargs) if hasattr(target, 'as_view') else target
+        return view(request, *args, **kwargs)
+
+    return dispatch
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/v1/', include('app.api.urls')),
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-    path('api/playground/', api_playground, name='api-playground'),
+    path('api/playground/', lazy_view('cakto_engine.playground.api_playground'), name='api-playground'),
+    path('metrics', metrics_view, name='metrics'),
 ]
+
+if settings.API_DOCS:
+    urlpatterns += [
+        path('api/schema/', lazy_view('drf_spectacular.views.SpectacularAPIView'), name='schema'),
+        path('api/docs/', lazy_view('drf_spectacular.views.SpectacularSwaggerView', url_name='schema'), name='swagger-ui'),
+    ]